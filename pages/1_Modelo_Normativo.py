@@ -7,12 +7,16 @@ from replayviz.flowviz import build_normative_flow_N3
 st.set_page_config(page_title="Modelo Normativo N₃", layout="wide")
 st.title("Modelo Normativo — N₃")
 
-# constrói o net (apenas para referência de consistência)
-net, im, fm, places, trans = build_net_N3()
+# Grafo estático: construído uma vez por processo; reruns não o reenviam ao estado
+@st.cache_resource(show_spinner=False)
+def normative_flow_n3():
+    # constrói o net (apenas para referência de consistência)
+    build_net_N3()
+    return build_normative_flow_N3()
 
-nodes, edges = build_normative_flow_N3()
+nodes, edges = normative_flow_n3()
 ensure_flow_state_slot("flow_norm_n3")
-update_flow_state_slot("flow_norm_n3", nodes, edges)
+update_flow_state_slot("flow_norm_n3", nodes, edges, fingerprint="N3")
 render_flow_slot("flow_norm_n3", key="norm_n3", height=280, fit_view=True)
 
 st.caption("Layout conforme o diagrama N₃: split paralelo após **a**, ramos **c**/**d**, join em **e**, depois **h** até **end**.")
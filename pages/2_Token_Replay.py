@@ -1,39 +1,91 @@
 # -*- coding: utf-8 -*-
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Hashable, List, Optional, Union
 import streamlit as st
+import streamlit.components.v1 as components
+import numpy as np
 import pandas as pd
 
 from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
 from pm4py.objects.log.obj import EventLog
 
-from replayviz.pm4py_model import build_tiny_log, build_net_N3
 from replayviz import (
-    markings_along_trace, markings_equal, format_marking,
+    format_marking,
     ensure_flow_state_slot, update_flow_state_slot, render_flow_slot,
 )
 from replayviz.flowviz import (
+    build_normative_flow,
     build_normative_flow_N3,
-    build_trace_flow,
-    build_trace_replay_flow,
+    build_trace_replay_window,
+    collapse_flow,
+    TraceReplayView,
 )
-from replayviz.utils_xes import read_xes_any  # <- leitor robusto (path/bytes)
+from replayviz.flow_state import patch_flow_state_nodes
+from replayviz.frames import TraceFrames, build_trace_frames
+from replayviz.playback import playback_html, trace_playback
+from replayviz.utils_xes import load_event_log, log_source_key  # <- leitor robusto (path/bytes)
+from replayviz.aggregation import aggregate_variants
+from replayviz.model_compiler import N3_KEY, CompiledModel
+from replayviz.model_view import analysis_gate, select_model
+from replayviz.compute_cache import compute_cached
+from replayviz.result_store import TOKEN_REPLAY, VariantResults, get_result_store
+from replayviz.job_view import cache_panel
+from replayviz.filter_view import case_filter
+from replayviz.variants import VariantTrie, log_variants
+from replayviz.trace_picker import trace_picker
+from replayviz.table_view import ResultTable, result_table
 
 st.set_page_config(page_title="Token Replay — N₃", layout="wide")
+
+# Limite de nós do modelo por renderização (nível de detalhe)
+MAX_MODEL_NODES = 200
 st.title("Token-Based Replay (N₃) — normativo e fluxo do traço acima, Petri com fichas abaixo")
 
 # -----------------------------
 # Leitura de log (robusta)
 # -----------------------------
-@st.cache_data(show_spinner=False)
-def load_event_log_any(src: Optional[Union[str, bytes]]) -> EventLog:
-    """
-    - Se src for None -> retorna log sintético padrão (demo).
-    - Se src for str  -> interpreta como caminho e lê via PM4Py.
-    - Se src for bytes-> salva temporário (.xes/.xes.gz) e lê via PM4Py.
-    """
-    if src is None:
-        return build_tiny_log()
-    return read_xes_any(src)
+# As funções abaixo recebem `run_key` = (chave do log, chave do modelo compilado).
+# Log, replay e layout ficam no cache de cálculos do processo (compartilhado entre
+# sessões, com orçamento de memória); o restante, no cache_resource da página.
+@compute_cached("replay")
+def replay_log(run_key: Hashable, _log: EventLog, _model: CompiledModel, _trie: VariantTrie) -> List[Dict[str, Any]]:
+    """Replay por variante: as já guardadas no store em disco não são recalculadas."""
+    store = get_result_store()
+    res = VariantResults(store, _model.net, TOKEN_REPLAY).resolve(
+        _log, lambda part: token_based_replay.apply(part, _model.net, _model.im, _model.fm),
+        lc=_trie.lc, vi=_trie.index,
+    )
+    if store is not None:
+        store.flush()
+    return res
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def transition_counts(log_key: Hashable, _replay_result: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Disparos por transição no log inteiro (pesos do nível de detalhe do modelo)."""
+    counts: Dict[str, int] = {}
+    for r in _replay_result:
+        for t in r.get("activated_transitions") or []:
+            counts[t.name] = counts.get(t.name, 0) + 1
+    return counts
+
+@compute_cached("layout")
+def normative_flow(log_key: Hashable, _replay_result: List[Dict[str, Any]], _model: CompiledModel):
+    """Normativo com nível de detalhe ponderado pelos disparos do log (estático por log/modelo)."""
+    if _model.key == N3_KEY:
+        n_nodes, n_edges = build_normative_flow_N3()
+    else:
+        n_nodes, n_edges = build_normative_flow(_model.net)
+    return collapse_flow(
+        n_nodes, n_edges, max_nodes=MAX_MODEL_NODES,
+        weights={f"norm_{k}": v for k, v in transition_counts(log_key, _replay_result).items()},
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def trace_playback_payload(log_key: Hashable, trace_idx: int, _tf: TraceFrames) -> Dict[str, Any]:
+    return trace_playback(_tf)
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def trace_frames(log_key: Hashable, trace_idx: int, _log: EventLog, _model: CompiledModel) -> TraceFrames:
+    return build_trace_frames(_model.net, _model.im, _model.fm, _log[trace_idx], _model.trans)
 
 st.subheader("Seleção do Log")
 uploaded = st.file_uploader("Carregue um XES", type=["xes", "xes.gz"])
@@ -48,10 +100,12 @@ elif path_input.strip():
     src = path_input.strip()  # caminho no servidor
 else:
     src = None  # usa log de demonstração
+log_key = log_source_key(uploaded, path_input.strip())
 
 # Carrega com cache
 try:
-    log: EventLog = load_event_log_any(src)
+    with st.spinner("Carregando log…"):
+        log: EventLog = load_event_log(log_key, src)
     if src is None:
         st.info(f"Usando log de demonstração (traços: {len(log)})")
     else:
@@ -60,20 +114,46 @@ except Exception as e:
     st.error(f"Falha ao carregar o log: {e}")
     st.stop()
 
+# Filtro de casos (índice do log: bitmaps por atividade, tempos ordenados, variantes)
+log, log_key = case_filter(log, log_key)
+# Variantes do log (trie com códigos internados): replay, tabela e rótulo do traço
+trie = log_variants(log_key, log)
+
 # -----------------------------
 # Parâmetros do replay
 # -----------------------------
 with st.sidebar:
     st.header("Parâmetros do Replay")
-    trace_idx = st.selectbox("Trace", options=list(range(1, len(log)+1)), index=0) - 1
-
-# Modelo N₃ (rede de Petri)
-net, im, fm, places, trans = build_net_N3()
-replay_result = token_based_replay.apply(log, net, im, fm)
-
-# Sequência de marcações para o traço selecionado
-seq = markings_along_trace(net, im, log[trace_idx], trans)
-max_step = seq[-1][0] if seq else 0
+    client_playback = st.toggle(
+        "Reprodução no navegador",
+        value=False,
+        help="Envia todos os passos de uma vez; play/pause e navegação sem rerun do servidor.",
+    )
+    render_window = st.number_input(
+        "Janela de renderização (eventos)", min_value=5, value=50, step=5,
+        help="Traços mais longos que 2× a janela mostram só os eventos ao redor do passo atual.",
+    )
+    playback_speed = st.number_input("Velocidade (ms por passo)", min_value=10, value=600, step=50, disabled=not client_playback)
+
+# Modelo (N₃ ou o editado na página 0, compilado com cache) e replay do log inteiro
+model = select_model()
+analysis_gate(model)
+net, im, fm, places, trans = model.as_tuple()
+run_key = (log_key, model.key)
+with st.spinner("Executando token replay…"):
+    replay_result = replay_log(run_key, log, model, trie)
+
+# Escolha do traço: busca/filtros/paginação no servidor (só a página vai ao navegador)
+trace_idx = trace_picker(log, log_key, run_key, trie, replay_result)
+
+# Quadros (marcação, disparo, estilos) do traço selecionado
+tf = trace_frames(run_key, trace_idx, log, model)
+max_step = tf.max_step
+trace_variant = trie.variant_of(trace_idx)
+trace_label = (
+    f"{trie.label(trace_variant)} &nbsp;(variante #{trace_variant}, "
+    f"{int(trie.frequency[trace_variant])} traços)"
+)
 
 # Estado do passo (manual)
 if "frame" not in st.session_state:
@@ -81,7 +161,7 @@ if "frame" not in st.session_state:
 if "last_params" not in st.session_state:
     st.session_state.last_params = None
 
-curr_params = (trace_idx, max_step)
+curr_params = (run_key, trace_idx, max_step)
 if st.session_state.last_params != curr_params:
     st.session_state.last_params = curr_params
     st.session_state.frame = 0
@@ -90,6 +170,7 @@ if st.session_state.last_params != curr_params:
         del st.session_state["flow_trace_vertical_n3"]
     if "flow_trace_overview" in st.session_state:
         del st.session_state["flow_trace_overview"]
+    st.session_state.pop("trace_replay_view", None)
 
 # Limita antes de instanciar o widget
 st.session_state.frame = max(0, min(st.session_state.frame, max_step))
@@ -98,54 +179,82 @@ st.session_state.frame = max(0, min(st.session_state.frame, max_step))
 # 1) Normativo N₃ (alto nível)
 # -----------------------------
 st.subheader("Modelo normativo (referência)")
-n_nodes, n_edges = build_normative_flow_N3()
+n_nodes, n_edges = normative_flow(run_key, replay_result, model)
 ensure_flow_state_slot("flow_norm_on_replay_page")
-update_flow_state_slot("flow_norm_on_replay_page", n_nodes, n_edges)
+update_flow_state_slot("flow_norm_on_replay_page", n_nodes, n_edges, fingerprint=run_key)
 render_flow_slot("flow_norm_on_replay_page", key="norm_replay_page", height=260, fit_view=True)
 
 
 # -----------------------------
 # 3) Controles + Petri com fichas
 # -----------------------------
-st.subheader("Controles (somente manual)")
-c1, c2, c3 = st.columns([1, 1, 1])
-if c1.button("⏮ Prev"):
-    st.session_state.frame = max(0, st.session_state.frame - 1)
-if c2.button("⏭ Next"):
-    st.session_state.frame = min(max_step, st.session_state.frame + 1)
-if c3.button("⟲ Reset"):
-    st.session_state.frame = 0
-
-# Slider (não reatribuir frame depois do widget)
-st.slider("Passo", 0, max_step, key="frame", help="0 = estado inicial")
-
-st.subheader(f"Replay do Trace {trace_idx+1} — passo {st.session_state.frame}/{max_step}")
-st.markdown("**Traço selecionado:** " + " → ".join(ev["concept:name"] for ev in log[trace_idx]))
-
-_, marking, fired_name = seq[st.session_state.frame]
-
-nodes, edges = build_trace_replay_flow(
-    trace=log[trace_idx],
-    step=st.session_state.frame,
-    fired_event_label=(fired_name if st.session_state.frame > 0 else None),
-)
-ensure_flow_state_slot("flow_trace_vertical_n3")
-update_flow_state_slot("flow_trace_vertical_n3", nodes, edges)
-render_flow_slot("flow_trace_vertical_n3", key="trace_vertical_n3", height=360, fit_view=True)
-
-reached = markings_equal(marking, fm)
-badge = "✅ **Final atingido**" if reached else "⌛ **Final não atingido**"
-fired_txt = f"Transição disparada: **{fired_name}**" if fired_name else "Sem disparo."
-st.markdown(badge + " &nbsp;&nbsp;|&nbsp;&nbsp; " + fired_txt)
-st.markdown(f"Marcação atual: `{format_marking(marking)}`")
-st.markdown(f"Marcação final requerida: `{format_marking(fm)}`")
+# Fragmento: Prev/Next/slider reexecutam apenas este trecho (consulta ao quadro),
+# sem re-renderizar as tabelas do log inteiro.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+@_fragment
+def replay_controls(tf: TraceFrames) -> None:
+    max_step = tf.max_step
+    st.subheader("Controles (somente manual)")
+    c1, c2, c3 = st.columns([1, 1, 1])
+    if c1.button("⏮ Prev"):
+        st.session_state.frame = max(0, st.session_state.frame - 1)
+    if c2.button("⏭ Next"):
+        st.session_state.frame = min(max_step, st.session_state.frame + 1)
+    if c3.button("⟲ Reset"):
+        st.session_state.frame = 0
+
+    # Slider (não reatribuir frame depois do widget)
+    st.slider("Passo", 0, max_step, key="frame", help="0 = estado inicial")
+
+    st.subheader(f"Replay do Trace {trace_idx+1} — passo {st.session_state.frame}/{max_step}")
+    st.markdown("**Traço selecionado:** " + trace_label)
+
+    frame = tf.frames[st.session_state.frame]
+    # Vista do traço mantida na sessão: a cada passo só os nós com estilo alterado
+    # (token, consumo, disparo) são atualizados no estado do componente.
+    view = st.session_state.get("trace_replay_view")
+    if len(tf.trans_names) > 2 * render_window:
+        # traço longo: só a janela ao redor do passo (nós/arestas limitados)
+        nodes, edges = build_trace_replay_window(
+            log[trace_idx], frame.step, window=int(render_window),
+            fired_event_label=(frame.fired if frame.step > 0 else None),
+        )
+        ensure_flow_state_slot("flow_trace_vertical_n3")
+        update_flow_state_slot("flow_trace_vertical_n3", nodes, edges)
+        # o slot agora tem a janela: a vista completa é refeita se a janela crescer
+        st.session_state.pop("trace_replay_view", None)
+    elif view is None or "flow_trace_vertical_n3" not in st.session_state:
+        view = TraceReplayView(log[trace_idx])
+        view.goto(frame.step, styles=frame.node_styles)
+        st.session_state.trace_replay_view = view
+        ensure_flow_state_slot("flow_trace_vertical_n3")
+        update_flow_state_slot("flow_trace_vertical_n3", view.nodes, view.edges)
+    elif view.step != frame.step:
+        patch_flow_state_nodes("flow_trace_vertical_n3", view.goto(frame.step, styles=frame.node_styles))
+    render_flow_slot("flow_trace_vertical_n3", key="trace_vertical_n3", height=360, fit_view=True)
+
+    badge = "✅ **Final atingido**" if frame.reached_final else "⌛ **Final não atingido**"
+    fired_txt = f"Transição disparada: **{frame.fired}**" if frame.fired else "Sem disparo."
+    st.markdown(badge + " &nbsp;&nbsp;|&nbsp;&nbsp; " + fired_txt)
+    st.markdown(f"Marcação atual: `{format_marking(frame.marking)}`")
+    st.markdown(f"Marcação final requerida: `{format_marking(fm)}`")
+
+if client_playback:
+    st.subheader(f"Replay do Trace {trace_idx+1} — reprodução no navegador ({max_step} passos)")
+    st.markdown("**Traço selecionado:** " + trace_label)
+    components.html(
+        playback_html(trace_playback_payload(run_key, trace_idx, tf), height=400, speed_ms=int(playback_speed)),
+        height=420,
+    )
+else:
+    replay_controls(tf)
 
 
 # -----------------------------
 # 5) Variantes (agrupadas por sequência de eventos)
 # -----------------------------
 st.subheader("Variantes do processo (agrupadas por sequência de eventos)")
-def _scalar(x): return "—" if x is None else x
 def _name(obj) -> str: return getattr(obj, "name", str(obj))
 def _fmt_marking_like(val) -> str:
     if val is None: return "—"
@@ -170,81 +279,72 @@ def _fmt_seq_of_transitions(val) -> str:
                 out.append(_name(x))
         return ", ".join(out)
     return _name(val)
-# Base por traço: acrescenta a string da variante (sequência de eventos)
-variant_rows: List[Dict[str, Any]] = []
-for i, (r, tr) in enumerate(zip(replay_result, log), start=1):
-    variant = " → ".join(ev["concept:name"] for ev in tr)
-    variant_rows.append({
-        "trace": i,
-        "variant": variant,
-        # métricas "cruas" para permitir agregação
-        "trace_is_fit": r.get("trace_is_fit"),
-        "trace_fitness": r.get("trace_fitness"),
-        "missing": r.get("missing_tokens"),
-        "remaining": r.get("remaining_tokens"),
-        "consumed": r.get("consumed_tokens"),
-        "produced": r.get("produced_tokens"),
-        # campos textuais representativos: usaremos a moda
-        "enabled_transitions": _fmt_seq_of_transitions(r.get("enabled_transitions_in_marking")),
-        "activated_transitions": _fmt_seq_of_transitions(r.get("activated_transitions")),
-        "transitions_with_problems": _fmt_seq_of_transitions(r.get("transitions_with_problems")),
-    })
-
-df_variants_base = pd.DataFrame(variant_rows)
-
-def _mode_or_dash(s: pd.Series) -> str:
-    """Moda robusta: retorna o valor mais frequente ou '—' se vazio."""
-    s = s.replace({None: pd.NA, "—": pd.NA})
-    m = s.mode(dropna=True)
-    return (m.iloc[0] if not m.empty else "—")
-
-# Agregação por variante
-df_variants = (
-    df_variants_base
-      .groupby("variant", dropna=False)
-      .agg(
-          frequency=("trace", "size"),
-          fit_rate=("trace_is_fit", lambda x: pd.Series(x, dtype="float").mean()),
-          trace_fitness_mean=("trace_fitness", "mean"),
-          missing_mean=("missing", "mean"),
-          remaining_mean=("remaining", "mean"),
-          consumed_mean=("consumed", "mean"),
-          produced_mean=("produced", "mean"),
-          enabled_transitions_mode=("enabled_transitions", _mode_or_dash),
-          activated_transitions_mode=("activated_transitions", _mode_or_dash),
-          transitions_with_problems_mode=("transitions_with_problems", _mode_or_dash),
-      )
-      .reset_index()
-      .sort_values(["frequency", "trace_fitness_mean"], ascending=[False, False])
-)
 
-# Formatação leve
-for c in ["fit_rate", "trace_fitness_mean", "missing_mean", "remaining_mean", "consumed_mean", "produced_mean"]:
-    df_variants[c] = df_variants[c].round(3)
-
-st.dataframe(df_variants, use_container_width=True)
+@compute_cached("table")
+def variants_table(
+    log_key: Hashable, _log: EventLog, _replay_result: List[Dict[str, Any]], _trie: VariantTrie
+) -> ResultTable:
+    # Agregação vetorizada por variante; campos textuais: moda (formatada uma vez por valor)
+    df_variants = aggregate_variants(
+        _log, _replay_result,
+        numeric_fields={
+            "missing_mean": "missing_tokens",
+            "remaining_mean": "remaining_tokens",
+            "consumed_mean": "consumed_tokens",
+            "produced_mean": "produced_tokens",
+        },
+        text_fields={
+            "enabled_transitions_mode": ("enabled_transitions_in_marking", _fmt_seq_of_transitions),
+            "activated_transitions_mode": ("activated_transitions", _fmt_seq_of_transitions),
+            "transitions_with_problems_mode": ("transitions_with_problems", _fmt_seq_of_transitions),
+        },
+        lc=_trie.lc, vi=_trie.index,
+    ).drop(columns="variant_id")
+
+    # Formatação leve
+    for c in ["fit_rate", "trace_fitness_mean", "missing_mean", "remaining_mean", "consumed_mean", "produced_mean"]:
+        df_variants[c] = df_variants[c].round(3)
+    return ResultTable(df_variants, key=log_key)
+
+result_table(variants_table(run_key, log, replay_result, trie), key="variants_table", file_name="variantes")
 
 # -----------------------------
 # 4) Métricas do Token-Based Replay
 # -----------------------------
 st.subheader("Métricas do Token-Based Replay")
 
-
-
-rows: List[Dict[str, Any]] = []
-for i, r in enumerate(replay_result, start=1):
-    rows.append({
-        "trace": i,
-        "trace_is_fit": _scalar(r.get("trace_is_fit")),
-        "trace_fitness": _scalar(r.get("trace_fitness")),
-        "missing": _scalar(r.get("missing_tokens")),
-        "remaining": _scalar(r.get("remaining_tokens")),
-        "consumed": _scalar(r.get("consumed_tokens")),
-        "produced": _scalar(r.get("produced_tokens")),
-        "reached_marking": _fmt_marking_like(r.get("reached_marking")),
-        "enabled_transitions": _fmt_seq_of_transitions(r.get("enabled_transitions_in_marking")),
-        "activated_transitions": _fmt_seq_of_transitions(r.get("activated_transitions")),
-        "transitions_with_problems": _fmt_seq_of_transitions(r.get("transitions_with_problems")),
+@compute_cached("table")
+def metrics_table(log_key: Hashable, _replay_result: List[Dict[str, Any]]) -> ResultTable:
+    # Colunas brutas (sem formatar): transições/marcações viram texto só nas linhas exibidas
+    def col(field: str, default: Any = None) -> List[Any]:
+        return [r.get(field, default) for r in _replay_result]
+
+    def num(field: str) -> np.ndarray:
+        return np.asarray([np.nan if v is None else v for v in col(field)], dtype=float)
+
+    frame = pd.DataFrame({
+        "trace": np.arange(1, len(_replay_result) + 1),
+        "trace_is_fit": np.asarray(col("trace_is_fit", False), dtype=bool),
+        "trace_fitness": num("trace_fitness"),
+        "missing": num("missing_tokens"),
+        "remaining": num("remaining_tokens"),
+        "consumed": num("consumed_tokens"),
+        "produced": num("produced_tokens"),
+        "reached_marking": col("reached_marking"),
+        "enabled_transitions": col("enabled_transitions_in_marking"),
+        "activated_transitions": col("activated_transitions"),
+        "transitions_with_problems": col("transitions_with_problems"),
     })
-st.dataframe(pd.DataFrame(rows), use_container_width=True)
+    return ResultTable(frame, key=log_key, formatters={
+        "reached_marking": _fmt_marking_like,
+        "enabled_transitions": _fmt_seq_of_transitions,
+        "activated_transitions": _fmt_seq_of_transitions,
+        "transitions_with_problems": _fmt_seq_of_transitions,
+    })
+
+result_table(
+    metrics_table(run_key, replay_result), key="metrics_table", file_name="metricas_token_replay",
+    aggregates={"trace_fitness": "mean", "trace_is_fit": "mean", "missing": "sum", "remaining": "sum"},
+)
 
+cache_panel()
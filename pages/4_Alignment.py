@@ -7,61 +7,104 @@ completos retornados pela API do PM4Py.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, List, Optional, Union
 import io
 
 import pandas as pd
 import streamlit as st
 
-from pm4py.algo.conformance.alignments.petri_net import algorithm as alignments
 from pm4py.objects.conversion.log import converter as log_converter
+from pm4py.objects.log.obj import EventLog
 
-from replayviz.pm4py_model import build_net_N3
+from replayviz.utils_xes import log_source_key
+from replayviz.compute_cache import compute_cached
+from replayviz.result_store import get_result_store
+from replayviz.jobs import DONE, alignments_job, get_job_manager, job_key
+from replayviz.job_view import cache_panel, job_panel, poll_job
+from replayviz.filter_view import case_filter
+from replayviz.model_view import analysis_gate, select_model
+from replayviz.table_view import ResultTable, result_table
 
 
 st.set_page_config(page_title="Alignments — N₃", layout="wide")
 st.title("Alignments (N₃) — PM4Py")
 
+
+@compute_cached("log")
+def load_csv_log(log_key: Hashable, _src: Union[str, bytes]) -> EventLog:
+    """CSV (bytes/caminho) -> EventLog; no cache de cálculos do processo pela chave leve da fonte."""
+    df = pd.read_csv(io.BytesIO(_src) if isinstance(_src, bytes) else _src)
+    if "time:timestamp" in df.columns:
+        df["time:timestamp"] = pd.to_datetime(df["time:timestamp"])
+    return log_converter.apply(df)
+
+
 st.subheader("Seleção do Log (CSV)")
 uploaded = st.file_uploader("Carregue um CSV", type=["csv"])
 path_input = st.text_input("Ou caminho para um CSV existente", "")
 
-# Determina a origem do CSV e carrega em DataFrame
-df: Optional[pd.DataFrame] = None
-try:
-    if uploaded is not None:
-        df = pd.read_csv(io.BytesIO(uploaded.getvalue()))
-    elif path_input.strip():
-        df = pd.read_csv(path_input.strip())
-    else:
-        st.info("Carregue um CSV para prosseguir.")
-        st.stop()
-except Exception as e:  # pragma: no cover - mensagem ao usuário
-    st.error(f"Falha ao ler o CSV: {e}")
+# Determina a origem do CSV
+src: Optional[Union[str, bytes]]
+if uploaded is not None:
+    src = uploaded.getvalue()
+elif path_input.strip():
+    src = path_input.strip()
+else:
+    st.info("Carregue um CSV para prosseguir.")
     st.stop()
+log_key = log_source_key(uploaded, path_input.strip())
 
 # Converte para EventLog
 try:
-    if "time:timestamp" in df.columns:
-        df["time:timestamp"] = pd.to_datetime(df["time:timestamp"])
-    log = log_converter.apply(df)
+    log = load_csv_log(log_key, src)
     st.success(f"Log carregado (traços: {len(log)})")
 except Exception as e:  # pragma: no cover - mensagem ao usuário
-    st.error(f"Falha ao converter o log: {e}")
+    st.error(f"Falha ao carregar o log: {e}")
     st.stop()
 
-# Modelo normativo N3
-net, im, fm, _, _ = build_net_N3()
+# Filtro de casos (índice do log: bitmaps por atividade, tempos ordenados, variantes)
+log, log_key = case_filter(log, log_key)
+
+# Modelo normativo (N3 ou o editado na página 0); alignments em rede ilimitada
+# ou sem marcação final alcançável podem não terminar: recusa antes de submeter
+model = select_model()
+analysis_gate(model, refuse=True)
+net, im, fm, _, _ = model.as_tuple()
+
+# Execução dos alignments (em segundo plano; reruns reencontram o job pela chave)
+manager = get_job_manager()
+align_key = job_key(log_key, net, "alignments")
+# variantes já alinhadas (em qualquer log anterior) vêm do store em disco
+store = get_result_store()
+job = manager.submit(align_key, alignments_job, log, net, im, fm, store=store)
+job_panel(
+    job, "Alignments", key="alignments",
+    on_restart=lambda: manager.submit(align_key, alignments_job, log, net, im, fm, store=store, restart=True),
+)
+align_result = job.result if job.status == DONE else job.partial()
 
-# Execução dos alignments
-align_result = alignments.apply_log(log, net, im, fm)
+def _alignment_frame(results: List[Dict[str, Any]], key: Optional[Hashable] = None) -> ResultTable:
+    # inclui todos os campos retornados pela API (colunas brutas; o alignment é formatado por página)
+    frame = pd.DataFrame.from_records(results)
+    frame.insert(0, "trace", range(1, len(results) + 1))
+    return ResultTable(frame, key=key)
+
+
+@compute_cached("table")
+def alignment_table(align_key: Hashable, _results: List[Dict[str, Any]]) -> ResultTable:
+    return _alignment_frame(_results, key=align_key)
 
-rows: List[Dict[str, Any]] = []
-for i, res in enumerate(align_result, start=1):
-    row: Dict[str, Any] = {"trace": i}
-    # inclui todos os campos retornados pela API
-    row.update(res)
-    rows.append(row)
 
 st.subheader("Resultados dos Alignments")
-st.dataframe(pd.DataFrame(rows), use_container_width=True)
+# resultado completo fica no cache; o parcial (job em andamento) é remontado a cada rerun
+if job.status == DONE:
+    table = alignment_table(align_key, align_result)
+else:
+    table = _alignment_frame(align_result, key=(align_key, len(align_result)))
+result_table(
+    table, key="alignments_table", file_name="alignments",
+    aggregates={"fitness": "mean", "cost": "sum"} if {"fitness", "cost"} <= set(table.columns) else None,
+)
+
+cache_panel()
+poll_job(job)
@@ -1,28 +1,46 @@
 # -*- coding: utf-8 -*-
 """Página de relatório de conformidade usando token replay."""
 
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Hashable, Optional, Tuple, Union
 
 import pandas as pd
 import streamlit as st
 
-from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
 from pm4py.objects.log.obj import EventLog
 
-from replayviz.pm4py_model import build_net_N3, build_tiny_log
-from replayviz.utils_xes import read_xes_any
+from replayviz.utils_xes import load_event_log, log_source_key
+from replayviz.compute_cache import compute_cached
+from replayviz.result_store import get_result_store
+from replayviz.jobs import DONE, get_job_manager, job_key, token_replay_job
+from replayviz.job_view import cache_panel, job_panel, poll_job
+from replayviz.filter_view import case_filter
+from replayviz.variants import log_variants
+from replayviz.drift import CASE_TTL_WINDOWS, WindowedConformance, detect_drift, drift_frame
+from replayviz.streaming import log_event_stream
+from replayviz.summary import ConformanceSummary
+from replayviz.sampling import BY_TIME, BY_VARIANT, ConformanceSampler
+from replayviz.pm4py_model import net_structure_hash
+from replayviz.report import conformance_report, report_totals
+from replayviz.model_compiler import CompiledModel
+from replayviz.model_view import analysis_gate, select_model
+from replayviz.table_view import ResultTable, result_table
 
 
 st.set_page_config(page_title="Relatório – Conformidade", layout="wide")
 st.title("RELATÓRIO – CONFORMIDADE")
 
 
-@st.cache_data(show_spinner=False)
-def load_event_log_any(src: Optional[Union[str, bytes]]) -> EventLog:
-    """Carrega um log de eventos a partir de bytes/caminho ou exemplo."""
-    if src is None:
-        return build_tiny_log()
-    return read_xes_any(src)
+# janelas no cache de cálculos do processo (compartilhado entre sessões)
+@compute_cached("drift")
+def drift_table(
+    run_key: Hashable, size: float, step: Optional[float], baseline: int, _log: EventLog, _model: CompiledModel
+) -> pd.DataFrame:
+    """Métricas por janela + deriva, em uma passada pelos eventos em ordem de timestamp."""
+    monitor = WindowedConformance(
+        _model.net, _model.im, _model.fm, size=size, step=step, case_ttl=CASE_TTL_WINDOWS * size
+    )
+    results = list(detect_drift(monitor.feed(log_event_stream(_log)), baseline=baseline))
+    return drift_frame(results, len(monitor.model_activities), monitor)
 
 
 # -----------------------------
@@ -39,9 +57,11 @@ elif path_input.strip():
     src = path_input.strip()
 else:
     src = None
+log_key = log_source_key(uploaded, path_input.strip())
 
 try:
-    log: EventLog = load_event_log_any(src)
+    with st.spinner("Carregando log…"):
+        log: EventLog = load_event_log(log_key, src)
     if src is None:
         st.info(f"Usando log de demonstração (traços: {len(log)})")
     else:
@@ -50,12 +70,97 @@ except Exception as e:  # pragma: no cover - mensagem ao usuário
     st.error(f"Falha ao carregar o log: {e}")
     st.stop()
 
+# Filtro de casos (índice do log: bitmaps por atividade, tempos ordenados, variantes)
+log, log_key = case_filter(log, log_key)
+trie = log_variants(log_key, log)  # variantes do log (antes de um eventual corte parcial)
+
+
+# -----------------------------
+# Modo aproximado (amostragem estratificada com intervalos de confiança)
+# -----------------------------
+model = select_model()
+analysis_gate(model)
+net, im, fm, _, trans = model.as_tuple()
+run_key = (log_key, model.key)
+
+approx = st.toggle(
+    "Modo aproximado (amostragem)",
+    value=False,
+    help="Reproduz só uma amostra estratificada e mostra intervalos de confiança; útil em logs muito grandes.",
+)
+if approx:
+    c1, c2, c3, c4 = st.columns(4)
+    by = c1.selectbox("Estratos", ["variante", "tempo"], index=0)
+    target = c2.number_input("Erro (± fitness)", min_value=0.001, max_value=0.2, value=0.01, step=0.005, format="%.3f")
+    confidence = c3.selectbox("Confiança", [0.90, 0.95, 0.99], index=1)
+    with_align = c4.checkbox("Incluir alignments", value=False)
+
+    params = (run_key, by, confidence, with_align)
+    if st.session_state.get("report_sampler_key") != params:
+        try:
+            st.session_state["report_sampler"] = ConformanceSampler(
+                log, net, im, fm, sorted(trans),
+                by=BY_VARIANT if by == "variante" else BY_TIME,
+                confidence=confidence, alignments=with_align,
+            )
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        st.session_state["report_sampler_key"] = params
+        st.session_state["report_sampler_error"] = float(target)
+    sampler: ConformanceSampler = st.session_state["report_sampler"]
+    if st.button("Refinar (metade do erro atual)"):
+        st.session_state["report_sampler_error"] = sampler.report().estimates["fitness"].half_width / 2
+    error = min(float(target), st.session_state["report_sampler_error"])
+
+    with st.spinner("Amostrando…"):
+        rep = None
+        for rep in sampler.run(error=error, time_budget=3.0):
+            pass
+    labels = {
+        "fitness": "Fitness médio",
+        "fit_rate": "Traços aderentes",
+        "missing_rate": "Atividades ausentes",
+        "extra_rate": "Atividades extras",
+        "alignment_fitness": "Fitness (alignments)",
+    }
+    cols = st.columns(len(rep.estimates))
+    for col, (k, est) in zip(cols, rep.estimates.items()):
+        col.metric(labels.get(k, k), f"{est.value:.3f}", f"± {est.half_width:.3f}", delta_color="off")
+    st.dataframe(
+        pd.DataFrame(
+            [{"métrica": labels.get(k, k), "estimativa": e.value, "inferior": e.low, "superior": e.high}
+             for k, e in rep.estimates.items()]
+        ).round(4),
+        use_container_width=True,
+    )
+    st.caption(
+        f"Amostra: {rep.n_sampled} de {rep.n_total} traços ({rep.n_replayed} sequências reproduzidas), "
+        f"confiança {confidence:.0%}, {'erro atingido' if rep.converged else 'limite de tempo atingido — refine para continuar'}."
+    )
+    st.stop()
 
 # -----------------------------
-# Token replay
+# Token replay (em segundo plano; reruns reencontram o job pela chave)
 # -----------------------------
-net, im, fm, _, trans = build_net_N3()
-replay_result = token_based_replay.apply(log, net, im, fm)
+manager = get_job_manager()
+replay_key = job_key(log_key, net, "token_replay")
+store = get_result_store()
+job = manager.submit(replay_key, token_replay_job, log, net, im, fm, store=store)
+job_panel(
+    job, "Token replay", key="report_replay",
+    on_restart=lambda: manager.submit(replay_key, token_replay_job, log, net, im, fm, store=store, restart=True),
+)
+
+if job.status == DONE:
+    replay_result = job.result
+else:
+    # resultados parciais: relatório sobre os traços já reproduzidos
+    replay_result = job.partial()
+    if not replay_result:
+        poll_job(job)
+        st.stop()
+    log = EventLog(log[: len(replay_result)])
 
 
 def _name(obj: Any) -> str:
@@ -74,90 +179,77 @@ def _fmt_seq_of_transitions(seq: Any) -> str:
     return ", ".join(_name(x) for x in seq)
 
 
-variant_rows: List[Dict[str, Any]] = []
-for i, (r, tr) in enumerate(zip(replay_result, log), start=1):
-    variant = " → ".join(ev["concept:name"] for ev in tr)
-    variant_rows.append(
-        {
-            "trace": i,
-            "variant": variant,
-            "trace_is_fit": r.get("trace_is_fit"),
-            "trace_fitness": r.get("trace_fitness"),
-            "enabled_transitions": _fmt_seq_of_transitions(
-                r.get("enabled_transitions_in_marking")
-            ),
-        }
-    )
-
-df_variants_base = pd.DataFrame(variant_rows)
-
-
-def _mode_or_dash(s: pd.Series) -> str:
-    s = s.replace({None: pd.NA, "—": pd.NA})
-    m = s.mode(dropna=True)
-    return m.iloc[0] if not m.empty else "—"
-
-
-# Agregação por variante
-
-df_variants = (
-    df_variants_base.groupby("variant", dropna=False)
-    .agg(
-        frequency=("trace", "size"),
-        trace_fitness_mean=("trace_fitness", "mean"),
-        enabled_transitions_mode=("enabled_transitions", _mode_or_dash),
-    )
-    .reset_index()
-    .sort_values(["frequency"], ascending=[False])
-)
-
 # -----------------------------
 # Métricas de conformidade
 # -----------------------------
 model_activities = set(trans.keys())
 
+text_fields = {
+    "enabled_transitions_mode": ("enabled_transitions_in_marking", _fmt_seq_of_transitions),
+}
 
-def _missing_extra(variant: str) -> pd.Series:
-    acts = set(variant.split(" → ")) if variant else set()
-    missing = model_activities - acts
-    extra = acts - model_activities
-    return pd.Series(
-        {
-            "missing_abs": len(missing),
-            "extra_abs": len(extra),
-            "missing_percent": len(missing) / len(model_activities)
-            if model_activities
-            else 0.0,
-            "extra_percent": len(extra) / len(acts) if acts else 0.0,
-        }
-    )
-
-
-df_variants = df_variants.join(df_variants["variant"].apply(_missing_extra))
 
-for col in ["trace_fitness_mean", "missing_percent", "extra_percent"]:
-    df_variants[col] = df_variants[col].round(3)
+@st.cache_resource(show_spinner=False, max_entries=4)
+def log_summary(run_key: Hashable, _log: EventLog, _replay_result: Any) -> ConformanceSummary:
+    """Resumo mesclável do log atual (somas exatas por variante)."""
+    return ConformanceSummary.from_replay(
+        _log, _replay_result, net_structure_hash(net), model_activities, text_fields,
+        lc=trie.lc, vi=trie.index,
+    )
 
-# Agregações para o log inteiro
 
-total_traces = df_variants["frequency"].sum()
-variant_lengths = df_variants["variant"].apply(lambda s: len(s.split(" → ")) if s else 0)
+summary: Optional[ConformanceSummary] = None
+summary_key: Hashable = ("parcial", len(replay_result))  # identidade do resumo exibido
+if job.status == DONE:
+    summary_key = ("log", None)
+    summary = log_summary(run_key, log, replay_result)
+    # o log atual pode ser acrescentado a um resumo guardado (ex.: o lote do dia
+    # sobre o acumulado), sem reproduzir o histórico de novo
+    with st.expander("Resumo mesclável (incremental)"):
+        stored_file = st.file_uploader(
+            "Resumo guardado para mesclar com este log", type=["gz", "json"], key="stored_summary"
+        )
+        if stored_file is not None:
+            try:
+                summary = ConformanceSummary.loads(stored_file.getvalue()).merge(summary)
+                summary_key = ("mesclado", stored_file.file_id, stored_file.size)
+            except ValueError as e:
+                st.error(f"Resumo incompatível: {e}")
+                st.stop()
+            st.info(f"Relatório do resumo mesclado (traços: {summary.total_traces})")
+        st.download_button(
+            "Baixar resumo (.json.gz)",
+            data=summary.dumps(),
+            file_name="resumo_conformidade.json.gz",
+            mime="application/gzip",
+        )
+
+
+@compute_cached("table")
+def variants_report(
+    run_key: Hashable, summary_key: Hashable, _summary: Optional[ConformanceSummary], _log: EventLog, _replay_result: Any
+) -> Tuple[ResultTable, Dict[str, Any]]:
+    """Tabela colunar das variantes (as quatro seções) + totais, por execução e resumo."""
+    if _summary is not None:
+        df_variants = _summary.to_frame()
+        totals = _summary.totals()
+    else:
+        # parcial: agregação vetorizada por variante + ausentes/extras (máscaras de atividades)
+        df_variants = conformance_report(_log, _replay_result, model_activities, text_fields=text_fields)
+        totals = report_totals(df_variants, len(model_activities))
+    for col in ["trace_fitness_mean", "missing_percent", "extra_percent"]:
+        df_variants[col] = df_variants[col].round(3)
+    return ResultTable(df_variants, key=(run_key, summary_key)), totals
 
-total_missing = (df_variants["missing_abs"] * df_variants["frequency"]).sum()
-total_extra = (df_variants["extra_abs"] * df_variants["frequency"]).sum()
 
-global_missing_percent = (
-    total_missing / (len(model_activities) * total_traces) if total_traces else 0.0
-)
+variants_view, totals = variants_report(run_key, summary_key, summary, log, replay_result)
 
-total_events = (variant_lengths * df_variants["frequency"]).sum()
-global_extra_percent = total_extra / total_events if total_events else 0.0
-
-global_trace_fitness = (
-    (df_variants["trace_fitness_mean"] * df_variants["frequency"]).sum() / total_traces
-    if total_traces
-    else 0.0
-)
+# Agregações para o log inteiro (antes do arredondamento de exibição)
+total_missing = totals["total_missing"]
+total_extra = totals["total_extra"]
+global_missing_percent = totals["global_missing_percent"]
+global_extra_percent = totals["global_extra_percent"]
+global_trace_fitness = totals["global_trace_fitness"]
 
 # -----------------------------
 # Relatório
@@ -166,9 +258,9 @@ global_trace_fitness = (
 st.subheader(
     "Atividades que estão no modelo normativo mas não estão em uma variante do log"
 )
-st.dataframe(
-    df_variants[["variant", "frequency", "missing_abs", "missing_percent"]],
-    use_container_width=True,
+result_table(
+    variants_view, key="report_missing", file_name="variantes_missing",
+    columns=["variant", "frequency", "missing_abs", "missing_percent"],
 )
 st.write(
     f"Total: {total_missing} ({global_missing_percent:.3f}%) em relação a todas as variantes"
@@ -177,25 +269,61 @@ st.write(
 st.subheader(
     "Atividades que estão em uma variante do log mas não estão no modelo normativo"
 )
-st.dataframe(
-    df_variants[["variant", "frequency", "extra_abs", "extra_percent"]],
-    use_container_width=True,
+result_table(
+    variants_view, key="report_extra", file_name="variantes_extra",
+    columns=["variant", "frequency", "extra_abs", "extra_percent"],
 )
 st.write(
     f"Total: {total_extra} ({global_extra_percent:.3f}%) em relação a todas as variantes"
 )
 
 st.subheader("Fitness")
-st.dataframe(
-    df_variants[["variant", "frequency", "trace_fitness_mean"]],
-    use_container_width=True,
+result_table(
+    variants_view, key="report_fitness", file_name="variantes_fitness",
+    columns=["variant", "frequency", "trace_fitness_mean"],
 )
 st.write(f"Fitness médio do log: {global_trace_fitness:.3f}")
 
 st.subheader(
     "Atividades presentes nas variantes que foram 'by-passadas' no modelo normativo"
 )
-st.dataframe(
-    df_variants[["variant", "frequency", "enabled_transitions_mode"]],
-    use_container_width=True,
+result_table(
+    variants_view, key="report_bypassed", file_name="variantes_bypassed",
+    columns=["variant", "frequency", "enabled_transitions_mode"],
 )
+
+# -----------------------------
+# Deriva temporal (janelas de tempo)
+# -----------------------------
+WINDOW_SIZES = {"1 hora": 3600.0, "6 horas": 6 * 3600.0, "1 dia": 86400.0, "1 semana": 7 * 86400.0}
+
+st.subheader("Conformidade por janela de tempo")
+has_ts = bool(len(log)) and bool(len(log[0])) and "time:timestamp" in log[0][0]
+if job.status != DONE:
+    st.caption("Disponível quando o replay do log terminar.")
+elif not has_ts:
+    st.info("O log não tem 'time:timestamp'; métricas por janela indisponíveis.")
+else:
+    c1, c2, c3 = st.columns(3)
+    size = WINDOW_SIZES[c1.selectbox("Janela", list(WINDOW_SIZES), index=2)]
+    sliding = c2.toggle("Deslizante (passo = ½ janela)", value=False)
+    baseline = c3.number_input("Janelas na linha de base", min_value=1, value=5, step=1)
+    with st.spinner("Calculando janelas…"):
+        df_windows = drift_table(run_key, size, size / 2 if sliding else None, int(baseline), log, model)
+    if df_windows.empty:
+        st.info("Nenhuma janela com casos.")
+    else:
+        st.line_chart(
+            df_windows.set_index("start")[["fitness_mean", "fit_rate", "missing_rate", "extra_rate"]]
+        )
+        n_drift = int(df_windows["drift"].sum())
+        st.write(f"Janelas com deriva significativa: {n_drift} de {len(df_windows)}")
+        st.dataframe(
+            df_windows.round(3).style.apply(
+                lambda row: ["background-color: #fee2e2" if row["drift"] else ""] * len(row), axis=1
+            ),
+            use_container_width=True,
+        )
+
+cache_panel()
+poll_job(job)
@@ -1,7 +1,7 @@
 # replayviz/__init__.py
 
 # Modelo / PM4Py
-from .pm4py_model import build_tiny_log, build_net_N3
+from .pm4py_model import build_tiny_log, build_net_N3, build_net_from_flow_json, net_structure_hash
 
 # Marcações / utilidades puras
 from .markings import (
@@ -9,8 +9,11 @@ from .markings import (
     markings_along_trace, markings_equal, format_marking
 )
 
-# Visualização (N3)
+# Visualização (N3 e redes genéricas com layout em camadas)
+from .layout import layered_layout
 from .flowviz import (
+    build_nodes_edges_for_marking,
+    build_normative_flow,
     build_nodes_edges_for_marking_N3,
     build_normative_flow_N3,
     build_trace_flow,
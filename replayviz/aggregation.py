@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Agregação por variante (vetorizada).
+
+As atividades do log são internadas em códigos inteiros uma única vez; cada caso
+recebe um id de variante pelo hash da sua sequência de códigos. Frequência, taxa
+de fit, médias de fichas e modas dos campos textuais são calculadas com
+NumPy/pandas sobre esses ids, e as strings (variante, sequências de transições)
+são formatadas uma vez por valor distinto — não uma vez por caso.
+"""
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pm4py.objects.log.obj import EventLog
+
+VARIANT_SEP = " → "
+EMPTY = "—"
+
+
+class LogCodes(NamedTuple):
+    codes: np.ndarray        # int32, códigos de atividade de todos os eventos (casos concatenados)
+    offsets: np.ndarray      # int64, len = n_casos + 1; caso i = codes[offsets[i]:offsets[i+1]]
+    activities: List[str]    # código -> nome da atividade
+
+
+class VariantIndex(NamedTuple):
+    case_variant: np.ndarray  # int64, id da variante de cada caso
+    first_case: np.ndarray    # int64, caso representante de cada variante
+    frequency: np.ndarray     # int64, casos por variante
+
+
+def encode_log(log: EventLog, key: str = "concept:name") -> LogCodes:
+    """Interna as atividades do log em códigos inteiros (uma passada pelos eventos)."""
+    vocab: Dict[str, int] = {}
+    codes: List[int] = []
+    offsets = np.zeros(len(log) + 1, dtype=np.int64)
+    for i, tr in enumerate(log):
+        for ev in tr:
+            codes.append(vocab.setdefault(ev[key], len(vocab)))
+        offsets[i + 1] = len(codes)
+    activities = [""] * len(vocab)
+    for name, c in vocab.items():
+        activities[c] = name
+    return LogCodes(np.asarray(codes, dtype=np.int32), offsets, activities)
+
+
+def case_codes(lc: LogCodes, case: int) -> np.ndarray:
+    return lc.codes[lc.offsets[case]:lc.offsets[case + 1]]
+
+
+def variant_index(lc: LogCodes) -> VariantIndex:
+    """Agrupa casos por variante (hash exato da sequência de códigos)."""
+    n_cases = len(lc.offsets) - 1
+    ids: Dict[bytes, int] = {}
+    case_variant = np.empty(n_cases, dtype=np.int64)
+    first: List[int] = []
+    raw = lc.codes
+    offs = lc.offsets.tolist()
+    for i in range(n_cases):
+        k = raw[offs[i]:offs[i + 1]].tobytes()
+        v = ids.get(k)
+        if v is None:
+            v = ids[k] = len(first)
+            first.append(i)
+        case_variant[i] = v
+    frequency = np.bincount(case_variant, minlength=len(first)).astype(np.int64)
+    return VariantIndex(case_variant, np.asarray(first, dtype=np.int64), frequency)
+
+
+def variant_labels(lc: LogCodes, vi: VariantIndex, sep: str = VARIANT_SEP) -> List[str]:
+    """String de cada variante (formatada uma vez por variante)."""
+    acts = lc.activities
+    return [sep.join(acts[c] for c in case_codes(lc, int(i)).tolist()) for i in vi.first_case]
+
+
+def _group_mean(case_variant: np.ndarray, values: np.ndarray, n_variants: int) -> np.ndarray:
+    """Média por variante ignorando NaN (como pandas .mean())."""
+    ok = ~np.isnan(values)
+    sums = np.bincount(case_variant[ok], weights=values[ok], minlength=n_variants)
+    cnts = np.bincount(case_variant[ok], minlength=n_variants)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(cnts > 0, sums / np.maximum(cnts, 1), np.nan)
+
+
+def _numeric(replay_result: Sequence[Mapping[str, Any]], key: str) -> np.ndarray:
+    return np.fromiter(
+        (np.nan if (v := r.get(key)) is None else float(v) for r in replay_result),
+        dtype=np.float64, count=len(replay_result),
+    )
+
+
+def _raw_key(val: Any) -> Any:
+    if val is None:
+        return None
+    if isinstance(val, (set, frozenset)):
+        return ("set", frozenset(val))
+    if isinstance(val, (list, tuple)):
+        return ("seq", tuple(val))
+    return ("obj", val)
+
+
+def _text_mode(
+    case_variant: np.ndarray,
+    raw_values: Sequence[Any],
+    formatter: Callable[[Any], str],
+    n_variants: int,
+) -> List[str]:
+    """
+    Moda por variante de um campo textual, formatando cada valor distinto uma vez.
+    Vazios ('—'/None) são ignorados; empates resolvem pelo menor texto (como Series.mode).
+    """
+    keys: Dict[Any, int] = {}
+    texts: List[str] = []
+    codes = np.empty(len(raw_values), dtype=np.int64)
+    for i, val in enumerate(raw_values):
+        try:
+            k = _raw_key(val)
+            c = keys.get(k)
+        except TypeError:  # valor não-hasheável: usa o próprio texto como chave
+            k = ("txt", formatter(val))
+            c = keys.get(k)
+        if c is None:
+            c = keys[k] = len(texts)
+            texts.append(formatter(val) if val is not None else EMPTY)
+        codes[i] = c
+
+    # texto -> código canônico (valores brutos diferentes podem gerar o mesmo texto)
+    canon: Dict[str, int] = {}
+    for t in sorted(set(texts)):
+        canon[t] = len(canon)
+    canon_texts = sorted(canon, key=canon.__getitem__)
+    text_code = np.asarray([canon[t] for t in texts], dtype=np.int64)[codes] if len(codes) else codes
+    empty = canon.get(EMPTY, -1)
+    valid = text_code != empty
+
+    out = [EMPTY] * n_variants
+    if not valid.any():
+        return out
+    df = pd.DataFrame({"v": case_variant[valid], "t": text_code[valid]})
+    counts = df.value_counts().reset_index(name="n")
+    # maior contagem primeiro; no empate, menor texto (códigos canônicos seguem a ordem do texto)
+    counts = counts.sort_values(["v", "n", "t"], ascending=[True, False, True], kind="mergesort")
+    best = counts.drop_duplicates("v")
+    for v, t in zip(best["v"].to_numpy(), best["t"].to_numpy()):
+        out[int(v)] = canon_texts[int(t)]
+    return out
+
+
+def aggregate_variants(
+    log: EventLog,
+    replay_result: Sequence[Mapping[str, Any]],
+    text_fields: Optional[Mapping[str, Tuple[str, Callable[[Any], str]]]] = None,
+    numeric_fields: Optional[Mapping[str, str]] = None,
+    lc: Optional[LogCodes] = None,
+    vi: Optional[VariantIndex] = None,
+) -> pd.DataFrame:
+    """
+    Tabela por variante: variant, frequency, fit_rate, trace_fitness_mean, <numeric>_mean
+    e <text>_mode, ordenada por frequência e fitness (decrescentes).
+
+    - `numeric_fields`: {coluna: chave do resultado do replay} (médias por variante).
+    - `text_fields`: {coluna: (chave do resultado do replay, formatador)} (modas).
+    """
+    if lc is None:
+        lc = encode_log(log)
+    if vi is None:
+        vi = variant_index(lc)
+    n_var = len(vi.first_case)
+    cv = vi.case_variant
+
+    data: Dict[str, Any] = {
+        "variant_id": np.arange(n_var, dtype=np.int64),
+        "variant": variant_labels(lc, vi),
+        "frequency": vi.frequency,
+        "fit_rate": _group_mean(cv, _numeric(replay_result, "trace_is_fit"), n_var),
+        "trace_fitness_mean": _group_mean(cv, _numeric(replay_result, "trace_fitness"), n_var),
+    }
+    for col, key in (numeric_fields or {}).items():
+        data[col] = _group_mean(cv, _numeric(replay_result, key), n_var)
+    for col, (key, formatter) in (text_fields or {}).items():
+        data[col] = _text_mode(cv, [r.get(key) for r in replay_result], formatter, n_var)
+
+    return (
+        pd.DataFrame(data)
+          .sort_values(["frequency", "trace_fitness_mean", "variant"], ascending=[False, False, True], kind="mergesort")
+          .reset_index(drop=True)
+    )
+
+
+# ----------------------------------------------------------------------
+# Atividades ausentes/extras por variante (máscaras de bits)
+# ----------------------------------------------------------------------
+
+# acima disso a matriz variante × atividade é empacotada em bits (np.packbits)
+PACKED_ACTIVITY_THRESHOLD = 512
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def variant_lengths(lc: LogCodes, vi: VariantIndex) -> np.ndarray:
+    """Número de eventos de cada variante."""
+    return (lc.offsets[vi.first_case + 1] - lc.offsets[vi.first_case]).astype(np.int64)
+
+
+def _variant_events(lc: LogCodes, vi: VariantIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """(linha da variante, código) de todos os eventos dos casos representantes."""
+    lengths = variant_lengths(lc, vi)
+    rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    starts = np.repeat(lc.offsets[vi.first_case], lengths)
+    within = np.arange(len(rows), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return rows, lc.codes[starts + within].astype(np.int64)
+
+
+def _popcount_rows(packed: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(packed).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT[packed].sum(axis=1, dtype=np.int64)
+
+
+def activity_masks(
+    lc: LogCodes,
+    vi: VariantIndex,
+    model_activities: Sequence[str],
+    packed: Optional[bool] = None,
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Conjunto de atividades de cada variante e do modelo sobre o vocabulário
+    log ∪ modelo: matriz booleana (n_variantes × n_atividades) e máscara do modelo,
+    ou — com muitas atividades — as mesmas linhas empacotadas em bits (uint8).
+    Devolve (matriz, máscara_modelo, empacotado).
+    """
+    vocab = {a: i for i, a in enumerate(lc.activities)}
+    model_codes = [vocab.setdefault(a, len(vocab)) for a in dict.fromkeys(model_activities)]
+    n_act = len(vocab)
+    if packed is None:
+        packed = n_act > PACKED_ACTIVITY_THRESHOLD
+    rows, codes = _variant_events(lc, vi)
+    n_var = len(vi.first_case)
+
+    if not packed:
+        mat = np.zeros((n_var, n_act), dtype=bool)
+        mat[rows, codes] = True
+        mask = np.zeros(n_act, dtype=bool)
+        mask[model_codes] = True
+        return mat, mask, False
+
+    n_bytes = (n_act + 7) // 8
+    mat = np.zeros((n_var, n_bytes), dtype=np.uint8)
+    np.bitwise_or.at(mat, (rows, codes >> 3), (128 >> (codes & 7)).astype(np.uint8))
+    mask = np.zeros(n_bytes, dtype=np.uint8)
+    mc = np.asarray(model_codes, dtype=np.int64)
+    np.bitwise_or.at(mask, mc >> 3, (128 >> (mc & 7)).astype(np.uint8))
+    return mat, mask, True
+
+
+def missing_extra_metrics(
+    lc: LogCodes,
+    vi: VariantIndex,
+    model_activities: Sequence[str],
+    packed: Optional[bool] = None,
+) -> pd.DataFrame:
+    """
+    Por variante (índice = variant_id): missing_abs/extra_abs (atividades do modelo
+    ausentes na variante / da variante ausentes no modelo), missing_percent,
+    extra_percent e length (eventos). Tudo por operações vetorizadas sobre as máscaras.
+    """
+    mat, mask, is_packed = activity_masks(lc, vi, model_activities, packed)
+    if is_packed:
+        missing = _popcount_rows(~mat & mask)
+        extra = _popcount_rows(mat & ~mask)
+        n_acts = _popcount_rows(mat)
+        n_model = int(_POPCOUNT[mask].sum())
+    else:
+        missing = (~mat & mask).sum(axis=1, dtype=np.int64)
+        extra = (mat & ~mask).sum(axis=1, dtype=np.int64)
+        n_acts = mat.sum(axis=1, dtype=np.int64)
+        n_model = int(mask.sum())
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        extra_pct = np.where(n_acts > 0, extra / np.maximum(n_acts, 1), 0.0)
+    return pd.DataFrame(
+        {
+            "missing_abs": missing,
+            "extra_abs": extra,
+            "missing_percent": missing / n_model if n_model else np.zeros(len(missing)),
+            "extra_percent": extra_pct,
+            "length": variant_lengths(lc, vi),
+        },
+        index=pd.RangeIndex(len(missing), name="variant_id"),
+    )
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Análise estrutural de modelos antes do replay/alignments.
+
+- estrutura de workflow net: um único lugar de entrada (sem arcos de entrada),
+  um único lugar de saída (sem arcos de saída) e todo nó num caminho entre eles;
+- limitação (boundedness): grafo de cobertura de Karp–Miller com orçamento de
+  estados; lugares ilimitados recebem ω;
+- transições mortas: as que não rotulam nenhuma aresta do grafo de cobertura;
+- opção de completar e término adequado: no grafo de alcançabilidade (quando a
+  rede é limitada e o grafo foi explorado até o fim dentro do orçamento).
+
+Sound (clássico) = workflow net + opção de completar + término adequado + sem
+transições mortas. Com orçamento esgotado as respostas ficam `None` (indefinidas).
+
+Os resultados são memorizados pelo hash estrutural da rede (+ marcações e
+orçamento): voltar a uma versão já analisada do modelo (editar/desfazer na
+página 0) não refaz a exploração.
+"""
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import time
+
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .model_compiler import CompiledModel
+from .pm4py_model import net_structure_hash
+
+OMEGA = 1 << 62          # ω: fichas ilimitadas (comparações <= continuam válidas)
+DEFAULT_BUDGET = 50_000  # estados do grafo de cobertura
+INTERACTIVE_BUDGET = 5_000  # páginas: < 1 s mesmo em redes muito paralelas (o grafo cresce rápido)
+MEMO_SIZE = 64
+MAX_EXAMPLES = 5
+
+Vec = Tuple[int, ...]
+
+
+class AnalysisResult(NamedTuple):
+    is_workflow_net: bool
+    wf_problems: List[str]
+    source: Optional[str]
+    sink: Optional[str]
+    states: int
+    complete: bool                    # grafo explorado até o fim dentro do orçamento
+    bounded: Optional[bool]
+    unbounded_places: List[str]
+    dead_transitions: List[str]       # rótulo (ou nome, se invisível)
+    option_to_complete: Optional[bool]
+    proper_completion: Optional[bool]
+    deadlocks: List[str]              # exemplos de marcações sem saída (≠ final)
+    sound: Optional[bool]
+    seconds: float
+
+    @property
+    def safe_to_replay(self) -> bool:
+        """Replay/alignments terminam em tempo razoável: rede limitada e final alcançável."""
+        return self.bounded is not False and self.option_to_complete is not False
+
+    def messages(self) -> List[str]:
+        """Avisos legíveis (vazio = nada a reportar)."""
+        out: List[str] = []
+        if not self.is_workflow_net:
+            out.append("Não é workflow net: " + "; ".join(self.wf_problems))
+        if self.bounded is False:
+            out.append(f"Rede ilimitada (lugares com ω: {', '.join(self.unbounded_places)}).")
+        if not self.complete:
+            out.append(f"Orçamento de {self.states} estados esgotado: limitação/soundness indefinidas.")
+        if self.dead_transitions and self.complete:
+            out.append(f"Transições mortas: {', '.join(self.dead_transitions)}.")
+        if self.option_to_complete is False:
+            detail = f" (ex.: {'; '.join(self.deadlocks)})" if self.deadlocks else ""
+            out.append("Nem toda marcação alcançável consegue chegar à marcação final" + detail + ".")
+        if self.proper_completion is False:
+            out.append("Término inadequado: marcação final alcançada com fichas sobrando.")
+        return out
+
+
+# ----------------------------------------------------------------------
+# Estrutura
+# ----------------------------------------------------------------------
+
+def workflow_net_check(net: PetriNet) -> Tuple[bool, List[str], Optional[str], Optional[str]]:
+    """(ok, problemas, lugar de entrada, lugar de saída) em O(V + E)."""
+    problems: List[str] = []
+    sources = sorted(p.name for p in net.places if not p.in_arcs)
+    sinks = sorted(p.name for p in net.places if not p.out_arcs)
+    if len(sources) != 1:
+        problems.append(f"{len(sources)} lugares de entrada ({', '.join(sources) or 'nenhum'}); esperado 1")
+    if len(sinks) != 1:
+        problems.append(f"{len(sinks)} lugares de saída ({', '.join(sinks) or 'nenhum'}); esperado 1")
+    source = sources[0] if len(sources) == 1 else None
+    sink = sinks[0] if len(sinks) == 1 else None
+    if source is not None and sink is not None:
+        by_name = {p.name: p for p in net.places}
+
+        def reach(start, forward: bool) -> set:
+            seen = {start}
+            stack = [start]
+            while stack:
+                x = stack.pop()
+                for a in (x.out_arcs if forward else x.in_arcs):
+                    y = a.target if forward else a.source
+                    if y not in seen:
+                        seen.add(y)
+                        stack.append(y)
+            return seen
+
+        on_path = reach(by_name[source], True) & reach(by_name[sink], False)
+        off = sorted(
+            {x.name if isinstance(x, PetriNet.Place) else (x.label or x.name)
+             for x in list(net.places) + list(net.transitions) if x not in on_path}
+        )
+        if off:
+            shown = ", ".join(off[:10]) + (" …" if len(off) > 10 else "")
+            problems.append(f"{len(off)} nó(s) fora de um caminho entrada→saída ({shown})")
+    return not problems, problems, source, sink
+
+
+# ----------------------------------------------------------------------
+# Grafo de cobertura (Karp–Miller)
+# ----------------------------------------------------------------------
+
+class _Indexed(NamedTuple):
+    places: List[str]
+    names: List[str]                          # rótulo ou nome de cada transição
+    pre: List[Tuple[Tuple[int, int], ...]]
+    post: List[Tuple[Tuple[int, int], ...]]
+
+
+def _index(net: PetriNet) -> _Indexed:
+    places = sorted(p.name for p in net.places)
+    idx = {name: i for i, name in enumerate(places)}
+    trans = sorted(net.transitions, key=lambda t: t.name)
+    pre = [tuple(sorted((idx[a.source.name], int(getattr(a, "weight", 1))) for a in t.in_arcs)) for t in trans]
+    post = [tuple(sorted((idx[a.target.name], int(getattr(a, "weight", 1))) for a in t.out_arcs)) for t in trans]
+    return _Indexed(places, [t.label if t.label is not None else t.name for t in trans], pre, post)
+
+
+def _vec(m: Marking, idx: Dict[str, int], n: int) -> Vec:
+    v = [0] * n
+    for p, k in m.items():
+        v[idx[p.name]] = int(k)
+    return tuple(v)
+
+
+def _fire(m: Vec, pre, post) -> Optional[List[int]]:
+    for p, w in pre:
+        if m[p] < w:
+            return None
+    out = list(m)
+    for p, w in pre:
+        if out[p] < OMEGA:
+            out[p] -= w
+    for p, w in post:
+        if out[p] < OMEGA:
+            out[p] = min(OMEGA, out[p] + w)
+    return out
+
+
+def _format(m: Vec, places: Sequence[str]) -> str:
+    parts = [f"{places[i]}:{'ω' if k >= OMEGA else k}" for i, k in enumerate(m) if k]
+    return "[" + ", ".join(parts) + "]"
+
+
+def analyze(net: PetriNet, im: Marking, fm: Marking, budget: int = DEFAULT_BUDGET) -> AnalysisResult:
+    """Análise completa (sem memo; ver `analyze_cached`)."""
+    t0 = time.perf_counter()
+    is_wf, wf_problems, source, sink = workflow_net_check(net)
+    ix = _index(net)
+    n = len(ix.places)
+    pidx = {name: i for i, name in enumerate(ix.places)}
+    m0 = _vec(im, pidx, n)
+    final = _vec(fm, pidx, n)
+
+    states: Dict[Vec, int] = {m0: 0}
+    markings: List[Vec] = [m0]
+    parent: List[int] = [-1]
+    succ: List[List[Tuple[int, int]]] = [[]]
+    fired = [False] * len(ix.names)
+    queue = deque([0])
+    complete = True
+    while queue:
+        s = queue.popleft()
+        m = markings[s]
+        for t, (pre, post) in enumerate(zip(ix.pre, ix.post)):
+            nxt = _fire(m, pre, post)
+            if nxt is None:
+                continue
+            fired[t] = True
+            # aceleração: ancestral coberto estritamente => ω nos lugares que cresceram
+            a = s
+            while a >= 0:
+                anc = markings[a]
+                if all(x <= y for x, y in zip(anc, nxt)) and any(x < y for x, y in zip(anc, nxt)):
+                    for i, (x, y) in enumerate(zip(anc, nxt)):
+                        if x < y:
+                            nxt[i] = OMEGA
+                a = parent[a]
+            key = tuple(nxt)
+            j = states.get(key)
+            if j is None:
+                if len(markings) >= budget:
+                    complete = False
+                    queue.clear()
+                    break
+                j = states[key] = len(markings)
+                markings.append(key)
+                parent.append(s)
+                succ.append([])
+                queue.append(j)
+            succ[s].append((t, j))
+
+    unbounded = sorted({ix.places[i] for m in markings for i, k in enumerate(m) if k >= OMEGA})
+    bounded: Optional[bool] = False if unbounded else (True if complete else None)
+    dead = sorted({ix.names[t] for t, f in enumerate(fired) if not f}) if complete else []
+
+    option: Optional[bool] = None
+    proper: Optional[bool] = None
+    deadlocks: List[str] = []
+    if bounded:
+        # alcançabilidade reversa a partir dos estados finais
+        pred: List[List[int]] = [[] for _ in markings]
+        for s, edges in enumerate(succ):
+            for _, j in edges:
+                pred[j].append(s)
+        ok = [False] * len(markings)
+        stack = [s for s, m in enumerate(markings) if m == final]
+        for s in stack:
+            ok[s] = True
+        while stack:
+            j = stack.pop()
+            for s in pred[j]:
+                if not ok[s]:
+                    ok[s] = True
+                    stack.append(s)
+        option = all(ok)
+        deadlocks = [_format(m, ix.places) for s, m in enumerate(markings) if not succ[s] and m != final][:MAX_EXAMPLES]
+        proper = not any(
+            m != final and all(x >= y for x, y in zip(m, final)) for m in markings
+        )
+
+    sound: Optional[bool]
+    if not is_wf or bounded is False or option is False or proper is False or (complete and dead):
+        sound = False
+    elif bounded and option and proper and not dead:
+        sound = True
+    else:
+        sound = None
+    return AnalysisResult(
+        is_wf, wf_problems, source, sink, len(markings), complete, bounded, unbounded, dead,
+        option, proper, deadlocks, sound, time.perf_counter() - t0,
+    )
+
+
+# ----------------------------------------------------------------------
+# Memo por hash estrutural
+# ----------------------------------------------------------------------
+
+_MEMO: "OrderedDict[Tuple, AnalysisResult]" = OrderedDict()
+_LOCK = Lock()
+
+
+def _memo_get(key: Tuple) -> Optional[AnalysisResult]:
+    with _LOCK:
+        res = _MEMO.get(key)
+        if res is not None:
+            _MEMO.move_to_end(key)
+        return res
+
+
+def _memo_put(key: Tuple, res: AnalysisResult) -> None:
+    with _LOCK:
+        _MEMO[key] = res
+        _MEMO.move_to_end(key)
+        while len(_MEMO) > MEMO_SIZE:
+            _MEMO.popitem(last=False)
+
+
+def analysis_key(net: PetriNet, im: Marking, fm: Marking, budget: int) -> Tuple:
+    return (
+        net_structure_hash(net),
+        tuple(sorted((p.name, int(k)) for p, k in im.items())),
+        tuple(sorted((p.name, int(k)) for p, k in fm.items())),
+        budget,
+    )
+
+
+def analyze_cached(net: PetriNet, im: Marking, fm: Marking, budget: int = DEFAULT_BUDGET) -> AnalysisResult:
+    """`analyze` memorizado por hash estrutural (processo inteiro, LRU)."""
+    key = analysis_key(net, im, fm, budget)
+    res = _memo_get(key)
+    if res is None:
+        res = analyze(net, im, fm, budget)
+        _memo_put(key, res)
+    return res
+
+
+def analyze_model(model: CompiledModel, budget: int = DEFAULT_BUDGET) -> AnalysisResult:
+    """Atalho para `CompiledModel`: a chave do memo é o hash do conteúdo já calculado."""
+    key = (model.key, budget)
+    res = _memo_get(key)
+    if res is None:
+        res = analyze_cached(model.net, model.im, model.fm, budget)
+        _memo_put(key, res)
+    return res
+
+
+def memo_clear() -> None:
+    with _LOCK:
+        _MEMO.clear()
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+Conformidade em lote, sem interface: token replay (+ alignments opcionais) e as
+métricas do relatório (página 5) sobre um conjunto de logs XES/CSV.
+
+Uso:
+    python -m replayviz.batch logs/ outro.xes --model N3 --out resultados/
+    python -m replayviz.batch logs/ --model modelo_normativo.json --alignments -j 4
+
+Cada log é processado em um processo do pool (reciclado a cada
+`--max-tasks-per-child` logs; `--max-memory-mb` limita o espaço de endereços de
+cada processo). Por log são gravados `<nome>.variants.parquet|json`,
+`<nome>.summary.json.gz` (resumo mesclável) e `<nome>.json` (métricas + chave
+de execução); `summary.json` consolida tudo e `merged.summary.json.gz` mescla
+os resumos de todos os logs.
+Logs cuja chave (arquivo, tamanho, mtime, modelo, opções) já tem resultado no
+diretório de saída são pulados — uma execução interrompida retoma de onde parou.
+Replay e alignments passam pelo store de resultados (`--store`, SQLite): uma
+variante já calculada, em qualquer log ou execução anterior, não é recalculada.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .aggregation import encode_log, variant_index
+from .model_compiler import load_flow_file, n3_compiled
+from .pm4py_model import net_structure_hash
+from .report import conformance_report, report_totals
+from .result_store import ALIGNMENTS, DEFAULT_PATH, TOKEN_REPLAY, ResultStore, VariantResults
+from .summary import ConformanceSummary, merge_summaries
+from .utils_xes import read_xes_any
+
+LOG_SUFFIXES = (".xes", ".xes.gz", ".csv")
+SUMMARY_FILE = "summary.json"
+MERGED_SUMMARY_FILE = "merged.summary.json.gz"
+
+Model = Tuple[PetriNet, Marking, Marking, Dict[str, PetriNet.Place], Dict[str, PetriNet.Transition]]
+
+# modelo já construído neste processo (um por worker, reaproveitado entre logs)
+_MODEL_CACHE: Dict[str, Model] = {}
+_STORE_CACHE: Dict[str, ResultStore] = {}
+
+
+# ----------------------------------------------------------------------
+# Entradas
+# ----------------------------------------------------------------------
+
+def _is_log(path: Path) -> bool:
+    return path.name.lower().endswith(LOG_SUFFIXES)
+
+
+def discover_logs(inputs: Sequence[str], recursive: bool = False) -> List[Path]:
+    """Arquivos de log (XES/XES.GZ/CSV) a partir de arquivos e diretórios, sem repetição."""
+    found: Dict[Path, None] = {}
+    for item in inputs:
+        p = Path(item)
+        if p.is_dir():
+            it = p.rglob("*") if recursive else p.iterdir()
+            for f in sorted(it):
+                if f.is_file() and _is_log(f):
+                    found[f.resolve()] = None
+        elif p.is_file():
+            found[p.resolve()] = None
+        else:
+            raise FileNotFoundError(f"Entrada não encontrada: {item}")
+    return list(found)
+
+
+def load_model(spec: str) -> Model:
+    """'N3' (modelo embutido) ou caminho de um JSON exportado pela página 0."""
+    model = _MODEL_CACHE.get(spec)
+    if model is None:
+        if spec.upper() == "N3":
+            model = n3_compiled().as_tuple()
+        else:
+            model = load_flow_file(spec).as_tuple()
+        _MODEL_CACHE[spec] = model
+    return model
+
+
+def model_activities(trans: Dict[str, PetriNet.Transition]) -> List[str]:
+    """Rótulos das transições visíveis do modelo."""
+    return sorted({t.label for t in trans.values() if t.label is not None})
+
+
+def load_log(path: Path) -> EventLog:
+    if path.name.lower().endswith(".csv"):
+        from pm4py.objects.conversion.log import converter as log_converter
+
+        df = pd.read_csv(path)
+        if "time:timestamp" in df.columns:
+            df["time:timestamp"] = pd.to_datetime(df["time:timestamp"])
+        return log_converter.apply(df)
+    return read_xes_any(str(path))
+
+
+# ----------------------------------------------------------------------
+# Processamento de um log (executa dentro do worker)
+# ----------------------------------------------------------------------
+
+def _output_name(path: Path) -> str:
+    """Nome estável e sem colisão para logs homônimos em diretórios diferentes."""
+    stem = path.name
+    for suf in LOG_SUFFIXES:
+        if stem.lower().endswith(suf):
+            stem = stem[: -len(suf)]
+            break
+    digest = hashlib.blake2b(str(path).encode("utf-8"), digest_size=4).hexdigest()
+    return f"{stem}-{digest}"
+
+
+def run_key(path: Path, model_hash: str, options: Dict[str, Any]) -> str:
+    st_ = path.stat()
+    raw = json.dumps(
+        [str(path), st_.st_size, st_.st_mtime_ns, model_hash, options], sort_keys=True
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(target: Path, write) -> None:
+    tmp = target.with_name(target.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, target)
+
+
+def get_store(path: Optional[str]) -> Optional[ResultStore]:
+    """Store de resultados do worker (um por caminho, reaproveitado entre logs)."""
+    if not path:
+        return None
+    store = _STORE_CACHE.get(path)
+    if store is None:
+        store = _STORE_CACHE[path] = ResultStore(path)
+    return store
+
+
+def _align_variants(
+    log: EventLog, case_idx: Sequence[int], net, im, fm, store: Optional[ResultStore] = None
+) -> Tuple[List[float], List[float]]:
+    """Alignment de um caso representante por variante (o resultado vale para a variante inteira)."""
+    from pm4py.algo.conformance.alignments.petri_net import algorithm as alignments
+
+    reps = EventLog([log[int(i)] for i in case_idx])
+    results = VariantResults(store, net, ALIGNMENTS).resolve(
+        reps, lambda part: [alignments.apply_trace(t, net, im, fm) for t in part]
+    )
+    fitness, cost = [], []
+    for res in results:
+        fitness.append(float(res.get("fitness", float("nan"))) if res else float("nan"))
+        cost.append(float(res.get("cost", float("nan"))) if res else float("nan"))
+    return fitness, cost
+
+
+def process_log(
+    path: str, model_spec: str, out_dir: str, options: Dict[str, Any], store_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Replay + relatório de um log; grava as saídas e devolve a entrada do summary.
+    Com `store_path`, replay e alignments são lidos/gravados por variante no
+    store de resultados (variantes vistas em logs anteriores não são recalculadas).
+    """
+    from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
+
+    t0 = time.perf_counter()
+    src, out = Path(path), Path(out_dir)
+    net, im, fm, _, trans = load_model(model_spec)
+    acts = model_activities(trans)
+    name = _output_name(src)
+    model_hash = net_structure_hash(net)
+    key = run_key(src, model_hash, options)
+
+    log = load_log(src)
+    store = get_store(store_path)
+    lc = encode_log(log)
+    vi = variant_index(lc)
+    replay_result = VariantResults(store, net, TOKEN_REPLAY, model_hash=model_hash).resolve(
+        log, lambda part: token_based_replay.apply(part, net, im, fm), lc=lc, vi=vi
+    )
+    df = conformance_report(log, replay_result, acts, lc=lc, vi=vi)
+    totals = report_totals(df, len(acts))
+
+    if options.get("alignments"):
+        # df está ordenado por frequência; o caso representante vem de vi.first_case
+        fitness, cost = _align_variants(log, vi.first_case[df["variant_id"].to_numpy()], net, im, fm, store)
+        df["alignment_fitness"] = fitness
+        df["alignment_cost"] = cost
+        freq = df["frequency"]
+        n = freq.sum()
+        totals["alignment_fitness"] = float((df["alignment_fitness"] * freq).sum() / n) if n else 0.0
+        totals["alignment_cost"] = float((df["alignment_cost"] * freq).sum() / n) if n else 0.0
+
+    if store is not None:
+        store.flush()
+
+    fmt = options.get("format", "parquet")
+    variants_file = out / f"{name}.variants.{fmt}"
+    if fmt == "parquet":
+        _write_atomic(variants_file, lambda p: df.to_parquet(p, index=False))
+    else:
+        _write_atomic(
+            variants_file,
+            lambda p: df.to_json(p, orient="records", force_ascii=False, indent=1),
+        )
+
+    # resumo mesclável do log (somas exatas por variante)
+    summary_file = out / f"{name}.summary.json.gz"
+    summary = ConformanceSummary.from_replay(log, replay_result, model_hash, acts, lc=lc, vi=vi)
+    _write_atomic(summary_file, lambda p: p.write_bytes(summary.dumps()))
+
+    entry = {
+        "log": str(src),
+        "name": name,
+        "key": key,
+        "status": "ok",
+        "variants_file": variants_file.name,
+        "summary_file": summary_file.name,
+        "metrics": totals,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    # o JSON de métricas é gravado por último: a presença dele marca o log como concluído
+    _write_atomic(
+        out / f"{name}.json",
+        lambda p: p.write_text(json.dumps(entry, ensure_ascii=False, indent=2), encoding="utf-8"),
+    )
+    return entry
+
+
+def _done_entry(path: Path, out: Path, key: str) -> Optional[Dict[str, Any]]:
+    meta = out / f"{_output_name(path)}.json"
+    try:
+        entry = json.loads(meta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if entry.get("key") != key:
+        return None
+    if not all((out / entry.get(f, "")).is_file() for f in ("variants_file", "summary_file")):
+        return None
+    return entry
+
+
+def _init_worker(max_memory_mb: Optional[int]) -> None:
+    if not max_memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows: sem limite por processo
+        return
+    limit = int(max_memory_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# ----------------------------------------------------------------------
+# Orquestração
+# ----------------------------------------------------------------------
+
+def run_batch(
+    logs: Sequence[Path],
+    model_spec: str,
+    out_dir: str,
+    options: Dict[str, Any],
+    workers: int = 1,
+    max_tasks_per_child: int = 1,
+    max_memory_mb: Optional[int] = None,
+    force: bool = False,
+    progress=None,
+    store_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Processa os logs (pulando os já concluídos) e grava/devolve o summary."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    net = load_model(model_spec)[0]
+    model_hash = net_structure_hash(net)
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    pending: List[Path] = []
+    for path in logs:
+        done = None if force else _done_entry(path, out, run_key(path, model_hash, options))
+        if done is not None:
+            entries[str(path)] = {**done, "status": "skipped"}
+        else:
+            pending.append(path)
+
+    def _report(entry: Dict[str, Any]) -> None:
+        entries[entry["log"]] = entry
+        if progress is not None:
+            progress(len(entries), len(logs), entry)
+
+    if progress is not None:
+        for i, entry in enumerate(list(entries.values()), start=1):
+            progress(i, len(logs), entry)
+
+    if workers <= 0:
+        for path in pending:
+            try:
+                _report(process_log(str(path), model_spec, str(out), options, store_path))
+            except Exception as e:
+                _report({"log": str(path), "status": "error", "error": f"{type(e).__name__}: {e}"})
+    elif pending:
+        pool_kwargs: Dict[str, Any] = {
+            "max_workers": workers,
+            "initializer": _init_worker,
+            "initargs": (max_memory_mb,),
+        }
+        if sys.version_info >= (3, 11) and max_tasks_per_child > 0:
+            pool_kwargs["max_tasks_per_child"] = max_tasks_per_child
+        with ProcessPoolExecutor(**pool_kwargs) as pool:
+            futures = {
+                pool.submit(process_log, str(p), model_spec, str(out), options, store_path): p for p in pending
+            }
+            for fut in as_completed(futures):
+                path = futures[fut]
+                try:
+                    _report(fut.result())
+                except Exception as e:  # inclui worker morto por falta de memória
+                    _report({"log": str(path), "status": "error", "error": f"{type(e).__name__}: {e}"})
+
+    ordered = [entries[str(p)] for p in logs if str(p) in entries]
+    done = [e for e in ordered if e.get("status") in ("ok", "skipped")]
+    if done:
+        merged = merge_summaries(ConformanceSummary.load(str(out / e["summary_file"])) for e in done)
+        _write_atomic(out / MERGED_SUMMARY_FILE, lambda p: p.write_bytes(merged.dumps()))
+    summary = {
+        "model": model_spec,
+        "merged_summary": MERGED_SUMMARY_FILE if done else None,
+        "model_hash": model_hash,
+        "options": options,
+        "logs": ordered,
+        "totals": _overall(ordered),
+    }
+    _write_atomic(
+        out / SUMMARY_FILE,
+        lambda p: p.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"),
+    )
+    return summary
+
+
+def _overall(entries: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [e for e in entries if e.get("status") in ("ok", "skipped")]
+    traces = sum(e["metrics"]["total_traces"] for e in ok)
+    out: Dict[str, Any] = {
+        "logs": len(entries),
+        "ok": sum(e.get("status") == "ok" for e in entries),
+        "skipped": sum(e.get("status") == "skipped" for e in entries),
+        "errors": sum(e.get("status") == "error" for e in entries),
+        "total_traces": traces,
+        "global_trace_fitness": (
+            sum(e["metrics"]["global_trace_fitness"] * e["metrics"]["total_traces"] for e in ok) / traces
+            if traces else 0.0
+        ),
+    }
+    return out
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+
+def _parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="python -m replayviz.batch",
+        description="Conformidade em lote (token replay + relatório) sobre logs XES/CSV.",
+    )
+    ap.add_argument("inputs", nargs="+", help="arquivos de log e/ou diretórios")
+    ap.add_argument("--model", default="N3", help="'N3' ou JSON exportado pela página 0 (padrão: N3)")
+    ap.add_argument("--out", "-o", default="conformance_out", help="diretório de saída")
+    ap.add_argument("--workers", "-j", type=int, default=os.cpu_count() or 1,
+                    help="processos no pool (0 = no processo atual)")
+    ap.add_argument("--alignments", action="store_true", help="calcula alignments (um por variante)")
+    ap.add_argument("--format", choices=("parquet", "json"), default="parquet",
+                    help="formato da tabela por variante")
+    ap.add_argument("--recursive", "-r", action="store_true", help="percorre subdiretórios")
+    ap.add_argument("--max-tasks-per-child", type=int, default=1,
+                    help="logs por processo antes de reciclá-lo (libera memória)")
+    ap.add_argument("--max-memory-mb", type=int, default=None,
+                    help="limite de memória por processo (RLIMIT_AS, apenas Unix)")
+    ap.add_argument("--force", action="store_true", help="reprocessa logs já concluídos")
+    ap.add_argument("--store", default=DEFAULT_PATH,
+                    help="SQLite com resultados por variante, compartilhado com as páginas (padrão: %(default)s)")
+    ap.add_argument("--no-store", action="store_true", help="não lê nem grava o store de resultados")
+    return ap
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    try:
+        logs = discover_logs(args.inputs, recursive=args.recursive)
+        load_model(args.model)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
+    if not logs:
+        print("erro: nenhum log XES/CSV encontrado", file=sys.stderr)
+        return 2
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                import fastparquet  # noqa: F401
+            except ImportError:
+                print("erro: Parquet requer pyarrow ou fastparquet (use --format json)", file=sys.stderr)
+                return 2
+
+    def progress(done: int, total: int, entry: Dict[str, Any]) -> None:
+        status = entry.get("status")
+        detail = entry.get("error") if status == "error" else (
+            f"fitness={entry['metrics']['global_trace_fitness']:.3f}"
+        )
+        print(f"[{done}/{total}] {status:7s} {entry['log']} {detail}", file=sys.stderr)
+
+    options = {"alignments": bool(args.alignments), "format": args.format}
+    summary = run_batch(
+        logs,
+        args.model,
+        args.out,
+        options,
+        workers=args.workers,
+        max_tasks_per_child=args.max_tasks_per_child,
+        max_memory_mb=args.max_memory_mb,
+        force=args.force,
+        progress=progress,
+        store_path=None if args.no_store else args.store,
+    )
+    totals = summary["totals"]
+    print(
+        f"{totals['logs']} logs: {totals['ok']} processados, {totals['skipped']} pulados, "
+        f"{totals['errors']} com erro — {Path(args.out) / SUMMARY_FILE}",
+        file=sys.stderr,
+    )
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de cálculos compartilhado pelo processo (todas as sessões do servidor).
+
+- single-flight: pedidos simultâneos da mesma chave esperam o único cálculo em
+  andamento em vez de repeti-lo (cinco analistas abrindo o mesmo log = um parse);
+- orçamento de memória: cada entrada tem um tamanho estimado e, ao passar do
+  orçamento, as menos usadas recentemente saem primeiro (LRU entre logs,
+  resultados de replay e layouts — todos disputam o mesmo orçamento);
+- estatísticas: acertos, faltas, esperas (single-flight) e despejos, no total
+  e por espaço de nomes.
+
+O decorador `compute_cached` segue a convenção do `st.cache_resource`:
+argumentos cujo nome começa com "_" não entram na chave.
+"""
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+import inspect
+import os
+import sys
+import threading
+
+# orçamento padrão (MB); ajustável por variável de ambiente
+DEFAULT_BUDGET_MB = int(os.environ.get("REPLAYVIZ_CACHE_MB", "2048"))
+SAMPLE = 64        # elementos amostrados por contêiner na estimativa de tamanho
+MAX_DEPTH = 6
+
+Key = Tuple[str, Hashable]
+
+
+# ----------------------------------------------------------------------
+# Estimativa de tamanho (amostragem; não percorre logs de 1 GB inteiros)
+# ----------------------------------------------------------------------
+
+def estimate_size(obj: Any, depth: int = 0) -> int:
+    """Bytes aproximados de `obj`: contêineres grandes são amostrados e extrapolados."""
+    size = sys.getsizeof(obj, 64)
+    if depth >= MAX_DEPTH or isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):  # pandas.DataFrame
+        return size + int(obj.memory_usage(index=True, deep=False).sum())
+    if isinstance(obj, Mapping):  # dict, Event do PM4Py
+        n = len(obj)
+        sample = [
+            estimate_size(k, depth + 1) + estimate_size(v, depth + 1) for _, (k, v) in zip(range(SAMPLE), obj.items())
+        ]
+    elif isinstance(obj, (list, tuple, set, frozenset)) or (hasattr(obj, "__len__") and hasattr(obj, "__iter__")):
+        try:
+            n = len(obj)
+            sample = [estimate_size(x, depth + 1) for _, x in zip(range(SAMPLE), iter(obj))]
+        except TypeError:
+            return size
+    else:
+        attrs = getattr(obj, "__dict__", None)
+        if attrs is None and hasattr(obj, "_asdict"):
+            attrs = obj._asdict()
+        return size + (estimate_size(attrs, depth + 1) if attrs else 0)
+    if not sample:
+        return size
+    attrs = getattr(obj, "__dict__", None)  # p.ex. EventLog: atributos além dos itens
+    extra = estimate_size(attrs, depth + 1) if attrs and not isinstance(obj, Mapping) else 0
+    return size + extra + int(sum(sample) / len(sample) * n)
+
+
+# ----------------------------------------------------------------------
+# Cache
+# ----------------------------------------------------------------------
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    waits: int          # pedidos que aguardaram um cálculo em andamento
+    evictions: int
+    entries: int
+    bytes: int
+    budget: int
+
+
+class _Flight:
+    """Cálculo em andamento: os demais pedidos da chave esperam `done`."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ComputeCache:
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 2**20) -> None:
+        self.budget = budget_bytes
+        self._entries: "OrderedDict[Key, Tuple[Any, int]]" = OrderedDict()
+        self._flights: Dict[Key, _Flight] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, ns: str, what: str) -> None:
+        c = self._counts.setdefault(ns, {"hits": 0, "misses": 0, "waits": 0, "evictions": 0})
+        c[what] += 1
+
+    def get_or_compute(
+        self, namespace: str, key: Hashable, compute: Callable[[], Any],
+        size: Optional[Callable[[Any], int]] = None,
+    ) -> Any:
+        """Valor em cache de (namespace, key); calcula uma única vez mesmo com pedidos simultâneos."""
+        k: Key = (namespace, key)
+        with self._lock:
+            hit = self._entries.get(k)
+            if hit is not None:
+                self._entries.move_to_end(k)
+                self._count(namespace, "hits")
+                return hit[0]
+            flight = self._flights.get(k)
+            owner = flight is None
+            if owner:
+                flight = self._flights[k] = _Flight()
+                self._count(namespace, "misses")
+            else:
+                self._count(namespace, "waits")
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+        except BaseException as ex:
+            flight.error = ex
+            with self._lock:
+                del self._flights[k]
+            flight.done.set()
+            raise
+        nbytes = (size or estimate_size)(value)
+        with self._lock:
+            del self._flights[k]
+            if nbytes <= self.budget:
+                self._entries[k] = (value, nbytes)
+                self._bytes += nbytes
+                self._evict()
+        flight.value = value
+        flight.done.set()
+        return value
+
+    def _evict(self) -> None:
+        while self._bytes > self.budget and self._entries:
+            (ns, _), (_, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self._count(ns, "evictions")
+
+    def set_budget(self, budget_bytes: int) -> None:
+        with self._lock:
+            self.budget = budget_bytes
+            self._evict()
+
+    def invalidate(self, namespace: str, key: Optional[Hashable] = None) -> None:
+        """Remove uma entrada (ou o espaço de nomes inteiro com `key=None`)."""
+        with self._lock:
+            for k in [k for k in self._entries if k[0] == namespace and (key is None or k[1] == key)]:
+                self._bytes -= self._entries.pop(k)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._counts.clear()
+
+    def stats(self, namespace: Optional[str] = None) -> CacheStats:
+        with self._lock:
+            names = [namespace] if namespace is not None else list(self._counts)
+            tot = {"hits": 0, "misses": 0, "waits": 0, "evictions": 0}
+            for ns in names:
+                for what, v in self._counts.get(ns, {}).items():
+                    tot[what] += v
+            sized = [b for (ns, _), (_, b) in self._entries.items() if namespace is None or ns == namespace]
+            return CacheStats(entries=len(sized), bytes=sum(sized), budget=self.budget, **tot)
+
+    def namespaces(self):
+        with self._lock:
+            return sorted(self._counts)
+
+
+_cache: Optional[ComputeCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_compute_cache() -> ComputeCache:
+    """ComputeCache compartilhado pelo processo (todas as sessões/reruns)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ComputeCache()
+        return _cache
+
+
+def compute_cached(namespace: str, size: Optional[Callable[[Any], int]] = None):
+    """
+    Decorador: resultado em cache no ComputeCache do processo; a chave são os
+    argumentos sem "_" no nome (como no `st.cache_resource`).
+    """
+
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        sig = inspect.signature(fn)
+        hashed = [p for p in sig.parameters if not p.startswith("_")]
+
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (fn.__qualname__,) + tuple(bound.arguments[p] for p in hashed)
+            return get_compute_cache().get_or_compute(namespace, key, lambda: fn(*args, **kwargs), size)
+
+        wrapper.invalidate = lambda: get_compute_cache().invalidate(namespace)  # type: ignore[attr-defined]
+        return wrapper
+
+    return deco
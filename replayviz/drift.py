@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Conformidade por janela de tempo e detecção de deriva (drift).
+
+Os eventos são consumidos uma única vez, em ordem de timestamp, pelo
+verificador online (replayviz.streaming). Cada caso, ao ser fechado, entra nos
+agregados da(s) janela(s) do seu último evento — janelas fixas (tumbling) ou
+deslizantes (`step` < `size`). Só os casos abertos e as janelas ainda abertas
+ficam em memória; uma janela é emitida assim que nenhum caso pode mais cair
+nela (marca d'água = último evento do caso aberto mais antigo).
+
+O fechamento das janelas não despeja casos: um caso com intervalo maior que a
+janela continua aberto. Para logs longos ou fluxos sem fim, `case_ttl` (bem
+maior que a janela; ver CASE_TTL_WINDOWS) despeja casos inativos, o que limita
+a memória e deixa a marca d'água avançar. Casos despejados (por TTL ou por
+`max_cases`) contam, como no `flush`, como casos fechados não terminados na
+janela do seu último evento.
+
+Métricas por janela seguem a página 5: fitness médio, taxa de fit, atividades
+do modelo ausentes (por caso) e atividades extras (por evento), além da
+distribuição de variantes. O detector compara cada janela a uma linha de base
+formada pelas janelas anteriores (teste z para médias/proporções e qui-quadrado
+para o mix de variantes).
+"""
+from collections import Counter, OrderedDict, deque
+from math import erf, floor, sqrt
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .aggregation import VARIANT_SEP
+from .streaming import CaseResult, StreamEvent, StreamingChecker
+
+# variantes distintas com rótulo guardado; as demais entram como "outras"
+MAX_VARIANTS = 10_000
+OTHER_VARIANT = -1
+# TTL sugerido para casos inativos, em janelas (`case_ttl = CASE_TTL_WINDOWS * size`)
+CASE_TTL_WINDOWS = 4
+
+
+class WindowStats:
+    """Agregados (somas) de uma janela; métricas derivadas como propriedades."""
+
+    __slots__ = (
+        "start", "end", "cases", "fit", "fitness_sum", "fitness_sq_sum", "events",
+        "missing_tokens", "remaining_tokens", "missing_activities", "extra_activities", "variants",
+    )
+
+    def __init__(self, start: float, end: float) -> None:
+        self.start = start
+        self.end = end
+        self.cases = 0
+        self.fit = 0
+        self.fitness_sum = 0.0
+        self.fitness_sq_sum = 0.0
+        self.events = 0
+        self.missing_tokens = 0
+        self.remaining_tokens = 0
+        self.missing_activities = 0
+        self.extra_activities = 0
+        self.variants: Counter = Counter()
+
+    def add(self, r: CaseResult, missing_acts: int, extra_acts: int, variant: int) -> None:
+        self.cases += 1
+        self.fit += int(r.trace_is_fit)
+        self.fitness_sum += r.trace_fitness
+        self.fitness_sq_sum += r.trace_fitness * r.trace_fitness
+        self.events += r.n_events
+        self.missing_tokens += r.missing
+        self.remaining_tokens += r.remaining
+        self.missing_activities += missing_acts
+        self.extra_activities += extra_acts
+        self.variants[variant] += 1
+
+    def merge(self, other: "WindowStats") -> None:
+        for name in self.__slots__[2:-1]:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.variants.update(other.variants)
+
+    @property
+    def fitness_mean(self) -> float:
+        return self.fitness_sum / self.cases if self.cases else 0.0
+
+    @property
+    def fitness_var(self) -> float:
+        if self.cases < 2:
+            return 0.0
+        mean = self.fitness_mean
+        return max(0.0, (self.fitness_sq_sum - self.cases * mean * mean) / (self.cases - 1))
+
+    @property
+    def fit_rate(self) -> float:
+        return self.fit / self.cases if self.cases else 0.0
+
+    def missing_rate(self, n_model_activities: int) -> float:
+        den = n_model_activities * self.cases
+        return self.missing_activities / den if den else 0.0
+
+    @property
+    def extra_rate(self) -> float:
+        return self.extra_activities / self.events if self.events else 0.0
+
+
+class DriftResult(NamedTuple):
+    window: WindowStats
+    p_fitness: Optional[float]
+    p_fit_rate: Optional[float]
+    p_variants: Optional[float]
+    drift: bool
+
+
+class _OpenCase:
+    __slots__ = ("codes", "seen", "last_ts")
+
+    def __init__(self) -> None:
+        self.codes: List[int] = []
+        self.seen = 0
+        self.last_ts: Optional[float] = None
+
+
+class WindowedConformance:
+    """
+    Janelas de conformidade calculadas em uma passada.
+    `size`/`step` em segundos; `step=None` => janelas fixas (tumbling).
+    `case_ttl` (segundos, relógio dos eventos): despeja casos inativos; None
+    => casos só fecham na marcação final, no `flush` ou pelo limite `max_cases`.
+    """
+
+    def __init__(
+        self,
+        net: PetriNet,
+        im: Marking,
+        fm: Marking,
+        size: float,
+        step: Optional[float] = None,
+        case_ttl: Optional[float] = None,
+        max_cases: int = 100_000,
+    ) -> None:
+        if size <= 0 or (step is not None and not 0 < step <= size):
+            raise ValueError("Janela inválida: exige size > 0 e 0 < step <= size.")
+        self.size = float(size)
+        self.step = float(step if step is not None else size)
+        self.case_ttl = case_ttl
+        self.evicted = 0  # casos despejados (TTL/capacidade); contam como fechados
+        self.checker = StreamingChecker(net, im, fm, max_cases=max_cases, ttl=case_ttl, on_close=self._on_close)
+        self.model_activities = sorted(self.checker.net.by_label)
+        self._codes: Dict[str, int] = {}
+        self._model_mask = 0
+        for a in self.model_activities:
+            self._model_mask |= 1 << self._code(a)
+        self._variant_ids: Dict[Tuple[int, ...], int] = {}
+        self._variant_labels: List[str] = []
+        # casos abertos em ordem do último evento: o primeiro define a marca d'água
+        self._cases: "OrderedDict[Hashable, _OpenCase]" = OrderedDict()
+        self._windows: Dict[int, WindowStats] = {}
+        self._ready: List[WindowStats] = []
+
+    def _code(self, activity: str) -> int:
+        c = self._codes.get(activity)
+        if c is None:
+            c = self._codes[activity] = len(self._codes)
+        return c
+
+    def variant_label(self, variant: int) -> str:
+        return self._variant_labels[variant] if variant >= 0 else "(outras)"
+
+    # ------------------------------------------------------------------
+    def feed(self, events: Iterable[StreamEvent]) -> Iterator[WindowStats]:
+        """Consome os eventos (em ordem de timestamp) e emite as janelas já fechadas."""
+        for ev in events:
+            yield from self.process(ev)
+        yield from self.flush()
+
+    def process(self, ev: StreamEvent) -> List[WindowStats]:
+        if ev.timestamp is None:
+            raise ValueError(f"Evento sem timestamp (caso {ev.case_id!r}).")
+        info = self._cases.get(ev.case_id)
+        if info is None:
+            info = self._cases[ev.case_id] = _OpenCase()
+        else:
+            self._cases.move_to_end(ev.case_id)
+        code = self._code(ev.activity)
+        info.codes.append(code)
+        info.seen |= 1 << code
+        info.last_ts = ev.timestamp
+        self.checker.process(ev)
+        # casos abertos ainda podem fechar no seu último evento: janelas até ele esperam
+        oldest = next(iter(self._cases.values()), None)
+        self._close_windows(ev.timestamp if oldest is None else min(ev.timestamp, oldest.last_ts))
+        out, self._ready = self._ready, []
+        return out
+
+    def flush(self) -> List[WindowStats]:
+        """Fecha os casos ainda abertos e emite todas as janelas restantes."""
+        self.checker.close_all()
+        self._close_windows(float("inf"))
+        out, self._ready = self._ready, []
+        return out
+
+    # ------------------------------------------------------------------
+    def _variant(self, codes: List[int]) -> int:
+        key = tuple(codes)
+        vid = self._variant_ids.get(key)
+        if vid is None:
+            if len(self._variant_ids) >= MAX_VARIANTS:
+                return OTHER_VARIANT
+            vid = self._variant_ids[key] = len(self._variant_labels)
+            names = {c: a for a, c in self._codes.items()}
+            self._variant_labels.append(VARIANT_SEP.join(names[c] for c in codes))
+        return vid
+
+    def _on_close(self, r: CaseResult) -> None:
+        info = self._cases.pop(r.case_id, None)
+        if info is None or info.last_ts is None:
+            return
+        if r.status == "evicted":
+            self.evicted += 1
+        missing = (self._model_mask & ~info.seen).bit_count()
+        extra = (info.seen & ~self._model_mask).bit_count()
+        variant = self._variant(info.codes)
+        t = info.last_ts
+        k_max = floor(t / self.step)
+        k_min = floor((t - self.size) / self.step) + 1
+        for k in range(k_min, k_max + 1):
+            w = self._windows.get(k)
+            if w is None:
+                start = k * self.step
+                w = self._windows[k] = WindowStats(start, start + self.size)
+            w.add(r, missing, extra, variant)
+
+    def _close_windows(self, watermark: float) -> None:
+        """Emite as janelas que terminam antes da marca d'água (nenhum caso pode mais cair nelas)."""
+        done = sorted(k for k, w in self._windows.items() if w.end <= watermark)
+        for k in done:
+            self._ready.append(self._windows.pop(k))
+
+
+# ----------------------------------------------------------------------
+# Detecção de deriva
+# ----------------------------------------------------------------------
+
+def _p_two_sided(z: float) -> float:
+    return 1.0 - erf(abs(z) / sqrt(2.0))
+
+
+def _p_means(a: WindowStats, b: WindowStats) -> Optional[float]:
+    if a.cases < 2 or b.cases < 2:
+        return None
+    se = sqrt(a.fitness_var / a.cases + b.fitness_var / b.cases)
+    if se == 0.0:
+        return 1.0 if a.fitness_mean == b.fitness_mean else 0.0
+    return _p_two_sided((a.fitness_mean - b.fitness_mean) / se)
+
+
+def _p_props(a: WindowStats, b: WindowStats) -> Optional[float]:
+    if not a.cases or not b.cases:
+        return None
+    pooled = (a.fit + b.fit) / (a.cases + b.cases)
+    se = sqrt(pooled * (1.0 - pooled) * (1.0 / a.cases + 1.0 / b.cases))
+    if se == 0.0:
+        return 1.0
+    return _p_two_sided((a.fit_rate - b.fit_rate) / se)
+
+
+def _p_mix(a: WindowStats, b: WindowStats, top: int = 20) -> Optional[float]:
+    from scipy.stats import chi2_contingency
+
+    if not a.cases or not b.cases:
+        return None
+    keys = [v for v, _ in (a.variants + b.variants).most_common(top)]
+    rows = [[a.variants[v] for v in keys], [b.variants[v] for v in keys]]
+    rows[0].append(a.cases - sum(rows[0]))
+    rows[1].append(b.cases - sum(rows[1]))
+    cols = [j for j in range(len(rows[0])) if rows[0][j] + rows[1][j] > 0]
+    if len(cols) < 2:
+        return 1.0
+    table = [[r[j] for j in cols] for r in rows]
+    return float(chi2_contingency(table)[1])
+
+
+def detect_drift(
+    windows: Iterable[WindowStats], baseline: int = 5, alpha: float = 0.01, min_cases: int = 10
+) -> Iterator[DriftResult]:
+    """
+    Compara cada janela com a soma das `baseline` janelas anteriores; marca deriva
+    se algum teste tiver p < alpha/3 (Bonferroni). Janelas com menos de
+    `min_cases` casos não são testadas (nem entram na linha de base).
+    """
+    history: "deque[WindowStats]" = deque(maxlen=baseline)
+    for w in windows:
+        if w.cases < min_cases or not history:
+            yield DriftResult(w, None, None, None, False)
+            if w.cases >= min_cases:
+                history.append(w)
+            continue
+        ref = WindowStats(history[0].start, history[-1].end)
+        for h in history:
+            ref.merge(h)
+        ps = (_p_means(w, ref), _p_props(w, ref), _p_mix(w, ref))
+        drift = any(p is not None and p < alpha / 3.0 for p in ps)
+        yield DriftResult(w, *ps, drift)
+        history.append(w)
+
+
+def drift_frame(
+    results: Sequence[DriftResult], n_model_activities: int, monitor: Optional[WindowedConformance] = None
+) -> pd.DataFrame:
+    """Tabela (uma linha por janela) para exibição."""
+    rows: List[Dict[str, Any]] = []
+    for r in results:
+        w = r.window
+        top = w.variants.most_common(1)
+        rows.append({
+            "start": pd.Timestamp(w.start, unit="s", tz="UTC"),
+            "end": pd.Timestamp(w.end, unit="s", tz="UTC"),
+            "cases": w.cases,
+            "fitness_mean": w.fitness_mean,
+            "fit_rate": w.fit_rate,
+            "missing_rate": w.missing_rate(n_model_activities),
+            "extra_rate": w.extra_rate,
+            "variants": len(w.variants),
+            "top_variant": (monitor.variant_label(top[0][0]) if monitor and top else None),
+            "top_variant_share": top[0][1] / w.cases if top and w.cases else 0.0,
+            "p_fitness": r.p_fitness,
+            "p_fit_rate": r.p_fit_rate,
+            "p_variants": r.p_variants,
+            "drift": r.drift,
+        })
+    return pd.DataFrame(rows)
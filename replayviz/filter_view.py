@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Filtro de casos nas páginas (atividades, intervalo de tempo, variantes) antes do replay/alignments."""
+from datetime import datetime, time, timezone
+from typing import Hashable, Tuple
+
+import streamlit as st
+
+from pm4py.objects.log.obj import EventLog
+
+from .compute_cache import compute_cached
+from .log_index import OVERLAP, START, WITHIN, LogIndex, apply_filter, build_log_index, describe_filter
+from .variants import VariantTrie, log_variants
+
+MAX_VARIANT_OPTIONS = 200  # variantes mais frequentes oferecidas no seletor
+
+_MODES = {"cruza o intervalo": OVERLAP, "começa no intervalo": START, "inteiro no intervalo": WITHIN}
+
+
+@compute_cached("index")
+def log_index(log_key: Hashable, _log: EventLog) -> LogIndex:
+    return build_log_index(_log)
+
+
+@compute_cached("log")
+def _filtered_log(log_key: Hashable, filter_key: Tuple, _log: EventLog, _index: LogIndex) -> EventLog:
+    return _index.subset(_log, apply_filter(_index, *filter_key))
+
+
+@compute_cached("index")
+def _filtered_trie(log_key: Hashable, filter_key: Tuple, _index: LogIndex) -> VariantTrie:
+    """Trie do subconjunto a partir dos códigos do índice (sem recodificar eventos)."""
+    return VariantTrie(*_index.subset_codes(apply_filter(_index, *filter_key)))
+
+
+def case_filter(log: EventLog, log_key: Hashable, key: str = "case_filter") -> Tuple[EventLog, Hashable]:
+    """
+    Expander com os filtros; devolve (log filtrado, chave do log filtrado). Sem
+    filtro ativo, devolve o próprio log e a mesma chave.
+    """
+    index = log_index(log_key, log)
+    with st.expander("Filtrar casos", expanded=False):
+        c1, c2 = st.columns(2)
+        acts = sorted(index.lc.activities)
+        with_all = c1.multiselect("Contém todas as atividades", acts, key=f"{key}_with")
+        without = c2.multiselect("Não contém nenhuma das atividades", acts, key=f"{key}_without")
+
+        t0 = t1 = None
+        mode = OVERLAP
+        lo, hi = index.time_bounds()
+        if lo is not None and st.toggle("Intervalo de tempo", value=False, key=f"{key}_time"):
+            d1, d2 = st.columns([2, 1])
+            first = datetime.fromtimestamp(lo, tz=timezone.utc).date()
+            last = datetime.fromtimestamp(hi, tz=timezone.utc).date()
+            dates = d1.date_input("Período (UTC)", (first, last), min_value=first, max_value=last, key=f"{key}_dates")
+            mode = _MODES[d2.selectbox("Caso", list(_MODES), key=f"{key}_mode")]
+            if isinstance(dates, (tuple, list)) and len(dates) == 2:
+                t0 = datetime.combine(dates[0], time.min, tzinfo=timezone.utc).timestamp()
+                t1 = datetime.combine(dates[1], time.max, tzinfo=timezone.utc).timestamp()
+
+        trie = index.trie
+        options = {
+            int(v): f"#{int(v)} ({int(trie.frequency[v])} casos) {trie.label(int(v))}"
+            for v in trie.top_k(MAX_VARIANT_OPTIONS)
+        }
+        variant_ids = st.multiselect(
+            "Somente as variantes", list(options), format_func=options.get, key=f"{key}_variants",
+            help=f"As {len(options)} variantes mais frequentes.",
+        )
+
+        fkey = describe_filter(with_all, without, t0, t1, mode, variant_ids)
+        if fkey == describe_filter():
+            log_variants(log_key, log, _trie=trie)  # a página reaproveita a trie do índice
+            return log, log_key
+        sub = _filtered_log(log_key, fkey, log, index)
+        sub_key = (log_key, "filtro", fkey)
+        log_variants(sub_key, sub, _trie=_filtered_trie(log_key, fkey, index))
+        st.caption(f"{len(sub)} de {index.n_cases} casos selecionados.")
+    if not len(sub):
+        st.warning("Nenhum caso atende ao filtro.")
+        st.stop()
+    return sub, sub_key
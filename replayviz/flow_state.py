@@ -1,42 +1,183 @@
-from typing import List
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import hashlib
+import inspect
+import json
+import time
 from streamlit import session_state as st_ss
 from streamlit_flow import streamlit_flow
 from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
 
+try:
+    from streamlit_flow.state import StreamlitFlowState
+except Exception:  # versões antigas do componente
+    StreamlitFlowState = None  # type: ignore[assignment,misc]
 
-def ensure_flow_state_slot(slot: str) -> None:
-    if slot not in st_ss:
+# Detectados uma única vez por processo (ver _flow_api)
+_FLOW_API: Optional[str] = None
+# Atributo/chave onde o estado guarda as impressões digitais do último update
+_META = "_replayviz_fp"
+
+
+def _flow_api() -> str:
+    """'state' (streamlit_flow(key, state, ...)) ou 'legacy' (nodes/edges)."""
+    global _FLOW_API
+    if _FLOW_API is None:
         try:
-            from streamlit_flow.state import StreamlitFlowState
-            st_ss[slot] = StreamlitFlowState(nodes=[], edges=[])
-        except Exception:
-            st_ss[slot] = {"nodes": [], "edges": []}
+            params = inspect.signature(streamlit_flow).parameters
+            _FLOW_API = "state" if "state" in params or StreamlitFlowState is not None else "legacy"
+        except (TypeError, ValueError):
+            _FLOW_API = "state" if StreamlitFlowState is not None else "legacy"
+    return _FLOW_API
 
-def update_flow_state_slot(slot: str, nodes: List[StreamlitFlowNode], edges: List[StreamlitFlowEdge]) -> None:
-    fs = st_ss[slot]
+def _stateful_frontend() -> bool:
+    """Com StreamlitFlowState o frontend mantém o estado e só o reaplica quando o timestamp avança."""
+    return StreamlitFlowState is not None and _flow_api() == "state"
+
+def _get_lists(fs: Any) -> Tuple[List[Any], List[Any]]:
+    try:
+        return fs.nodes, fs.edges
+    except AttributeError:
+        return fs["nodes"], fs["edges"]
+
+def _set_lists(fs: Any, nodes: List[Any], edges: List[Any]) -> None:
     try:
         fs.nodes = nodes; fs.edges = edges
     except AttributeError:
         fs["nodes"] = nodes; fs["edges"] = edges
 
+def _get_meta(fs: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(fs, dict):
+        return fs.get(_META)
+    return getattr(fs, _META, None)
+
+def _set_meta(fs: Any, meta: Optional[Dict[str, Any]]) -> None:
+    if isinstance(fs, dict):
+        fs[_META] = meta
+    else:
+        try:
+            setattr(fs, _META, meta)
+        except AttributeError:
+            pass
+
+def _touch(fs: Any) -> None:
+    if hasattr(fs, "timestamp"):
+        # o frontend só reaplica o estado vindo do Python quando o timestamp avança
+        fs.timestamp = int(time.time() * 1000)
+
+def _element_hash(el: Any) -> str:
+    if hasattr(el, "asdict"):
+        d = el.asdict()
+    elif isinstance(el, dict):
+        d = el
+    else:
+        d = vars(el)
+    raw = json.dumps(d, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+def _apply_delta(current: List[Any], new: List[Any], old_h: Dict[str, str], new_h: Dict[str, str]) -> List[Any]:
+    """Mantém os elementos inalterados do estado atual (ex.: posições vindas do canvas) e troca os demais."""
+    cur_by_id = {el.id: el for el in current}
+    out: List[Any] = []
+    for el in new:
+        kept = cur_by_id.get(el.id)
+        out.append(kept if kept is not None and old_h.get(el.id) == new_h[el.id] else el)
+    return out
+
+
+def ensure_flow_state_slot(slot: str) -> None:
+    if slot not in st_ss:
+        if StreamlitFlowState is not None:
+            st_ss[slot] = StreamlitFlowState(nodes=[], edges=[])
+        else:
+            st_ss[slot] = {"nodes": [], "edges": []}
+
+def update_flow_state_slot(
+    slot: str,
+    nodes: List[StreamlitFlowNode],
+    edges: List[StreamlitFlowEdge],
+    fingerprint: Optional[Hashable] = None,
+) -> bool:
+    """
+    Atualiza o estado do slot apenas se o conteúdo mudou; devolve True se houve update.
+
+    - `fingerprint` (opcional): chave fornecida pelo chamador para grafos estáticos —
+      se igual à do último update, nada é recalculado nem enviado.
+    - Sem `fingerprint`, compara o hash de cada nó/aresta com o do último update;
+      quando o frontend mantém o estado, só os elementos alterados são substituídos.
+    """
+    fs = st_ss[slot]
+    meta = _get_meta(fs)
+    if fingerprint is not None:
+        if meta is not None and meta.get("key") == fingerprint:
+            return False
+        _set_lists(fs, nodes, edges)
+        _set_meta(fs, {"key": fingerprint})
+        _touch(fs)
+        return True
+
+    node_h = {n.id: _element_hash(n) for n in nodes}
+    edge_h = {e.id: _element_hash(e) for e in edges}
+    if meta is not None and meta.get("nodes") == node_h and meta.get("edges") == edge_h:
+        return False
+
+    cur_nodes, cur_edges = _get_lists(fs)
+    if meta is not None and "nodes" in meta and _stateful_frontend() and cur_nodes is not nodes:
+        _set_lists(
+            fs,
+            _apply_delta(cur_nodes, nodes, meta["nodes"], node_h),
+            _apply_delta(cur_edges, edges, meta["edges"], edge_h),
+        )
+    else:
+        _set_lists(fs, nodes, edges)
+    _set_meta(fs, {"nodes": node_h, "edges": edge_h})
+    _touch(fs)
+    return True
+
+def patch_flow_state_nodes(slot: str, changed: List[StreamlitFlowNode]) -> None:
+    """
+    Substitui, por id, apenas os nós alterados no estado do slot (os demais nós e
+    as arestas não são tocados). O índice id -> posição fica em cache por slot.
+    """
+    if not changed:
+        return
+    fs = st_ss[slot]
+    nodes, _ = _get_lists(fs)
+    index_key = f"__{slot}_node_index"
+    index = st_ss.get(index_key)
+    for node in changed:
+        i = index.get(node.id) if index is not None else None
+        if i is None or i >= len(nodes) or nodes[i].id != node.id:
+            index = {n.id: j for j, n in enumerate(nodes)}
+            st_ss[index_key] = index
+            i = index.get(node.id)
+        if i is None:
+            nodes.append(node)
+            index[node.id] = len(nodes) - 1
+        else:
+            nodes[i] = node
+    # as impressões digitais do último update não descrevem mais o estado
+    _set_meta(fs, None)
+    _touch(fs)
+
 def render_flow_slot(slot: str, key: str, height: int = 400, fit_view: bool = True) -> None:
     """
-    Chama streamlit_flow com a menor assinatura comum entre versões,
+    Chama streamlit_flow com a assinatura detectada (uma vez por processo),
     sem impor layout do frontend (usa as posições `pos` vindas do Python).
     """
+    global _FLOW_API
     state_obj = st_ss[slot]
     # 1) API nova (com 'state')
-    try:
-        new_state = streamlit_flow(key=key, state=state_obj, fit_view=fit_view, height=height)
-        if new_state is not None:
-            st_ss[slot] = new_state
-        return
-    except TypeError:
-        pass
+    if _flow_api() == "state":
+        try:
+            new_state = streamlit_flow(key=key, state=state_obj, fit_view=fit_view, height=height)
+        except TypeError:
+            _FLOW_API = "legacy"
+        else:
+            if new_state is not None and new_state is not state_obj:
+                _set_meta(new_state, _get_meta(state_obj))
+                st_ss[slot] = new_state
+            return
 
     # 2) Fallback: API antiga (com 'nodes'/'edges')
-    try:
-        nodes = state_obj.nodes; edges = state_obj.edges  # type: ignore[attr-defined]
-    except AttributeError:
-        nodes = state_obj["nodes"]; edges = state_obj["edges"]
+    nodes, edges = _get_lists(state_obj)
     streamlit_flow(key=key, nodes=nodes, edges=edges, fit_view=fit_view, height=height)
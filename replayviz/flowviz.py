@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import copy
 import re
 
 from pm4py.objects.petri_net.obj import PetriNet, Marking
 from pm4py.objects.log.obj import Trace
 from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
 
+from .layout import layered_layout
+from .pm4py_model import build_net_N3
+
 # ----------------------------------------------------------------------
 # Estilos e utilitários
 # ----------------------------------------------------------------------
@@ -17,6 +22,10 @@ def _token_html(k: int, max_dots: int = 6) -> str:
         return "<span>" + ("&bull; " * k).strip() + "</span>"
     return "<span>" + ("&bull; " * max_dots).strip() + f" <strong>+{k - max_dots}</strong></span>"
 
+@lru_cache(maxsize=4096)
+def _slug(name: str) -> str:
+    return re.sub(r"[^0-9a-zA-Z_]+", "_", name)
+
 def _place_style(tokens: int, consumed=False, produced=False) -> dict:
     border = "#6b7280"; bg = "#ffffff"
     if consumed: border, bg = "#ef4444", "#fee2e2"
@@ -49,7 +58,7 @@ def _trans_style(name: str, highlighted: bool = False) -> dict:
     }
 
 # ----------------------------------------------------------------------
-# Layout fixo (N3 normativo)
+# Layout fixo (N3 normativo; demais redes usam layout.layered_layout)
 # ----------------------------------------------------------------------
 
 def _layout_coords() -> Dict[str, Tuple[int, int]]:
@@ -75,102 +84,115 @@ def _layout_coords() -> Dict[str, Tuple[int, int]]:
     }
 
 # ----------------------------------------------------------------------
-# Construtor N3 com fichas
+# Construtores genéricos (qualquer PetriNet; layout em camadas por padrão)
 # ----------------------------------------------------------------------
 
-def build_nodes_edges_for_marking_N3(
+Positions = Dict[str, Tuple[float, float]]
+
+def _trans_text(t: PetriNet.Transition) -> str:
+    return t.label if t.label is not None else "τ"
+
+def _sorted_by_pos(items, pos: Positions):
+    return sorted(items, key=lambda x: (pos[x.name][0], pos[x.name][1], x.name))
+
+def build_nodes_edges_for_marking(
     net: PetriNet,
-    places: Dict[str, PetriNet.Place],
-    trans: Dict[str, PetriNet.Transition],
     marking: Marking,
-    fired_transition_name: Optional[str],
+    fired_transition_name: Optional[str] = None,
     prev_marking: Optional[Marking] = None,
+    pos: Optional[Positions] = None,
+    id_prefix: str = "",
+    edge_prefix: str = "e_",
 ) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
-    pos = _layout_coords()
-
-    consumed, produced = {}, {}
-    if prev_marking is not None:
-        for name, p in places.items():
-            k_prev = prev_marking.get(p, 0)
-            k_now  = marking.get(p, 0)
-            consumed[name] = (k_now < k_prev)
-            produced[name] = (k_now > k_prev)
+    """Rede de Petri com fichas (consumo/produção em relação a `prev_marking`)."""
+    if pos is None:
+        pos = layered_layout(net)
 
     nodes: List[StreamlitFlowNode] = []
-
-    # places
-    for pname in ["p_start","p1","p2","p3","p4","p5","p_end"]:
-        p = places[pname]; k = marking.get(p, 0)
+    for p in _sorted_by_pos(net.places, pos):
+        k = marking.get(p, 0)
+        k_prev = prev_marking.get(p, 0) if prev_marking is not None else k
         nodes.append(
             StreamlitFlowNode(
-                id=pname, pos=pos[pname],
+                id=f"{id_prefix}{p.name}", pos=pos[p.name],
                 data={"content": _token_html(k)},
                 node_type="default", source_position="right", target_position="left",
-                style=_place_style(k, consumed=consumed.get(pname, False), produced=produced.get(pname, False))
+                style=_place_style(k, consumed=(k < k_prev), produced=(k > k_prev)),
             )
         )
-
-    # transitions
-    for tname in ["a", "c", "d", "e", "h"]:
-        hl = (fired_transition_name == tname)
+    for t in _sorted_by_pos(net.transitions, pos):
+        text = _trans_text(t)
         nodes.append(
             StreamlitFlowNode(
-                id=tname, pos=pos[tname],
-                data={"content": f"<div><b>{tname}</b></div>"},
+                id=f"{id_prefix}{t.name}", pos=pos[t.name],
+                data={"content": f"<div><b>{text}</b></div>"},
                 node_type="default", source_position="right", target_position="left",
-                style=_trans_style(tname, highlighted=hl),
+                style=_trans_style(text, highlighted=(fired_transition_name == t.name)),
             )
         )
+    return nodes, _net_edges(net, pos, id_prefix, edge_prefix)
 
-    # edges
-    edges: List[StreamlitFlowEdge] = []
-    def E(src, dst):
-        edges.append(StreamlitFlowEdge(id=f"e_{src}_{dst}", source=src, target=dst, label="", animated=False))
-
-    E("p_start","a"); E("a","p1"); E("a","p2")
-    E("p1","c"); E("c","p3")
-    E("p2","d"); E("d","p4")
-    E("p3","e"); E("p4","e")
-    E("e","p5"); E("p5","h"); E("h","p_end")
-
-    return nodes, edges
-
-# ----------------------------------------------------------------------
-# N3 normativo (alto nível)
-# ----------------------------------------------------------------------
+def build_normative_flow(
+    net: PetriNet,
+    pos: Optional[Positions] = None,
+    id_prefix: str = "norm_",
+    edge_prefix: str = "ne_",
+) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    """Rede de Petri sem fichas (visão normativa)."""
+    if pos is None:
+        pos = layered_layout(net)
 
-def build_normative_flow_N3() -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
-    pos = _layout_coords()
     nodes: List[StreamlitFlowNode] = []
-    edges: List[StreamlitFlowEdge] = []
-
-    def add_circle(pid):
+    for p in _sorted_by_pos(net.places, pos):
         nodes.append(StreamlitFlowNode(
-            id=f"norm_{pid}", pos=pos[pid], data={"content": ""}, node_type="default",
+            id=f"{id_prefix}{p.name}", pos=pos[p.name], data={"content": ""}, node_type="default",
             source_position="right", target_position="left",
             style={"border":"2px solid #6b7280","borderRadius":"9999px","width":28,"height":28,"background":"#fff"}
         ))
-
-    def add_box(tid):
+    for t in _sorted_by_pos(net.transitions, pos):
+        text = _trans_text(t)
         nodes.append(StreamlitFlowNode(
-            id=f"norm_{tid}", pos=pos[tid],
-            data={"content": f"<div><b>{tid}</b></div>"},
+            id=f"{id_prefix}{t.name}", pos=pos[t.name],
+            data={"content": f"<div><b>{text}</b></div>"},
             node_type="default", source_position="right", target_position="left",
-            style=_trans_style(tid, highlighted=False),
+            style=_trans_style(text, highlighted=False),
         ))
+    return nodes, _net_edges(net, pos, id_prefix, edge_prefix)
 
-    for pid in ["p_start","p1","p2","p3","p4","p5","p_end"]: add_circle(pid)
-    for tid in ["a","c","d","e","h"]: add_box(tid)
+def _net_edges(net: PetriNet, pos: Positions, id_prefix: str, edge_prefix: str) -> List[StreamlitFlowEdge]:
+    edges: List[StreamlitFlowEdge] = []
+    arcs = sorted(net.arcs, key=lambda a: (pos[a.source.name], pos[a.target.name], a.source.name, a.target.name))
+    for a in arcs:
+        src, dst = a.source.name, a.target.name
+        e = StreamlitFlowEdge(id=f"{edge_prefix}{src}_{dst}", source=f"{id_prefix}{src}", target=f"{id_prefix}{dst}", label="", animated=False)
+        if pos[src][0] >= pos[dst][0]:
+            e.type = "smoothstep"
+        edges.append(e)
+    return edges
 
-    def E(src,dst):
-        edges.append(StreamlitFlowEdge(id=f"ne_{src}_{dst}", source=f"norm_{src}", target=f"norm_{dst}", label="", animated=False))
-    E("p_start","a"); E("a","p1"); E("a","p2")
-    E("p1","c"); E("c","p3")
-    E("p2","d"); E("d","p4")
-    E("p3","e"); E("p4","e")
-    E("e","p5"); E("p5","h"); E("h","p_end")
+# ----------------------------------------------------------------------
+# Construtor N3 com fichas
+# ----------------------------------------------------------------------
 
-    return nodes, edges
+def build_nodes_edges_for_marking_N3(
+    net: PetriNet,
+    places: Dict[str, PetriNet.Place],
+    trans: Dict[str, PetriNet.Transition],
+    marking: Marking,
+    fired_transition_name: Optional[str],
+    prev_marking: Optional[Marking] = None,
+) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    return build_nodes_edges_for_marking(
+        net, marking, fired_transition_name, prev_marking, pos=_layout_coords()
+    )
+
+# ----------------------------------------------------------------------
+# N3 normativo (alto nível)
+# ----------------------------------------------------------------------
+
+def build_normative_flow_N3() -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    net, _, _, _, _ = build_net_N3()
+    return build_normative_flow(net, pos=_layout_coords())
 
 # ----------------------------------------------------------------------
 # Fluxo do traço (alto nível): layout sequencial determinístico
@@ -204,7 +226,7 @@ def build_trace_flow(trace: Trace) -> Tuple[List[StreamlitFlowNode], List[Stream
 
     for ev in trace:
         name = ev.get("concept:name", "?")
-        slug = re.sub(r"[^0-9a-zA-Z_]+", "_", name)
+        slug = _slug(name)
 
         t_id = trans_nodes.setdefault(name, f"t_{slug}")
         if t_id not in nodes:
@@ -255,48 +277,278 @@ def build_trace_flow(trace: Trace) -> Tuple[List[StreamlitFlowNode], List[Stream
 # Fluxo do traço com replay (token e destaque)
 # ----------------------------------------------------------------------
 
-def build_trace_replay_flow(
-    trace: Trace,
-    step: int,
-    fired_event_label: Optional[str] = None,
-) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
-    """Mesmo layout sequencial do build_trace_flow + estilos de replay."""
-    # Primeiro, constroi o layout (nós/arestas/posições)
-    nodes_list, edges = build_trace_flow(trace)
-    # mapeia id -> node
-    nodes: Dict[str, StreamlitFlowNode] = {n.id: n for n in nodes_list}
-
-    # Reconstrói sequências para saber onde posicionar o token
+def trace_place_sequence(trace: Trace) -> Tuple[List[str], List[str]]:
+    """
+    Sequência de lugares visitados pelo token no fluxo do traço e rótulos dos eventos:
+    (["p_start", "p_<ev1>", ..., "p_end"], ["<ev1>", ...]).
+    """
     place_seq: List[str] = ["p_start"]
     trans_names: List[str] = []
     for ev in trace:
         name = ev.get("concept:name", "?")
-        slug = re.sub(r"[^0-9a-zA-Z_]+", "_", name)
-        place_seq.append(f"p_{slug}")
+        place_seq.append(f"p_{_slug(name)}")
         trans_names.append(name)
     place_seq.append("p_end")
+    return place_seq, trans_names
 
-    # Passo e transição disparada
+def build_trace_replay_base(trace: Trace) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    """Layout do build_trace_flow com os estilos de replay "em repouso" (sem token/destaque)."""
+    nodes, edges = build_trace_flow(trace)
+    for node in nodes:
+        if node.id.startswith("p_"):
+            node.data = {"content": _token_html(0)}
+            node.style = _place_style(0)
+    return nodes, edges
+
+def trace_step_styles(
+    place_seq: List[str],
+    trans_names: List[str],
+    step: int,
+    fired_event_label: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Estilos do passo `step` que diferem da base (build_trace_replay_base):
+    {node_id: {"data": ..., "style": ...}} — no máximo 3 nós (token, consumo, disparo).
+    """
     step = max(0, min(step, len(place_seq) - 1))
     curr_place_id = place_seq[step]
     prev_place_id = place_seq[step - 1] if step > 0 else None
-    fired_label = fired_event_label if fired_event_label is not None else (trans_names[step - 1] if step > 0 else None)
+    fired_label = fired_event_label if fired_event_label is not None else (trans_names[step - 1] if 0 < step <= len(trans_names) else None)
+
+    styles: Dict[str, Dict[str, Any]] = {}
+    if prev_place_id is not None:
+        styles[prev_place_id] = {"data": {"content": _token_html(0)}, "style": _place_style(0, consumed=True)}
+    # o token do passo atual prevalece sobre o consumo (ex.: a → a)
+    styles[curr_place_id] = {
+        "data": {"content": _token_html(1)},
+        "style": _place_style(1, consumed=(curr_place_id == prev_place_id), produced=(step > 0)),
+    }
+    if fired_label is not None and fired_label in trans_names:
+        styles[f"t_{_slug(fired_label)}"] = {
+            "data": {"content": f"<div><b>{fired_label}</b></div>"},
+            "style": _trans_style(fired_label, highlighted=True),
+        }
+    return styles
+
+def apply_node_styles(
+    nodes: List[StreamlitFlowNode], styles: Dict[str, Dict[str, Any]]
+) -> List[StreamlitFlowNode]:
+    """Cópia rasa dos nós com `styles` sobrepostos (os nós de entrada não são alterados)."""
+    out: List[StreamlitFlowNode] = []
+    for node in nodes:
+        st_ = styles.get(node.id)
+        if st_ is not None:
+            node = copy.copy(node)
+            node.data = st_["data"]
+            node.style = st_["style"]
+        out.append(node)
+    return out
+
+@lru_cache(maxsize=256)
+def _trace_replay_layout(
+    labels: Tuple[str, ...]
+) -> Tuple[Tuple[StreamlitFlowNode, ...], Tuple[StreamlitFlowEdge, ...], Tuple[str, ...]]:
+    """Layout base de replay por sequência de atividades (calculado uma vez por variante)."""
+    events = [{"concept:name": name} for name in labels]
+    nodes, edges = build_trace_replay_base(events)
+    place_seq, _ = trace_place_sequence(events)
+    return tuple(nodes), tuple(edges), tuple(place_seq)
 
-    # Atualiza estilos dos places (token/consumo/produção)
-    for node in nodes.values():
-        if node.id.startswith("p_"):
-            tokens = 1 if node.id == curr_place_id else 0
-            consumed = (node.id == prev_place_id)
-            produced = (node.id == curr_place_id and step > 0)
-            node.data = {"content": _token_html(tokens)}
-            node.style = _place_style(tokens, consumed=consumed, produced=produced)
-
-    # Destaque da transição disparada
-    for ev in trans_names:
-        slug = re.sub(r"[^0-9a-zA-Z_]+", "_", ev)
-        t_id = f"t_{slug}"
-        if t_id in nodes:
-            nodes[t_id].style = _trans_style(ev, highlighted=(fired_label == ev))
-            nodes[t_id].data = {"content": f"<div><b>{ev}</b></div>"}
+def build_trace_replay_flow(
+    trace: Trace,
+    step: int,
+    fired_event_label: Optional[str] = None,
+) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    """
+    Mesmo layout sequencial do build_trace_flow + estilos de replay.
 
-    return list(nodes.values()), edges
+    O layout vem de um cache por variante: apenas os nós com estilo de replay são
+    copiados; os demais (e as arestas) são compartilhados e não devem ser alterados.
+    """
+    labels = tuple(ev.get("concept:name", "?") for ev in trace)
+    nodes, edges, place_seq = _trace_replay_layout(labels)
+    styles = trace_step_styles(list(place_seq), list(labels), step, fired_event_label)
+    return apply_node_styles(nodes, styles), list(edges)
+
+class TraceReplayView:
+    """
+    Fluxo de replay de um traço mantido entre passos.
+
+    `goto` altera apenas os nós cujo estilo muda entre o passo anterior e o novo
+    e devolve esses nós — o custo por passo não depende do tamanho do traço.
+    """
+
+    def __init__(self, trace: Trace):
+        labels = tuple(ev.get("concept:name", "?") for ev in trace)
+        base_nodes, base_edges, place_seq = _trace_replay_layout(labels)
+        # cópias próprias: os nós da vista são alterados in-place
+        self.nodes: List[StreamlitFlowNode] = [copy.copy(n) for n in base_nodes]
+        self.edges: List[StreamlitFlowEdge] = list(base_edges)
+        self.place_seq: List[str] = list(place_seq)
+        self.trans_names: List[str] = list(labels)
+        self._by_id: Dict[str, StreamlitFlowNode] = {n.id: n for n in self.nodes}
+        self._base: Dict[str, Dict[str, Any]] = {n.id: {"data": n.data, "style": n.style} for n in base_nodes}
+        self._overlay: Dict[str, Dict[str, Any]] = {}
+        self.step: Optional[int] = None
+
+    def goto(
+        self,
+        step: int,
+        fired_event_label: Optional[str] = None,
+        styles: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> List[StreamlitFlowNode]:
+        """Vai para `step` (estilos pré-computados opcionais) e devolve os nós alterados."""
+        if styles is None:
+            styles = trace_step_styles(self.place_seq, self.trans_names, step, fired_event_label)
+        changed: List[StreamlitFlowNode] = []
+        for nid in self._overlay.keys() | styles.keys():
+            target = styles.get(nid) or self._base[nid]
+            current = self._overlay.get(nid) or self._base[nid]
+            if target is current or target == current:
+                continue
+            node = self._by_id[nid]
+            node.data = target["data"]
+            node.style = target["style"]
+            changed.append(node)
+        self._overlay = styles
+        self.step = step
+        return changed
+
+# ----------------------------------------------------------------------
+# Renderização com nível de detalhe (traços/modelos grandes)
+# ----------------------------------------------------------------------
+
+def _summary_style(width: int) -> dict:
+    return {
+        "border": "2px dashed #9ca3af",
+        "borderRadius": "6px",
+        "width": width, "height": 34,
+        "display": "flex", "alignItems": "center", "justifyContent": "center",
+        "background": "#f9fafb", "color": "#6b7280", "fontSize": "12px",
+        "padding": "0 4px",
+    }
+
+def _summary_node(nid: str, pos: Tuple[float, float], text: str) -> StreamlitFlowNode:
+    return StreamlitFlowNode(
+        id=nid, pos=pos, data={"content": f"<div>{text}</div>"},
+        node_type="default", source_position="right", target_position="left",
+        style=_summary_style(_calc_text_box(text)),
+    )
+
+def build_trace_replay_window(
+    trace: Trace,
+    step: int,
+    window: int = 50,
+    fired_event_label: Optional[str] = None,
+) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    """
+    Fluxo de replay restrito aos eventos em [step - window, step + window).
+
+    Os eventos fora da janela viram nós-resumo "…N mais" antes/depois, de modo que
+    o número de nós e arestas fica limitado por O(window), qualquer que seja o traço.
+    """
+    labels = [ev.get("concept:name", "?") for ev in trace]
+    n = len(labels)
+    step = max(0, min(step, n))
+    lo = max(0, step - window)
+    hi = min(n, step + window)
+
+    nodes, edges = build_trace_replay_flow(
+        [{"concept:name": name} for name in labels[lo:hi]],
+        step - lo,
+        fired_event_label if fired_event_label is not None else (labels[step - 1] if step > 0 else None),
+    )
+    nodes = list(nodes)
+    if lo > 0:
+        nodes.append(_summary_node("more_before", (-130.0, 80.0), f"… {lo} mais"))
+        edges.append(StreamlitFlowEdge(id="e_more_before", source="more_before", target="p_start", label="", animated=False))
+    if hi < n:
+        x_end = max((node.pos[0] for node in nodes), default=0.0) + 130.0
+        nodes.append(_summary_node("more_after", (x_end, 80.0), f"… {n - hi} mais"))
+        edges.append(StreamlitFlowEdge(id="e_more_after", source="p_end", target="more_after", label="", animated=False))
+    return nodes, edges
+
+def collapse_flow(
+    nodes: List[StreamlitFlowNode],
+    edges: List[StreamlitFlowEdge],
+    max_nodes: int = 200,
+    weights: Optional[Dict[str, float]] = None,
+    max_edges: Optional[int] = None,
+) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    """
+    Nível de detalhe para modelos: mantém os `max_nodes` nós mais pesados e colapsa
+    os demais em nós-resumo "…N mais" (um por fragmento conexo de nós removidos,
+    agrupados por posição quando excedem o orçamento). Arestas são redirecionadas e
+    deduplicadas (multiplicidade no rótulo) e limitadas a `max_edges`.
+
+    `weights` (ex.: frequência de disparo das transições) — nós sem peso herdam o
+    maior peso dos vizinhos (lugares herdam das transições); sem pesos, usa o grau.
+    """
+    if max_edges is None:
+        max_edges = 4 * max_nodes
+    if len(nodes) <= max_nodes and len(edges) <= max_edges:
+        return nodes, edges
+
+    adj: Dict[str, List[str]] = {n.id: [] for n in nodes}
+    for e in edges:
+        if e.source in adj and e.target in adj:
+            adj[e.source].append(e.target)
+            adj[e.target].append(e.source)
+    if weights is None:
+        w = {nid: float(len(nb)) for nid, nb in adj.items()}
+    else:
+        w = {nid: float(weights[nid]) for nid in adj if nid in weights}
+        for nid, nb in adj.items():
+            if nid not in w:
+                w[nid] = max((float(weights.get(m, 0.0)) for m in nb), default=0.0)
+
+    # orçamento: ~10% (no mínimo 1) reservado a nós-resumo
+    n_summary = max(1, max_nodes // 10)
+    n_keep = max(0, max_nodes - n_summary)
+    ranked = sorted(nodes, key=lambda n: (-w[n.id], n.id))
+    kept = {n.id for n in ranked[:n_keep]}
+    dropped = ranked[n_keep:]
+
+    # fragmentos conexos de nós removidos (union-find)
+    parent = {n.id: n.id for n in dropped}
+    def find(x: str) -> str:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for e in edges:
+        if e.source in parent and e.target in parent:
+            ra, rb = find(e.source), find(e.target)
+            if ra != rb:
+                parent[ra] = rb
+    groups: Dict[str, List[StreamlitFlowNode]] = {}
+    for n in dropped:
+        groups.setdefault(find(n.id), []).append(n)
+    frags = sorted(groups.values(), key=lambda g: sum(n.pos[0] for n in g) / len(g))
+    if len(frags) > n_summary:
+        # agrupa fragmentos vizinhos (por x) para respeitar o orçamento
+        size = -(-len(frags) // n_summary)
+        frags = [[n for g in frags[i:i + size] for n in g] for i in range(0, len(frags), size)]
+
+    out_nodes = [n for n in nodes if n.id in kept]
+    owner: Dict[str, str] = {nid: nid for nid in kept}
+    for i, frag in enumerate(frags):
+        sid = f"lod_more_{i}"
+        x = sum(n.pos[0] for n in frag) / len(frag)
+        y = sum(n.pos[1] for n in frag) / len(frag)
+        out_nodes.append(_summary_node(sid, (x, y), f"… {len(frag)} mais"))
+        for n in frag:
+            owner[n.id] = sid
+
+    counts: Dict[Tuple[str, str], int] = {}
+    for e in edges:
+        s, t = owner.get(e.source), owner.get(e.target)
+        if s is None or t is None or s == t:
+            continue
+        counts[(s, t)] = counts.get((s, t), 0) + 1
+    pairs = sorted(counts, key=lambda st_: (-(w.get(st_[0], 0.0) + w.get(st_[1], 0.0)), st_))[:max_edges]
+    out_edges = [
+        StreamlitFlowEdge(id=f"lod_e_{s}_{t}", source=s, target=t, label=(f"×{counts[(s, t)]}" if counts[(s, t)] > 1 else ""), animated=False)
+        for s, t in pairs
+    ]
+    return out_nodes, out_edges
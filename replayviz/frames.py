@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Quadros (frames) pré-computados do replay de um traço.
+
+O replay de um traço é calculado uma única vez: cada passo guarda a marcação,
+a transição disparada e apenas os estilos de nó que diferem do layout base.
+Avançar/voltar um passo passa a ser uma consulta ao quadro correspondente.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pm4py.objects.log.obj import Trace
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
+
+from .markings import markings_along_trace, markings_equal
+from .flowviz import (
+    apply_node_styles,
+    build_trace_replay_base,
+    trace_place_sequence,
+    trace_step_styles,
+)
+
+
+class ReplayFrame(NamedTuple):
+    step: int
+    marking: Marking
+    fired: Optional[str]
+    reached_final: bool
+    node_styles: Dict[str, Dict[str, Any]]
+
+
+class TraceFrames(NamedTuple):
+    place_seq: List[str]
+    trans_names: List[str]
+    nodes: List[StreamlitFlowNode]
+    edges: List[StreamlitFlowEdge]
+    frames: List[ReplayFrame]
+
+    @property
+    def variant(self) -> str:
+        return " → ".join(self.trans_names)
+
+    @property
+    def max_step(self) -> int:
+        return self.frames[-1].step if self.frames else 0
+
+
+def build_trace_frames(
+    net: PetriNet,
+    im: Marking,
+    fm: Marking,
+    trace: Trace,
+    trans: Dict[str, PetriNet.Transition],
+) -> TraceFrames:
+    """Replay completo do traço: layout base + um quadro por passo (k=0 é o estado inicial)."""
+    nodes, edges = build_trace_replay_base(trace)
+    place_seq, trans_names = trace_place_sequence(trace)
+
+    frames: List[ReplayFrame] = []
+    for k, marking, fired in markings_along_trace(net, im, trace, trans):
+        styles = trace_step_styles(place_seq, trans_names, k, fired if k > 0 else None)
+        frames.append(ReplayFrame(k, marking, fired, markings_equal(marking, fm), styles))
+
+    return TraceFrames(place_seq, trans_names, nodes, edges, frames)
+
+
+def frame_flow(
+    tf: TraceFrames, step: int
+) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+    """Nós/arestas do passo `step` (cópia rasa apenas dos nós com estilo de replay)."""
+    step = max(0, min(step, tf.max_step))
+    return apply_node_styles(tf.nodes, tf.frames[step].node_styles), tf.edges
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Re-verificação incremental do log após edições no modelo.
+
+O replay é guardado por variante (um traço representante), junto com o conjunto
+de elementos da rede que ele tocou: rótulos das atividades, transições
+disparadas/habilitadas/com problema e lugares da marcação alcançada. A cada nova versão do modelo,
+a rede é comparada elemento a elemento com a anterior; só as variantes cujo
+conjunto tocado intersecta os elementos alterados são reproduzidas de novo.
+
+Conservador por construção: mudança na marcação inicial/final ou em transições
+invisíveis (que o token replay pode disparar em qualquer ponto) invalida tudo.
+"""
+from typing import Any, Dict, FrozenSet, Hashable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+import time
+
+import numpy as np
+import pandas as pd
+
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .aggregation import VARIANT_SEP, LogCodes, VariantIndex, case_codes, encode_log, variant_index
+
+Element = Tuple[str, str]  # ("t", nome/rótulo) | ("p", lugar)
+ALL: FrozenSet[Element] = frozenset({("*", "*")})
+
+
+class UpdateStats(NamedTuple):
+    replayed: int
+    reused: int
+    changed: int           # elementos da rede alterados desde a versão anterior
+    seconds: float
+
+
+def net_signature(net: PetriNet, im: Marking, fm: Marking) -> Dict[Hashable, Any]:
+    """Assinatura por elemento: transição -> (rótulo, entradas, saídas); marcações inicial/final."""
+    pre: Dict[str, List[Tuple[str, int]]] = {t.name: [] for t in net.transitions}
+    post: Dict[str, List[Tuple[str, int]]] = {t.name: [] for t in net.transitions}
+    for a in net.arcs:
+        w = int(getattr(a, "weight", 1))
+        if isinstance(a.target, PetriNet.Transition):
+            pre[a.target.name].append((a.source.name, w))
+        else:
+            post[a.source.name].append((a.target.name, w))
+    sig: Dict[Hashable, Any] = {
+        ("t", t.name): (t.label, tuple(sorted(pre[t.name])), tuple(sorted(post[t.name])))
+        for t in net.transitions
+    }
+    sig["im"] = tuple(sorted((p.name, int(k)) for p, k in im.items()))
+    sig["fm"] = tuple(sorted((p.name, int(k)) for p, k in fm.items()))
+    return sig
+
+
+def changed_elements(old: Mapping[Hashable, Any], new: Mapping[Hashable, Any]) -> FrozenSet[Element]:
+    """Elementos afetados entre duas assinaturas (ALL se a mudança não é localizável)."""
+    out: Set[Element] = set()
+    for key in set(old) | set(new):
+        a, b = old.get(key), new.get(key)
+        if a == b:
+            continue
+        if key in ("im", "fm"):
+            return ALL
+        _, name = key
+        for sig in (a, b):
+            if sig is None:
+                continue
+            label, ins, outs = sig
+            if label is None:
+                return ALL  # transição invisível
+            out.add(("t", name))
+            out.add(("t", label))
+            out.update(("p", p) for p, _ in ins)
+    return frozenset(out)
+
+
+def _touched(activities: Sequence[str], result: Mapping[str, Any]) -> FrozenSet[Element]:
+    # transições visíveis que o traço não dispara não alteram o seu replay; os
+    # lugares da marcação alcançada cobrem mudanças no conjunto de habilitadas
+    out: Set[Element] = {("t", a) for a in activities}
+    trans: List[Any] = list(result.get("activated_transitions") or [])
+    trans += list(result.get("enabled_transitions_in_marking") or [])
+    trans += list(result.get("transitions_with_problems") or [])
+    for t in trans:
+        out.add(("t", t.name))
+        if t.label is not None:
+            out.add(("t", t.label))
+    out.update(("p", getattr(p, "name", str(p))) for p in result.get("reached_marking") or {})
+    return frozenset(out)
+
+
+class IncrementalReplay:
+    """Resultados de token replay por variante, atualizados só onde o modelo mudou."""
+
+    def __init__(self, log: EventLog, lc: Optional[LogCodes] = None, vi: Optional[VariantIndex] = None) -> None:
+        self.log = log
+        self.lc = lc if lc is not None else encode_log(log)
+        self.vi = vi if vi is not None else variant_index(self.lc)
+        self._acts: List[Tuple[str, ...]] = [
+            tuple(self.lc.activities[c] for c in case_codes(self.lc, int(i))) for i in self.vi.first_case
+        ]
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self._touched: Dict[int, FrozenSet[Element]] = {}
+        self._signature: Optional[Dict[Hashable, Any]] = None
+        self.model_activities: Tuple[str, ...] = ()
+
+    @property
+    def n_variants(self) -> int:
+        return len(self.vi.first_case)
+
+    def update(self, net: PetriNet, im: Marking, fm: Marking) -> UpdateStats:
+        """Sincroniza com a versão atual do modelo; reproduz só as variantes afetadas."""
+        from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
+
+        t0 = time.perf_counter()
+        sig = net_signature(net, im, fm)
+        if self._signature is None:
+            changed: FrozenSet[Element] = ALL
+            dirty = list(range(self.n_variants))
+        else:
+            changed = changed_elements(self._signature, sig)
+            if changed == ALL:
+                dirty = list(range(self.n_variants))
+            else:
+                dirty = [v for v in range(self.n_variants) if self._touched[v] & changed]
+        if dirty:
+            traces = EventLog([self.log[int(self.vi.first_case[v])] for v in dirty])
+            for v, res in zip(dirty, token_based_replay.apply(traces, net, im, fm)):
+                self.results[v] = res
+                self._touched[v] = _touched(self._acts[v], res)
+        self._signature = sig
+        self.model_activities = tuple(sorted({t.label for t in net.transitions if t.label is not None}))
+        n_changed = len(sig) if changed == ALL else len(changed)
+        return UpdateStats(len(dirty), self.n_variants - len(dirty), n_changed, time.perf_counter() - t0)
+
+    # ------------------------------------------------------------------
+    def frame(self) -> pd.DataFrame:
+        """Uma linha por variante: frequência, fit, fitness e fichas (do último update)."""
+        model = set(self.model_activities)
+        rows = []
+        for v in range(self.n_variants):
+            r = self.results.get(v, {})
+            acts = self._acts[v]
+            rows.append({
+                "variant": VARIANT_SEP.join(acts),
+                "frequency": int(self.vi.frequency[v]),
+                "trace_is_fit": bool(r.get("trace_is_fit")),
+                "trace_fitness": float(r.get("trace_fitness") or 0.0),
+                "missing_tokens": int(r.get("missing_tokens") or 0),
+                "remaining_tokens": int(r.get("remaining_tokens") or 0),
+                "missing_activities": len(model - set(acts)),
+                "extra_activities": len(set(acts) - model),
+            })
+        return pd.DataFrame(rows).sort_values(
+            ["frequency", "trace_fitness", "variant"], ascending=[False, False, True], kind="mergesort"
+        ).reset_index(drop=True)
+
+    def totals(self) -> Dict[str, float]:
+        """Fitness e taxa de fit do log inteiro (ponderados pela frequência das variantes)."""
+        freq = self.vi.frequency.astype(np.float64)
+        n = freq.sum()
+        if not n or not self.results:
+            return {"total_traces": int(n), "global_trace_fitness": 0.0, "fit_rate": 0.0}
+        fitness = np.array([float(self.results[v].get("trace_fitness") or 0.0) for v in range(self.n_variants)])
+        fit = np.array([float(bool(self.results[v].get("trace_is_fit"))) for v in range(self.n_variants)])
+        return {
+            "total_traces": int(n),
+            "global_trace_fitness": float((fitness * freq).sum() / n),
+            "fit_rate": float((fit * freq).sum() / n),
+        }
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Painéis Streamlit do processo: job em segundo plano (progresso, cancelar, repetir) e cache de cálculos."""
+from typing import Callable, Optional
+import time
+
+import streamlit as st
+
+from .compute_cache import get_compute_cache
+from .jobs import CANCELLED, DONE, ERROR, Job
+
+POLL_SECONDS = 0.5
+
+
+def job_panel(job: Job, label: str, key: str, on_restart: Optional[Callable[[], None]] = None) -> None:
+    """Mostra o estado do job; em execução, barra de progresso + botão de cancelar."""
+    if job.status == DONE:
+        return
+    if job.status == ERROR:
+        st.error(f"{label} falhou: {job.error}")
+    elif job.status == CANCELLED:
+        st.warning(f"{label} cancelado em {job.done}/{job.total} traços (resultados parciais abaixo).")
+    else:
+        cols = st.columns([5, 1])
+        cols[0].progress(job.fraction, text=f"{label}: {job.done}/{job.total or '?'} traços")
+        if cols[1].button("Cancelar", key=f"{key}_cancel"):
+            job.cancel()
+            st.rerun()
+        return
+    if on_restart is not None and st.button("Executar novamente", key=f"{key}_restart"):
+        on_restart()
+        st.rerun()
+
+
+def poll_job(job: Job, seconds: float = POLL_SECONDS) -> None:
+    """No fim do script: enquanto o job roda, agenda um novo rerun para atualizar o progresso."""
+    if not job.finished:
+        time.sleep(seconds)
+        st.rerun()
+
+
+def cache_panel() -> None:
+    """Estatísticas do cache de cálculos do processo (barra lateral)."""
+    cache = get_compute_cache()
+    total = cache.stats()
+    with st.sidebar.expander("Cache do servidor", expanded=False):
+        st.progress(
+            min(1.0, total.bytes / total.budget) if total.budget else 0.0,
+            text=f"{total.bytes / 2**20:.0f} / {total.budget / 2**20:.0f} MB ({total.entries} entradas)",
+        )
+        rows = [{"espaço": ns, **cache.stats(ns)._asdict()} for ns in cache.namespaces()]
+        for r in rows:
+            r["MB"] = round(r.pop("bytes") / 2**20, 1)
+            r.pop("budget")
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.caption(
+            f"acertos {total.hits} · faltas {total.misses} · esperas {total.waits} · despejos {total.evictions}"
+        )
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Execução em segundo plano de rodadas de conformidade (replay, alignments).
+
+Um JobManager único por processo mantém os jobs indexados por chave
+(impressão digital do log, hash do modelo, parâmetros). A página submete o job
+e, a cada rerun, reencontra o mesmo job pela chave — sem recomeçar o cálculo —
+para exibir progresso, resultados parciais e oferecer cancelamento.
+
+O cancelamento é cooperativo: as funções de job processam o log em blocos e
+consultam `job.check_cancelled()` entre um bloco e outro. Com um `ResultStore`,
+as variantes já calculadas (em qualquer log anterior) são lidas do disco.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .pm4py_model import net_structure_hash
+from .result_store import ALIGNMENTS, TOKEN_REPLAY, ResultStore, VariantResults
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do job quando o cancelamento foi pedido."""
+
+
+class Job:
+    def __init__(self, key: Hashable) -> None:
+        self.key = key
+        self.status = PENDING
+        self.done = 0
+        self.total = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self._partial: List[Any] = []
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- usado pela função do job ---
+    def report(self, done: int, total: Optional[int] = None, partial: Optional[List[Any]] = None) -> None:
+        """Atualiza o progresso e acrescenta resultados parciais (em ordem)."""
+        with self._lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+            if partial:
+                self._partial.extend(partial)
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    # --- usado pela página ---
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, ERROR, CANCELLED)
+
+    @property
+    def fraction(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+    def partial(self) -> List[Any]:
+        """Cópia dos resultados parciais já produzidos."""
+        with self._lock:
+            return list(self._partial)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            # ainda não tinha começado
+            self.status = CANCELLED
+            self.finished_at = time.time()
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 2, keep_finished: int = 32) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="replayviz-job")
+        self._jobs: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+        self.keep_finished = keep_finished
+
+    def submit(
+        self, key: Hashable, fn: Callable[..., Any], *args: Any, restart: bool = False, **kwargs: Any
+    ) -> Job:
+        """
+        Job da chave `key`: reaproveita o existente (em execução, concluído,
+        cancelado ou com erro — estes só são refeitos a pedido); cria um novo se
+        não houver ou se `restart`. `fn(job, *args, **kwargs)` roda em uma
+        thread do pool.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not restart:
+                return job
+            if job is not None and not job.finished:
+                job.cancel()
+            job = Job(key)
+            self._jobs[key] = job
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+            self._prune()
+            return job
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def cancel(self, key: Hashable) -> None:
+        job = self.get(key)
+        if job is not None:
+            job.cancel()
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+        if job._cancel.is_set():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = ERROR
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        finished = sorted(
+            (j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at or 0.0
+        )
+        for j in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[j.key]
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """JobManager compartilhado pelo processo (todas as sessões/reruns)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def job_key(log_key: Hashable, net: PetriNet, kind: str, **params: Any) -> Tuple[Any, ...]:
+    """Chave do job: (tipo, impressão digital do log, hash do modelo, parâmetros)."""
+    return (kind, log_key, net_structure_hash(net), tuple(sorted(params.items())))
+
+
+# ----------------------------------------------------------------------
+# Funções de job (processam o log em blocos, com progresso e cancelamento)
+# ----------------------------------------------------------------------
+
+def _chunks(log: EventLog, size: int):
+    for i in range(0, len(log), size):
+        yield i, EventLog(log[i:i + size])
+
+
+def _run_chunks(
+    job: Job, log: EventLog, net: PetriNet, algo: str, compute: Callable[[EventLog], List[Any]],
+    chunk_size: int, store: Optional[ResultStore],
+) -> List[Dict[str, Any]]:
+    """
+    Resultados por traço, em blocos; com `store`, as variantes já guardadas são
+    lidas em vez de recalculadas e cada bloco calcula só as variantes novas.
+    """
+    n = len(log)
+    job.report(0, n)
+    results: List[Dict[str, Any]] = []
+    variants = VariantResults(store, net, algo) if store is not None else None
+    try:
+        for i, part in _chunks(log, chunk_size):
+            job.check_cancelled()
+            res = variants.resolve(part, compute) if variants is not None else compute(part)
+            results.extend(res)
+            job.report(min(i + chunk_size, n), n, res)
+    finally:
+        if store is not None:
+            store.flush()
+    return results
+
+
+def token_replay_job(
+    job: Job, log: EventLog, net: PetriNet, im: Marking, fm: Marking, chunk_size: int = 500,
+    store: Optional[ResultStore] = None,
+) -> List[Dict[str, Any]]:
+    """Token replay do log inteiro; parciais = resultados por traço, na ordem do log."""
+    from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
+
+    return _run_chunks(
+        job, log, net, TOKEN_REPLAY, lambda part: token_based_replay.apply(part, net, im, fm), chunk_size, store
+    )
+
+
+def alignments_job(
+    job: Job, log: EventLog, net: PetriNet, im: Marking, fm: Marking, chunk_size: int = 50,
+    store: Optional[ResultStore] = None,
+) -> List[Dict[str, Any]]:
+    """Alignments do log inteiro; parciais = resultados por traço, na ordem do log."""
+    from pm4py.algo.conformance.alignments.petri_net import algorithm as alignments
+
+    return _run_chunks(
+        job, log, net, ALIGNMENTS, lambda part: alignments.apply_log(part, net, im, fm), chunk_size, store
+    )
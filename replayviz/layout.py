@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Layout em camadas (estilo Sugiyama) para redes de Petri arbitrárias.
+
+Etapas: quebra de ciclos (DFS), ranqueamento pelo caminho mais longo, nós
+fictícios nas arestas que atravessam camadas, redução de cruzamentos por
+baricentro (varreduras alternadas) e atribuição de coordenadas. O resultado é
+memoizado pelo hash estrutural da rede: cada modelo é posicionado uma única vez
+por processo.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import threading
+
+from pm4py.objects.petri_net.obj import PetriNet
+
+from .pm4py_model import net_structure_hash
+
+X_SPACING = 80.0
+Y_SPACING = 60.0
+_SWEEPS = 8
+_CACHE_SIZE = 64
+
+_cache: "OrderedDict[Tuple[str, float, float], Dict[str, Tuple[float, float]]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def layered_layout(
+    net: PetriNet, x_spacing: float = X_SPACING, y_spacing: float = Y_SPACING
+) -> Dict[str, Tuple[float, float]]:
+    """Posições (px, esquerda → direita) por nome de lugar/transição; memoizado por estrutura."""
+    key = (net_structure_hash(net), float(x_spacing), float(y_spacing))
+    with _lock:
+        pos = _cache.get(key)
+        if pos is not None:
+            _cache.move_to_end(key)
+            return dict(pos)
+    pos = _compute_layout(net, float(x_spacing), float(y_spacing))
+    with _lock:
+        _cache[key] = pos
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(pos)
+
+
+# ----------------------------------------------------------------------
+# Etapas do layout
+# ----------------------------------------------------------------------
+
+def _graph(net: PetriNet) -> Tuple[List[str], Dict[str, List[str]]]:
+    names = sorted(p.name for p in net.places) + sorted(t.name for t in net.transitions)
+    succ: Dict[str, List[str]] = {n: [] for n in names}
+    for a in sorted(net.arcs, key=lambda a: (a.source.name, a.target.name)):
+        s, t = a.source.name, a.target.name
+        if t not in succ[s]:
+            succ[s].append(t)
+    return names, succ
+
+
+def _acyclic(names: List[str], succ: Dict[str, List[str]]) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Remove ciclos invertendo arestas de retorno (DFS iterativo); devolve também a ordem de descoberta."""
+    indeg = {n: 0 for n in names}
+    for s in names:
+        for t in succ[s]:
+            indeg[t] += 1
+    roots = [n for n in names if indeg[n] == 0] + [n for n in names if indeg[n] > 0]
+
+    WHITE, GRAY, BLACK = 0, 1, 2
+    color = {n: WHITE for n in names}
+    dag: Dict[str, List[str]] = {n: [] for n in names}
+    order: List[str] = []
+    for root in roots:
+        if color[root] != WHITE:
+            continue
+        color[root] = GRAY
+        order.append(root)
+        stack = [(root, iter(succ[root]))]
+        while stack:
+            v, it = stack[-1]
+            w = next(it, None)
+            if w is None:
+                color[v] = BLACK
+                stack.pop()
+                continue
+            if w == v:
+                continue  # laço próprio: ignorado no layout
+            if color[w] == GRAY:
+                if v not in dag[w]:
+                    dag[w].append(v)  # aresta de retorno invertida
+                continue
+            if w not in dag[v]:
+                dag[v].append(w)
+            if color[w] == WHITE:
+                color[w] = GRAY
+                order.append(w)
+                stack.append((w, iter(succ[w])))
+    return dag, order
+
+
+def _ranks(names: List[str], dag: Dict[str, List[str]]) -> Dict[str, int]:
+    """Caminho mais longo a partir das fontes; fontes são puxadas para junto dos sucessores."""
+    indeg = {n: 0 for n in names}
+    for s in names:
+        for t in dag[s]:
+            indeg[t] += 1
+    rank = {n: 0 for n in names}
+    queue = [n for n in names if indeg[n] == 0]
+    topo: List[str] = []
+    while queue:
+        v = queue.pop()
+        topo.append(v)
+        for w in dag[v]:
+            rank[w] = max(rank[w], rank[v] + 1)
+            indeg[w] -= 1
+            if indeg[w] == 0:
+                queue.append(w)
+    has_pred = {t for s in names for t in dag[s]}
+    for v in reversed(topo):
+        if v not in has_pred and dag[v]:
+            rank[v] = max(rank[v], min(rank[w] for w in dag[v]) - 1)
+    return rank
+
+
+def _count_crossings(upper: List[str], lower: List[str], down: Dict[str, List[str]]) -> int:
+    """Cruzamentos entre duas camadas (contagem de inversões com Fenwick)."""
+    pos_l = {v: i for i, v in enumerate(lower)}
+    seq = [pos_l[w] for v in upper for w in sorted(down[v], key=pos_l.__getitem__) if w in pos_l]
+    tree = [0] * (len(lower) + 1)
+    crossings = 0
+    for seen, x in enumerate(seq):
+        i, le = x + 1, 0
+        while i > 0:
+            le += tree[i]
+            i -= i & -i
+        crossings += seen - le
+        i = x + 1
+        while i <= len(lower):
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def _compute_layout(net: PetriNet, x_spacing: float, y_spacing: float) -> Dict[str, Tuple[float, float]]:
+    names, succ = _graph(net)
+    if not names:
+        return {}
+    dag, order = _acyclic(names, succ)
+    rank = _ranks(names, dag)
+
+    # arestas longas -> cadeias de nós fictícios (um por camada atravessada)
+    down: Dict[str, List[str]] = {n: [] for n in names}
+    up: Dict[str, List[str]] = {n: [] for n in names}
+    dummy = 0
+    for s in names:
+        for t in dag[s]:
+            prev = s
+            for r in range(rank[s] + 1, rank[t]):
+                d = f"\0{dummy}"
+                dummy += 1
+                rank[d] = r
+                down[d], up[d] = [], []
+                down[prev].append(d)
+                up[d].append(prev)
+                prev = d
+            down[prev].append(t)
+            up[t].append(prev)
+
+    n_layers = max(rank.values()) + 1
+    layers: List[List[str]] = [[] for _ in range(n_layers)]
+    first_seen = {v: i for i, v in enumerate(order)}
+    for v in sorted(rank, key=lambda v: (first_seen.get(v, len(first_seen)), v)):
+        layers[rank[v]].append(v)
+
+    # redução de cruzamentos: baricentro alternando descida/subida, guarda a melhor ordem
+    def total_crossings() -> int:
+        return sum(_count_crossings(layers[r], layers[r + 1], down) for r in range(n_layers - 1))
+
+    best = [list(layer) for layer in layers]
+    best_cross = total_crossings()
+    for sweep in range(_SWEEPS):
+        downward = sweep % 2 == 0
+        rng = range(1, n_layers) if downward else range(n_layers - 2, -1, -1)
+        for r in rng:
+            ref = layers[r - 1] if downward else layers[r + 1]
+            nbrs = up if downward else down
+            idx = {v: i for i, v in enumerate(ref)}
+            cur = {v: i for i, v in enumerate(layers[r])}
+            def bary(v: str) -> float:
+                ps = [idx[w] for w in nbrs[v] if w in idx]
+                return sum(ps) / len(ps) if ps else float(cur[v])
+            layers[r].sort(key=bary)
+        cross = total_crossings()
+        if cross < best_cross:
+            best_cross = cross
+            best = [list(layer) for layer in layers]
+        if best_cross == 0:
+            break
+    layers = best
+
+    # coordenadas: y alinhado à média dos vizinhos, respeitando ordem e espaçamento
+    y: Dict[str, float] = {}
+    for layer in layers:
+        for i, v in enumerate(layer):
+            y[v] = (i - (len(layer) - 1) / 2.0) * y_spacing
+    for sweep in range(4):
+        downward = sweep % 2 == 0
+        rng = range(1, n_layers) if downward else range(n_layers - 2, -1, -1)
+        nbrs = up if downward else down
+        for r in rng:
+            layer = layers[r]
+            desired = [
+                (sum(y[w] for w in nbrs[v]) / len(nbrs[v])) if nbrs[v] else y[v]
+                for v in layer
+            ]
+            placed: List[float] = []
+            for i, d in enumerate(desired):
+                placed.append(d if i == 0 else max(d, placed[-1] + y_spacing))
+            shift = sum(d - p for d, p in zip(desired, placed)) / len(layer)
+            for v, p in zip(layer, placed):
+                y[v] = p + shift
+
+    y_min = min(y[v] for v in names)
+    return {v: (rank[v] * x_spacing, y[v] - y_min) for v in names}
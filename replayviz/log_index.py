@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Índice do log para filtrar casos antes do replay/alignments.
+
+Construído uma vez por log (sobre `encode_log`/`variant_index`):
+
+- atividade -> casos: bitmap de casos (bits empacotados em uint8) por atividade;
+- início/fim de cada caso (segundos; NaN sem timestamp) e as ordens de início e
+  de fim, para consultas de intervalo por busca binária;
+- variante -> casos: pela trie de variantes (`variants.VariantTrie`).
+
+Filtros devolvem `CaseSet` (bitmap) e se combinam com &, | e ~; o subconjunto
+selecionado vira um EventLog (e os LogCodes/VariantIndex correspondentes) por
+indexação dos casos — sem percorrer eventos em Python.
+"""
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pm4py.objects.log.obj import EventLog
+
+from .aggregation import _POPCOUNT, LogCodes, VariantIndex, encode_log, variant_index
+from .variants import VariantTrie
+
+START, END, OVERLAP, WITHIN = "start", "end", "overlap", "within"
+
+
+class CaseSet:
+    """Conjunto de casos como bitmap (np.packbits, ordem big-endian dos bits)."""
+
+    __slots__ = ("bits", "n")
+
+    def __init__(self, bits: np.ndarray, n: int) -> None:
+        self.bits = bits
+        self.n = n
+
+    @classmethod
+    def from_cases(cls, cases: Iterable[int], n: int) -> "CaseSet":
+        mask = np.zeros(n, dtype=bool)
+        mask[np.fromiter(cases, dtype=np.int64) if not isinstance(cases, np.ndarray) else cases] = True
+        return cls(np.packbits(mask), n)
+
+    @classmethod
+    def full(cls, n: int) -> "CaseSet":
+        return cls(np.packbits(np.ones(n, dtype=bool)), n)
+
+    def __and__(self, other: "CaseSet") -> "CaseSet":
+        return CaseSet(self.bits & other.bits, self.n)
+
+    def __or__(self, other: "CaseSet") -> "CaseSet":
+        return CaseSet(self.bits | other.bits, self.n)
+
+    def __sub__(self, other: "CaseSet") -> "CaseSet":
+        return CaseSet(self.bits & ~other.bits, self.n)
+
+    def __invert__(self) -> "CaseSet":
+        bits = ~self.bits
+        if self.n % 8:  # zera os bits de preenchimento do último byte
+            bits[-1] &= np.uint8((0xFF << (8 - self.n % 8)) & 0xFF)
+        return CaseSet(bits, self.n)
+
+    def __len__(self) -> int:
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def cases(self) -> np.ndarray:
+        """Índices dos casos (int64, em ordem do log)."""
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.n)).astype(np.int64)
+
+
+class LogIndex(NamedTuple):
+    lc: LogCodes
+    vi: VariantIndex
+    activity_bits: np.ndarray   # uint8 (n_atividades × ceil(n_casos / 8))
+    start: np.ndarray           # float64, início de cada caso (NaN sem timestamp)
+    end: np.ndarray             # float64, fim de cada caso
+    start_order: np.ndarray     # casos com timestamp, ordenados por início
+    end_order: np.ndarray       # casos com timestamp, ordenados por fim
+    trie: VariantTrie           # variantes: casos, frequências, prefixos
+
+    @property
+    def n_cases(self) -> int:
+        return len(self.lc.offsets) - 1
+
+    # --- consultas -------------------------------------------------------
+    def all(self) -> CaseSet:
+        return CaseSet.full(self.n_cases)
+
+    def _code(self, activity: str) -> Optional[int]:
+        try:
+            return self.lc.activities.index(activity)
+        except ValueError:
+            return None
+
+    def with_activity(self, activity: str) -> CaseSet:
+        """Casos que contêm `activity` (vazio se a atividade não ocorre no log)."""
+        c = self._code(activity)
+        if c is None:
+            return CaseSet(np.zeros(self.activity_bits.shape[1], dtype=np.uint8), self.n_cases)
+        return CaseSet(self.activity_bits[c].copy(), self.n_cases)
+
+    def with_all(self, activities: Sequence[str]) -> CaseSet:
+        out = self.all()
+        for a in activities:
+            out = out & self.with_activity(a)
+        return out
+
+    def with_any(self, activities: Sequence[str]) -> CaseSet:
+        out = CaseSet(np.zeros(self.activity_bits.shape[1], dtype=np.uint8), self.n_cases)
+        for a in activities:
+            out = out | self.with_activity(a)
+        return out
+
+    def in_range(self, t0: Optional[float], t1: Optional[float], mode: str = OVERLAP) -> CaseSet:
+        """
+        Casos por intervalo [t0, t1] (segundos; None = aberto): `start`/`end` — o
+        início/fim cai no intervalo; `overlap` — o caso cruza o intervalo;
+        `within` — o caso inteiro está dentro. Casos sem timestamp ficam de fora.
+        """
+        lo = -np.inf if t0 is None else float(t0)
+        hi = np.inf if t1 is None else float(t1)
+        s_sorted = self.start[self.start_order]
+        e_sorted = self.end[self.end_order]
+        if mode == START:
+            cases = self.start_order[np.searchsorted(s_sorted, lo, "left"):np.searchsorted(s_sorted, hi, "right")]
+            return CaseSet.from_cases(cases, self.n_cases)
+        if mode == END:
+            cases = self.end_order[np.searchsorted(e_sorted, lo, "left"):np.searchsorted(e_sorted, hi, "right")]
+            return CaseSet.from_cases(cases, self.n_cases)
+        if mode == WITHIN:
+            return self.in_range(lo, None, START) & self.in_range(None, hi, END)
+        if mode == OVERLAP:
+            # início <= hi (prefixo da ordem de início) e fim >= lo (sufixo da ordem de fim)
+            started = CaseSet.from_cases(self.start_order[: np.searchsorted(s_sorted, hi, "right")], self.n_cases)
+            ended = CaseSet.from_cases(self.end_order[np.searchsorted(e_sorted, lo, "left"):], self.n_cases)
+            return started & ended
+        raise ValueError(f"Modo de intervalo desconhecido: {mode!r}")
+
+    def variants(self, variant_ids: Iterable[int]) -> CaseSet:
+        """Casos das variantes `variant_ids` (ids de `vi`)."""
+        parts = [self.trie.cases(v) for v in variant_ids]
+        cases = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        return CaseSet.from_cases(cases, self.n_cases)
+
+    def time_bounds(self) -> Tuple[Optional[float], Optional[float]]:
+        if not len(self.start_order):
+            return None, None
+        return float(self.start[self.start_order[0]]), float(self.end[self.end_order[-1]])
+
+    # --- subconjunto -----------------------------------------------------
+    def subset(self, log: EventLog, selection: CaseSet) -> EventLog:
+        """EventLog só com os casos selecionados (mesmos objetos de traço, ordem do log)."""
+        return EventLog([log[int(i)] for i in selection.cases()])
+
+    def subset_codes(self, selection: CaseSet) -> Tuple[LogCodes, VariantIndex]:
+        """LogCodes/VariantIndex do subconjunto, derivados do índice (sem recodificar eventos)."""
+        cases = selection.cases()
+        lc, vi = self.lc, self.vi
+        lengths = (lc.offsets[cases + 1] - lc.offsets[cases]).astype(np.int64)
+        offsets = np.zeros(len(cases) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        starts = np.repeat(lc.offsets[cases], lengths)
+        within = np.arange(int(offsets[-1]), dtype=np.int64) - np.repeat(offsets[:-1], lengths)
+        codes = lc.codes[starts + within]
+        # variantes renumeradas em ordem de primeira ocorrência no subconjunto
+        old = vi.case_variant[cases]
+        uniq, first_pos, inverse = np.unique(old, return_index=True, return_inverse=True)
+        order = np.argsort(first_pos, kind="stable")
+        rank = np.empty(len(uniq), dtype=np.int64)
+        rank[order] = np.arange(len(uniq), dtype=np.int64)
+        case_variant = rank[inverse].astype(np.int64)
+        first_case = np.sort(first_pos).astype(np.int64)
+        frequency = np.bincount(case_variant, minlength=len(uniq)).astype(np.int64)
+        return (
+            LogCodes(codes, offsets, list(lc.activities)),
+            VariantIndex(case_variant, first_case, frequency),
+        )
+
+
+def _case_times(log: EventLog, timestamp_key: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Início/fim por caso (primeiro/último evento; uma consulta por caso, não por evento)."""
+    n = len(log)
+    start = np.full(n, np.nan)
+    end = np.full(n, np.nan)
+    for i, trace in enumerate(log):
+        if not len(trace):
+            continue
+        a, b = trace[0].get(timestamp_key), trace[-1].get(timestamp_key)
+        if a is not None:
+            start[i] = a.timestamp() if hasattr(a, "timestamp") else float(a)
+        if b is not None:
+            end[i] = b.timestamp() if hasattr(b, "timestamp") else float(b)
+    # eventos fora de ordem: o intervalo do caso é [min, max]
+    swap = start > end
+    start[swap], end[swap] = end[swap], start[swap]
+    return start, end
+
+
+def build_log_index(
+    log: EventLog,
+    lc: Optional[LogCodes] = None,
+    vi: Optional[VariantIndex] = None,
+    timestamp_key: str = "time:timestamp",
+) -> LogIndex:
+    if lc is None:
+        lc = encode_log(log)
+    if vi is None:
+        vi = variant_index(lc)
+    n_cases = len(lc.offsets) - 1
+    n_bytes = (n_cases + 7) // 8
+
+    # bitmap atividade -> casos (um bit por par distinto atividade/caso)
+    lengths = np.diff(lc.offsets)
+    case_of_event = np.repeat(np.arange(n_cases, dtype=np.int64), lengths)
+    codes = lc.codes.astype(np.int64)
+    bits = np.zeros((len(lc.activities), n_bytes), dtype=np.uint8)
+    if len(codes):
+        np.bitwise_or.at(bits, (codes, case_of_event >> 3), (128 >> (case_of_event & 7)).astype(np.uint8))
+
+    start, end = _case_times(log, timestamp_key)
+    has_start = np.flatnonzero(~np.isnan(start))
+    has_end = np.flatnonzero(~np.isnan(end))
+    start_order = has_start[np.argsort(start[has_start], kind="stable")]
+    end_order = has_end[np.argsort(end[has_end], kind="stable")]
+
+    return LogIndex(lc, vi, bits, start, end, start_order, end_order, VariantTrie(lc, vi))
+
+
+def describe_filter(
+    with_all: Sequence[str] = (), without: Sequence[str] = (), t0: Optional[float] = None,
+    t1: Optional[float] = None, mode: str = OVERLAP, variant_ids: Sequence[int] = (),
+) -> Tuple:
+    """Chave estável do filtro (para caches/jobs)."""
+    if t0 is None and t1 is None:
+        mode = OVERLAP
+    return (tuple(sorted(with_all)), tuple(sorted(without)), t0, t1, mode, tuple(sorted(variant_ids)))
+
+
+def apply_filter(
+    index: LogIndex, with_all: Sequence[str] = (), without: Sequence[str] = (),
+    t0: Optional[float] = None, t1: Optional[float] = None, mode: str = OVERLAP,
+    variant_ids: Sequence[int] = (),
+) -> CaseSet:
+    """Combina os filtros (E lógico); filtro vazio = todos os casos."""
+    sel = index.with_all(with_all) if with_all else index.all()
+    if without:
+        sel = sel - index.with_any(without)
+    if t0 is not None or t1 is not None:
+        sel = sel & index.in_range(t0, t1, mode)
+    if variant_ids:
+        sel = sel & index.variants(variant_ids)
+    return sel
+
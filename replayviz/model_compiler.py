@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Compilação do modelo da página 0 (JSON de nós/arestas do streamlit_flow) em rede
+de Petri executável.
+
+O resultado (rede PM4Py + forma inteira de `streaming.compile_net`) é indexado
+pelo hash do conteúdo estrutural do modelo — ids dos nós e pares origem→destino;
+posições, rótulos de aresta e HTML dos nós não entram — e guardado em cache no
+processo. Qualquer página (e qualquer sessão) que pedir o mesmo modelo recebe o
+mesmo objeto, sem reconstruir a rede a cada rerun.
+
+Estruturas inválidas levantam `ModelCompileError` com a lista de todos os
+problemas encontrados, cada um apontando o nó/aresta responsável.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Tuple
+import hashlib
+import json
+
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .model_io import load_model_file
+from .pm4py_model import build_net_N3, build_net_from_flow_json
+from .streaming import CompiledNet, compile_net
+
+N3_KEY = "N3"
+CACHE_SIZE = 32
+
+
+class ModelCompileError(ValueError):
+    """Modelo inválido; `problems` traz uma mensagem por problema encontrado."""
+
+    def __init__(self, problems: List[str]) -> None:
+        self.problems = list(problems)
+        super().__init__("; ".join(self.problems))
+
+
+class CompiledModel(NamedTuple):
+    key: str                                   # hash do conteúdo (ou "N3")
+    net: PetriNet
+    im: Marking
+    fm: Marking
+    places: Dict[str, PetriNet.Place]
+    trans: Dict[str, PetriNet.Transition]
+    compiled: CompiledNet
+    activities: Tuple[str, ...]                # rótulos visíveis
+
+    def as_tuple(self) -> Tuple[PetriNet, Marking, Marking, Dict[str, PetriNet.Place], Dict[str, PetriNet.Transition]]:
+        """Mesma forma de `build_net_N3()`: (net, im, fm, places, trans)."""
+        return self.net, self.im, self.fm, self.places, self.trans
+
+
+_CACHE: "OrderedDict[str, CompiledModel]" = OrderedDict()
+_LOCK = Lock()
+
+
+# ----------------------------------------------------------------------
+# Normalização / validação / hash
+# ----------------------------------------------------------------------
+
+def _field(el: Any, name: str) -> Any:
+    if isinstance(el, Mapping):
+        return el.get(name)
+    return getattr(el, name, None)
+
+
+def flow_to_json(nodes: Iterable[Any], edges: Iterable[Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Estado do canvas (objetos ou dicts) -> JSON mínimo que o compilador usa."""
+    return {
+        "nodes": [{"id": _field(n, "id")} for n in nodes],
+        "edges": [
+            {"id": _field(e, "id"), "source": _field(e, "source"), "target": _field(e, "target")}
+            for e in edges
+        ],
+    }
+
+
+def validate_flow(data: Any) -> List[str]:
+    """Todos os problemas estruturais do JSON (lista vazia = válido)."""
+    if not isinstance(data, Mapping):
+        return ["O modelo deve ser um objeto JSON com 'nodes' e 'edges'."]
+    nodes, edges = data.get("nodes"), data.get("edges", [])
+    problems: List[str] = []
+    if not isinstance(nodes, list):
+        return ["'nodes' ausente ou não é uma lista."]
+    if not isinstance(edges, list):
+        problems.append("'edges' não é uma lista.")
+        edges = []
+    if not nodes:
+        problems.append("Modelo sem nós.")
+
+    seen: Dict[str, int] = {}
+    for i, n in enumerate(nodes):
+        nid = _field(n, "id")
+        if nid is None or str(nid).strip() == "":
+            problems.append(f"nodes[{i}]: nó sem 'id'.")
+            continue
+        nid = str(nid)
+        if nid in seen:
+            problems.append(f"nodes[{i}]: id {nid!r} duplicado (já usado em nodes[{seen[nid]}]).")
+        else:
+            seen[nid] = i
+
+    edge_ids: Dict[str, int] = {}
+    for i, e in enumerate(edges):
+        eid = _field(e, "id")
+        where = f"edges[{i}]" + (f" ({eid!r})" if eid is not None else "")
+        if eid is not None:
+            if str(eid) in edge_ids:
+                problems.append(f"{where}: id duplicado (já usado em edges[{edge_ids[str(eid)]}]).")
+            else:
+                edge_ids[str(eid)] = i
+        for end in ("source", "target"):
+            ref = _field(e, end)
+            if ref is None or str(ref).strip() == "":
+                problems.append(f"{where}: sem '{end}'.")
+            elif str(ref) not in seen:
+                problems.append(f"{where}: {end} {str(ref)!r} não é um nó do modelo.")
+    return problems
+
+
+def flow_hash(data: Mapping[str, Any]) -> str:
+    """Hash do conteúdo que define a rede: ids dos nós e pares origem→destino."""
+    canon = {
+        "nodes": sorted(str(_field(n, "id")) for n in data.get("nodes") or []),
+        "edges": sorted({(str(_field(e, "source")), str(_field(e, "target"))) for e in data.get("edges") or []}),
+    }
+    raw = json.dumps(canon, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Compilação com cache
+# ----------------------------------------------------------------------
+
+def _compile(key: str, net: PetriNet, im: Marking, fm: Marking, places: Dict, trans: Dict) -> CompiledModel:
+    activities = tuple(sorted({t.label for t in net.transitions if t.label is not None}))
+    return CompiledModel(key, net, im, fm, places, trans, compile_net(net, im, fm), activities)
+
+
+def _cached(key: str, build) -> CompiledModel:
+    with _LOCK:
+        model = _CACHE.get(key)
+        if model is not None:
+            _CACHE.move_to_end(key)
+            return model
+    model = build()
+    with _LOCK:
+        # outra thread pode ter compilado o mesmo modelo: fica o primeiro
+        model = _CACHE.setdefault(key, model)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return model
+
+
+def compile_flow(data: Mapping[str, Any]) -> CompiledModel:
+    """JSON da página 0 -> modelo compilado (em cache pelo hash do conteúdo)."""
+    problems = validate_flow(data)
+    if problems:
+        raise ModelCompileError(problems)
+    key = flow_hash(data)
+    return _cached(key, lambda: _compile(key, *build_net_from_flow_json(flow_to_json(data["nodes"], data.get("edges") or []))))
+
+
+def compile_flow_state(nodes: Iterable[Any], edges: Iterable[Any]) -> CompiledModel:
+    """Atalho para o estado em sessão do canvas (listas de nós/arestas)."""
+    return compile_flow(flow_to_json(nodes, edges))
+
+
+def load_flow_file(path: str) -> CompiledModel:
+    """Arquivo exportado pela página 0 (.json ou .json.gz)."""
+    nodes, edges = load_model_file(path, validate=False)  # a validação estrutural fica com compile_flow
+    return compile_flow({"nodes": nodes, "edges": edges})
+
+
+def n3_compiled() -> CompiledModel:
+    """Modelo de referência N3, compilado uma vez por processo."""
+    return _cached(N3_KEY, lambda: _compile(N3_KEY, *build_net_N3()))
+
+
+def cache_clear() -> None:
+    with _LOCK:
+        _CACHE.clear()
+
+
+def cached_keys() -> List[str]:
+    with _LOCK:
+        return list(_CACHE)
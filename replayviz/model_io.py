@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Serialização do modelo da página 0 (JSON `{"nodes": [...], "edges": [...]}`).
+
+- leitura: bytes/str, JSON puro ou gzip (detectado pelo cabeçalho); usa orjson
+  quando instalado (opcional), senão o módulo json;
+- validação em uma passada por lista: tipos dos campos, ids duplicados e
+  arestas com origem/destino inexistentes, com o índice de cada problema;
+- escrita compacta (sem indentação), opcionalmente gzip, ou em blocos
+  (`iter_dumps`) para gravar/baixar modelos grandes sem montar uma string única.
+"""
+from typing import Any, Dict, IO, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+import gzip
+import json
+
+try:  # dependência opcional: 3–10× mais rápido em modelos grandes
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None  # type: ignore[assignment]
+
+GZIP_MAGIC = b"\x1f\x8b"
+MAX_PROBLEMS = 50
+CHUNK_SIZE = 2_000
+
+Record = Dict[str, Any]
+
+
+class ModelFormatError(ValueError):
+    """JSON de modelo inválido; `problems` traz uma mensagem por problema (até MAX_PROBLEMS)."""
+
+    def __init__(self, problems: List[str]) -> None:
+        self.problems = list(problems)
+        super().__init__("; ".join(self.problems[:5]) + (" …" if len(self.problems) > 5 else ""))
+
+
+# ----------------------------------------------------------------------
+# JSON (orjson opcional)
+# ----------------------------------------------------------------------
+
+def _loads(raw: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# ----------------------------------------------------------------------
+# Validação
+# ----------------------------------------------------------------------
+
+def _is_num(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def validate_model(data: Any, max_problems: int = MAX_PROBLEMS) -> List[str]:
+    """Problemas de esquema e integridade (lista vazia = válido)."""
+    if not isinstance(data, Mapping):
+        return ["O modelo deve ser um objeto JSON com 'nodes' e 'edges'."]
+    nodes, edges = data.get("nodes"), data.get("edges", [])
+    if not isinstance(nodes, list):
+        return ["'nodes' ausente ou não é uma lista."]
+    if not isinstance(edges, list):
+        return ["'edges' não é uma lista."]
+
+    problems: List[str] = []
+
+    def bad(msg: str) -> bool:
+        problems.append(msg)
+        return len(problems) >= max_problems
+
+    node_ids: Dict[str, int] = {}
+    for i, n in enumerate(nodes):
+        if not isinstance(n, dict):
+            if bad(f"nodes[{i}]: esperado objeto, veio {type(n).__name__}."):
+                break
+            continue
+        nid = n.get("id")
+        if not isinstance(nid, str) or not nid:
+            if bad(f"nodes[{i}]: 'id' deve ser texto não vazio."):
+                break
+            continue
+        j = node_ids.setdefault(nid, i)
+        if j != i and bad(f"nodes[{i}]: id {nid!r} duplicado (já usado em nodes[{j}])."):
+            break
+        pos = n.get("position", n.get("pos"))
+        if pos is not None:
+            ok = (
+                isinstance(pos, dict) and _is_num(pos.get("x", 0)) and _is_num(pos.get("y", 0))
+            ) or (isinstance(pos, list) and len(pos) >= 2 and _is_num(pos[0]) and _is_num(pos[1]))
+            if not ok and bad(f"nodes[{i}] ({nid!r}): posição inválida {pos!r}."):
+                break
+        for key in ("type", "sourcePosition", "targetPosition"):
+            v = n.get(key)
+            if v is not None and not isinstance(v, str) and bad(f"nodes[{i}] ({nid!r}): '{key}' deve ser texto."):
+                break
+        data_field = n.get("data")
+        if data_field is not None and not isinstance(data_field, dict) and bad(
+            f"nodes[{i}] ({nid!r}): 'data' deve ser objeto."
+        ):
+            break
+    if len(problems) >= max_problems:
+        return problems
+
+    edge_ids: Dict[str, int] = {}
+    for i, e in enumerate(edges):
+        if not isinstance(e, dict):
+            if bad(f"edges[{i}]: esperado objeto, veio {type(e).__name__}."):
+                break
+            continue
+        eid = e.get("id")
+        where = f"edges[{i}]" + (f" ({eid!r})" if isinstance(eid, str) else "")
+        if not isinstance(eid, str) or not eid:
+            if bad(f"{where}: 'id' deve ser texto não vazio."):
+                break
+        else:
+            j = edge_ids.setdefault(eid, i)
+            if j != i and bad(f"{where}: id duplicado (já usado em edges[{j}])."):
+                break
+        stop = False
+        for end in ("source", "target"):
+            ref = e.get(end)
+            if not isinstance(ref, str) or not ref:
+                stop = bad(f"{where}: '{end}' deve ser texto não vazio.")
+            elif ref not in node_ids:
+                stop = bad(f"{where}: {end} {ref!r} não é um nó do modelo.")
+            if stop:
+                break
+        if stop:
+            break
+        label = e.get("label")
+        if label is not None and not isinstance(label, str) and bad(f"{where}: 'label' deve ser texto."):
+            break
+    return problems
+
+
+# ----------------------------------------------------------------------
+# Leitura
+# ----------------------------------------------------------------------
+
+def loads_model(raw: Union[bytes, bytearray, str], validate: bool = True) -> Tuple[List[Record], List[Record]]:
+    """Bytes (JSON ou gzip) / str -> (nós, arestas) validados."""
+    if isinstance(raw, (bytes, bytearray)) and raw[:2] == GZIP_MAGIC:
+        try:
+            raw = gzip.decompress(raw)
+        except (OSError, EOFError) as ex:  # BadGzipFile é OSError; truncado => EOFError
+            raise ModelFormatError([f"Arquivo gzip inválido: {ex}"]) from None
+    try:
+        data = _loads(raw)
+    except ValueError as ex:  # json.JSONDecodeError, orjson.JSONDecodeError e UnicodeDecodeError são ValueError
+        raise ModelFormatError([f"JSON inválido: {ex}"]) from None
+    if not isinstance(data, dict):
+        raise ModelFormatError(["O JSON deve ser um objeto com 'nodes' e 'edges'."])
+    if validate:
+        problems = validate_model(data)
+        if problems:
+            raise ModelFormatError(problems)
+    return data.get("nodes") or [], data.get("edges") or []
+
+
+def load_model_file(path: str, validate: bool = True) -> Tuple[List[Record], List[Record]]:
+    with open(path, "rb") as f:
+        return loads_model(f.read(), validate=validate)
+
+
+# ----------------------------------------------------------------------
+# Escrita
+# ----------------------------------------------------------------------
+
+def iter_dumps(nodes: Iterable[Record], edges: Iterable[Record], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """JSON compacto em blocos de `chunk_size` elementos (memória limitada ao bloco)."""
+
+    def _array(items: Iterable[Record]) -> Iterator[bytes]:
+        buf: List[Record] = []
+        first = True
+        for it in items:
+            buf.append(it)
+            if len(buf) >= chunk_size:
+                body = _dumps(buf)[1:-1]
+                yield body if first else b"," + body
+                first = False
+                buf = []
+        if buf:
+            body = _dumps(buf)[1:-1]
+            yield body if first else b"," + body
+
+    yield b'{"nodes":['
+    yield from _array(nodes)
+    yield b'],"edges":['
+    yield from _array(edges)
+    yield b"]}"
+
+
+def dumps_model(nodes: Iterable[Record], edges: Iterable[Record], compress: bool = False) -> bytes:
+    raw = b"".join(iter_dumps(nodes, edges))
+    return gzip.compress(raw, compresslevel=6, mtime=0) if compress else raw
+
+
+def save_model(path: str, nodes: Iterable[Record], edges: Iterable[Record], compress: Optional[bool] = None) -> None:
+    """Grava em blocos; `compress=None` => gzip se o caminho termina em .gz."""
+    if compress is None:
+        compress = str(path).endswith(".gz")
+    f: IO[bytes]
+    with (gzip.open(path, "wb", compresslevel=6) if compress else open(path, "wb")) as f:  # type: ignore[assignment]
+        for chunk in iter_dumps(nodes, edges):
+            f.write(chunk)
+
+
+def preview(
+    nodes: Sequence[Record], edges: Sequence[Record], limit: int = 20, totals: Optional[Tuple[int, int]] = None
+) -> str:
+    """JSON indentado só dos primeiros elementos (pré-visualização); `totals` = (nós, arestas) do modelo."""
+    n_nodes, n_edges = totals if totals is not None else (len(nodes), len(edges))
+    head = {"nodes": list(nodes[:limit]), "edges": list(edges[:limit])}
+    text = json.dumps(head, ensure_ascii=False, indent=2)
+    if n_nodes > limit or n_edges > limit:
+        text += f"\n// … {n_nodes} nós e {n_edges} arestas no total"
+    return text
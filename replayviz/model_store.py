@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento indexado do grafo editado na página 0 (Gerador de Modelo Normativo).
+
+Nós e arestas ficam em dicionários por id (na ordem de inserção), com listas de
+adjacência de entrada/saída por nó; cada operação de CRUD custa O(grau) em vez
+de varrer as listas inteiras. Toda alteração estrutural passa por uma transação
+que registra as operações primitivas e seus inversos — base do desfazer/refazer
+e do rollback quando uma edição em lote falha no meio.
+
+Os elementos são os objetos do streamlit_flow (ou dicts equivalentes); o store
+não os interpreta além de `id`, `source`, `target` e `selected`.
+"""
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+import copy
+
+import pandas as pd
+
+MAX_HISTORY = 200
+
+# operações primitivas: (tipo, elemento antigo, elemento novo)
+ADD_NODE, DEL_NODE, PUT_NODE = "+n", "-n", "~n"
+ADD_EDGE, DEL_EDGE, PUT_EDGE = "+e", "-e", "~e"
+_INVERSE = {ADD_NODE: DEL_NODE, DEL_NODE: ADD_NODE, PUT_NODE: PUT_NODE,
+            ADD_EDGE: DEL_EDGE, DEL_EDGE: ADD_EDGE, PUT_EDGE: PUT_EDGE}
+
+Op = Tuple[str, Any, Any]
+
+
+class ModelStoreError(ValueError):
+    """Operação inválida sobre o modelo (id duplicado, nó inexistente...)."""
+
+
+def _get(el: Any, name: str) -> Any:
+    if isinstance(el, Mapping):
+        return el.get(name)
+    return getattr(el, name, None)
+
+
+def with_fields(el: Any, **fields: Any) -> Any:
+    """Cópia rasa do elemento com os campos trocados (objeto ou dict)."""
+    if isinstance(el, Mapping):
+        return {**el, **fields}
+    out = copy.copy(el)
+    for k, v in fields.items():
+        setattr(out, k, v)
+    return out
+
+
+class ModelStore:
+    """Grafo nós/arestas indexado por id, com histórico de alterações."""
+
+    def __init__(self, nodes: Iterable[Any] = (), edges: Iterable[Any] = (), max_history: int = MAX_HISTORY) -> None:
+        self.nodes: Dict[str, Any] = {}
+        self.edges: Dict[str, Any] = {}
+        self.out_edges: Dict[str, Set[str]] = {}
+        self.in_edges: Dict[str, Set[str]] = {}
+        self.selected_nodes: List[str] = []
+        self.selected_edges: List[str] = []
+        self.version = 0
+        self.layout_version = 0  # posições/seleção vindas do canvas (fora do histórico e de `version`)
+        self._undo: Deque[Tuple[str, List[Op]]] = deque(maxlen=max_history)
+        self._redo: List[Tuple[str, List[Op]]] = []
+        self._tx: Optional[List[Op]] = None
+        self._synced: Any = None
+        for n in nodes:
+            self._apply((ADD_NODE, None, n))
+        for e in edges:
+            self._apply((ADD_EDGE, None, e))
+
+    # ------------------------------------------------------------------
+    # Primitivas (sem validação; usadas por transações e desfazer/refazer)
+    # ------------------------------------------------------------------
+    def _apply(self, op: Op) -> None:
+        kind, old, new = op
+        if kind == ADD_NODE:
+            nid = str(_get(new, "id"))
+            self.nodes[nid] = new
+            self.out_edges.setdefault(nid, set())
+            self.in_edges.setdefault(nid, set())
+        elif kind == DEL_NODE:
+            nid = str(_get(old, "id"))
+            del self.nodes[nid]
+            self.out_edges.pop(nid, None)
+            self.in_edges.pop(nid, None)
+        elif kind == PUT_NODE:
+            self.nodes[str(_get(new, "id"))] = new
+        elif kind == ADD_EDGE:
+            eid = str(_get(new, "id"))
+            self.edges[eid] = new
+            self.out_edges[str(_get(new, "source"))].add(eid)
+            self.in_edges[str(_get(new, "target"))].add(eid)
+        elif kind == DEL_EDGE:
+            eid = str(_get(old, "id"))
+            del self.edges[eid]
+            self.out_edges[str(_get(old, "source"))].discard(eid)
+            self.in_edges[str(_get(old, "target"))].discard(eid)
+        elif kind == PUT_EDGE:
+            self._apply((DEL_EDGE, old, None))
+            self._apply((ADD_EDGE, None, new))
+
+    @staticmethod
+    def _inverse(ops: List[Op]) -> List[Op]:
+        return [(_INVERSE[k], new, old) for k, old, new in reversed(ops)]
+
+    def _record(self, op: Op) -> None:
+        if self._tx is None:
+            raise RuntimeError("Operação fora de transação.")
+        self._apply(op)
+        self._tx.append(op)
+
+    @contextmanager
+    def transaction(self, label: str) -> Iterator["ModelStore"]:
+        """Agrupa operações em um passo do histórico; em caso de erro, desfaz o que já foi aplicado."""
+        if self._tx is not None:  # transação aninhada: junta-se à externa
+            yield self
+            return
+        self._tx = []
+        try:
+            yield self
+        except BaseException:
+            for op in self._inverse(self._tx):
+                self._apply(op)
+            raise
+        else:
+            if self._tx:
+                self._undo.append((label, self._tx))
+                self._redo.clear()
+                self.version += 1
+        finally:
+            self._tx = None
+
+    # ------------------------------------------------------------------
+    # Consultas O(1)
+    # ------------------------------------------------------------------
+    def has_node(self, nid: str) -> bool:
+        return nid in self.nodes
+
+    def node(self, nid: str) -> Any:
+        try:
+            return self.nodes[nid]
+        except KeyError:
+            raise ModelStoreError(f"Nó '{nid}' não encontrado.") from None
+
+    def incident_edges(self, nid: str) -> Set[str]:
+        return self.out_edges.get(nid, set()) | self.in_edges.get(nid, set())
+
+    def to_lists(self) -> Tuple[List[Any], List[Any]]:
+        return list(self.nodes.values()), list(self.edges.values())
+
+    # ------------------------------------------------------------------
+    # CRUD (cada operação é uma transação; custo O(grau))
+    # ------------------------------------------------------------------
+    def add_node(self, node: Any) -> None:
+        nid = str(_get(node, "id") or "")
+        if not nid:
+            raise ModelStoreError("Nó sem id.")
+        if nid in self.nodes:
+            raise ModelStoreError(f"Já existe um nó com id '{nid}'.")
+        with self.transaction(f"adicionar nó {nid}"):
+            self._record((ADD_NODE, None, node))
+
+    def update_node(self, node: Any) -> None:
+        """Troca os atributos de um nó existente (mesmo id)."""
+        old = self.node(str(_get(node, "id")))
+        with self.transaction(f"editar nó {_get(node, 'id')}"):
+            self._record((PUT_NODE, old, node))
+
+    def add_edge(self, edge: Any) -> None:
+        eid = str(_get(edge, "id") or "")
+        src, dst = str(_get(edge, "source")), str(_get(edge, "target"))
+        if not eid:
+            raise ModelStoreError("Aresta sem id.")
+        if eid in self.edges:
+            raise ModelStoreError(f"Aresta '{eid}' já existe.")
+        if src not in self.nodes or dst not in self.nodes:
+            raise ModelStoreError(f"Aresta '{eid}': source/target devem existir entre os nós ({src} → {dst}).")
+        with self.transaction(f"adicionar aresta {eid}"):
+            self._record((ADD_EDGE, None, edge))
+
+    def update_edge(self, edge: Any) -> None:
+        eid = str(_get(edge, "id"))
+        old = self.edges.get(eid)
+        if old is None:
+            raise ModelStoreError(f"Aresta '{eid}' não encontrada.")
+        src, dst = str(_get(edge, "source")), str(_get(edge, "target"))
+        if src not in self.nodes or dst not in self.nodes:
+            raise ModelStoreError(f"Aresta '{eid}': source/target devem existir entre os nós ({src} → {dst}).")
+        with self.transaction(f"editar aresta {eid}"):
+            self._record((PUT_EDGE, old, edge))
+
+    def remove_edges(self, eids: Iterable[str]) -> int:
+        n = 0
+        with self.transaction("remover arestas"):
+            for eid in eids:
+                e = self.edges.get(eid)
+                if e is not None:
+                    self._record((DEL_EDGE, e, None))
+                    n += 1
+        return n
+
+    def remove_nodes(self, nids: Iterable[str]) -> int:
+        """Remove os nós e as arestas incidentes."""
+        n = 0
+        with self.transaction("remover nós"):
+            for nid in nids:
+                if nid not in self.nodes:
+                    continue
+                self.remove_edges(list(self.incident_edges(nid)))
+                self._record((DEL_NODE, self.nodes[nid], None))
+                n += 1
+        return n
+
+    def rename_node(self, old_id: str, new_id: str) -> None:
+        """Troca o id do nó e reaponta as arestas incidentes (ids das arestas mantidos)."""
+        node = self.node(old_id)
+        if new_id == old_id:
+            return
+        if new_id in self.nodes:
+            raise ModelStoreError(f"Já existe um nó com id '{new_id}'.")
+        with self.transaction(f"renomear {old_id} → {new_id}"):
+            incident = [self.edges[eid] for eid in self.incident_edges(old_id)]
+            for e in incident:
+                self._record((DEL_EDGE, e, None))
+            self._record((DEL_NODE, node, None))
+            self._record((ADD_NODE, None, with_fields(node, id=new_id)))
+            for e in incident:
+                src, dst = str(_get(e, "source")), str(_get(e, "target"))
+                self._record((ADD_EDGE, None, with_fields(
+                    e, source=new_id if src == old_id else src, target=new_id if dst == old_id else dst,
+                )))
+
+    def replace_all(self, nodes: Iterable[Any], edges: Iterable[Any], label: str = "substituir modelo") -> None:
+        """Troca o grafo inteiro (importação/reinício) em um único passo desfazível."""
+        nodes, edges = list(nodes), list(edges)
+        with self.transaction(label):
+            # removidos de trás para frente: desfazer reinsere na ordem original
+            for e in reversed(list(self.edges.values())):
+                self._record((DEL_EDGE, e, None))
+            for n in reversed(list(self.nodes.values())):
+                self._record((DEL_NODE, n, None))
+            # inclusão em massa: mesmas checagens de add_node/add_edge, sem uma chamada por elemento
+            for n in nodes:
+                nid = str(_get(n, "id") or "")
+                if not nid or nid in self.nodes:
+                    self.add_node(n)  # levanta o erro adequado
+                self._record((ADD_NODE, None, n))
+            for e in edges:
+                eid = str(_get(e, "id") or "")
+                if not eid or eid in self.edges or str(_get(e, "source")) not in self.nodes \
+                        or str(_get(e, "target")) not in self.nodes:
+                    self.add_edge(e)
+                self._record((ADD_EDGE, None, e))
+
+    def reset(self, nodes: Iterable[Any], edges: Iterable[Any]) -> None:
+        """Recarrega o grafo e descarta o histórico."""
+        version, layout = self.version, self.layout_version
+        self.__init__(nodes, edges, self._undo.maxlen or MAX_HISTORY)  # type: ignore[misc]
+        self.layout_version = layout
+        self.version = version + 1  # a versão nunca volta: é a impressão digital enviada ao canvas
+
+    # ------------------------------------------------------------------
+    # Desfazer / refazer
+    # ------------------------------------------------------------------
+    @property
+    def undo_label(self) -> Optional[str]:
+        return self._undo[-1][0] if self._undo else None
+
+    @property
+    def redo_label(self) -> Optional[str]:
+        return self._redo[-1][0] if self._redo else None
+
+    def undo(self) -> Optional[str]:
+        if not self._undo:
+            return None
+        label, ops = self._undo.pop()
+        for op in self._inverse(ops):
+            self._apply(op)
+        self._redo.append((label, ops))
+        self.version += 1
+        return label
+
+    def redo(self) -> Optional[str]:
+        if not self._redo:
+            return None
+        label, ops = self._redo.pop()
+        for op in ops:
+            self._apply(op)
+        self._undo.append((label, ops))
+        self.version += 1
+        return label
+
+    # ------------------------------------------------------------------
+    # Sincronização com o canvas
+    # ------------------------------------------------------------------
+    def is_synced(self, state: Any) -> bool:
+        return state is self._synced
+
+    def mark_synced(self, state: Any) -> None:
+        self._synced = state
+
+    def sync(
+        self, state: Any, nodes: List[Any], edges: List[Any], is_selected: Callable[[Any], bool]
+    ) -> None:
+        """
+        Incorpora o estado devolvido pelo canvas (posições, seleção, elementos
+        apagados/criados no próprio componente). Só roda quando o objeto de estado
+        mudou; inclusões/remoções entram no histórico como um passo "canvas".
+        """
+        if state is self._synced:
+            return
+        moved = False
+        node_ids = {str(_get(n, "id")) for n in nodes}
+        edge_ids = {str(_get(e, "id")) for e in edges}
+        with self.transaction("edição no canvas"):
+            for eid in [eid for eid in self.edges if eid not in edge_ids]:
+                self._record((DEL_EDGE, self.edges[eid], None))
+            for nid in [nid for nid in self.nodes if nid not in node_ids]:
+                self.remove_nodes([nid])
+            for n in nodes:
+                nid = str(_get(n, "id"))
+                cur = self.nodes.get(nid)
+                if cur is None:
+                    self._record((ADD_NODE, None, n))
+                elif cur is not n:
+                    self._apply((PUT_NODE, cur, n))  # posição/seleção: fora do histórico
+                    moved = True
+            for e in edges:
+                eid = str(_get(e, "id"))
+                cur = self.edges.get(eid)
+                if cur is None:
+                    if str(_get(e, "source")) in self.nodes and str(_get(e, "target")) in self.nodes:
+                        self._record((ADD_EDGE, None, e))
+                elif cur is not e and str(_get(e, "source")) in self.nodes and str(_get(e, "target")) in self.nodes:
+                    self._apply((PUT_EDGE, cur, e))
+                    moved = True
+        if moved:
+            # não muda `version` (o canvas seria recriado), mas invalida o que depende das posições
+            self.layout_version += 1
+        self.selected_nodes = [str(_get(n, "id")) for n in nodes if is_selected(n)]
+        self.selected_edges = [str(_get(e, "id")) for e in edges if is_selected(e)]
+        self._synced = state
+
+    # ------------------------------------------------------------------
+    # Tabelas paginadas (derivadas sob demanda)
+    # ------------------------------------------------------------------
+    def n_pages(self, kind: str, page_size: int) -> int:
+        n = len(self.nodes if kind == "nodes" else self.edges)
+        return max(1, -(-n // page_size))
+
+    def page(self, kind: str, page: int, page_size: int) -> List[Any]:
+        """Elementos da página `page` (1-based), na ordem de inserção."""
+        items = self.nodes if kind == "nodes" else self.edges
+        start = (max(1, page) - 1) * page_size
+        return list(islice(items.values(), start, start + page_size))
+
+    def page_frame(
+        self, kind: str, page: int, page_size: int, to_row: Callable[[Any], Dict[str, Any]]
+    ) -> pd.DataFrame:
+        return pd.DataFrame([to_row(el) for el in self.page(kind, page, page_size)])
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Seleção do modelo nas páginas: N3 (referência) ou o modelo editado na página 0."""
+import streamlit as st
+
+from .analysis import INTERACTIVE_BUDGET, analyze_model
+from .model_compiler import CompiledModel, ModelCompileError, compile_flow_state, n3_compiled
+
+# slot do canvas da página 0 (Gerador de Modelo Normativo)
+EDITOR_SLOT = "norm_model_builder"
+
+N3_OPTION = "N3 (referência)"
+EDITED_OPTION = "Modelo editado (página 0)"
+
+
+def _editor_lists():
+    fs = st.session_state.get(EDITOR_SLOT)
+    if fs is None:
+        return [], []
+    try:
+        return fs.nodes, fs.edges
+    except AttributeError:
+        return fs["nodes"], fs["edges"]
+
+
+def select_model(key: str = "model_choice") -> CompiledModel:
+    """Radio na barra lateral; o modelo editado é compilado (com cache) a partir da sessão."""
+    nodes, edges = _editor_lists()
+    options = [N3_OPTION, EDITED_OPTION] if nodes else [N3_OPTION]
+    with st.sidebar:
+        choice = st.radio(
+            "Modelo", options, key=key,
+            help="O modelo editado vem do canvas da página 0 e só é recompilado quando a estrutura muda.",
+        )
+    if choice != EDITED_OPTION:
+        return n3_compiled()
+    try:
+        return compile_flow_state(nodes, edges)
+    except ModelCompileError as ex:
+        st.error("O modelo editado na página 0 é inválido:")
+        for p in ex.problems:
+            st.markdown(f"- {p}")
+        st.stop()
+
+
+def analysis_gate(model: CompiledModel, refuse: bool = False, key: str = "analysis_override") -> None:
+    """Avisa (ou, com `refuse`, interrompe) quando a análise estrutural acusa problemas.
+
+    Recusa só o que trava execuções caras: rede ilimitada ou marcação final
+    inalcançável; o usuário pode forçar a execução pela caixa de confirmação.
+    """
+    res = analyze_model(model, INTERACTIVE_BUDGET)
+    msgs = res.messages()
+    if not msgs:
+        return
+    if refuse and not res.safe_to_replay:
+        st.error("Análise estrutural: o modelo pode não terminar / não alcançar a marcação final.")
+        for m in msgs:
+            st.markdown(f"- {m}")
+        if not st.checkbox("Executar mesmo assim", key=key):
+            st.stop()
+        return
+    with st.expander("⚠️ Análise estrutural do modelo", expanded=False):
+        for m in msgs:
+            st.markdown(f"- {m}")
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Reprodução do replay no navegador.
+
+Exporta o layout estático (nós/arestas) uma única vez e uma lista compacta de
+diferenças por passo (variação de fichas por lugar + transição destacada).
+Um visualizador HTML autocontido anima e navega pelos passos sem rerun do
+Streamlit: percorrer um traço de 5.000 eventos não custa 5.000 reruns.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+import json
+import re
+
+from pm4py.objects.petri_net.obj import Marking
+from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
+
+from .frames import TraceFrames
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _node_label(node: StreamlitFlowNode) -> str:
+    data = node.data if isinstance(node.data, dict) else {}
+    return _TAG_RE.sub("", str(data.get("content", ""))).strip()
+
+
+def _node_shape(node: StreamlitFlowNode) -> str:
+    style = node.style or {}
+    return "circle" if str(style.get("borderRadius", "")).startswith("9999") else "box"
+
+
+def export_playback(
+    nodes: Sequence[StreamlitFlowNode],
+    edges: Sequence[StreamlitFlowEdge],
+    tokens_per_step: Sequence[Mapping[str, int]],
+    fired_per_step: Sequence[Optional[str]],
+) -> Dict[str, Any]:
+    """
+    Payload de reprodução:
+    {"nodes": [[id, x, y, w, h, shape, label], ...],
+     "edges": [[i_src, i_dst], ...],
+     "steps": [[[[i_no, delta], ...], i_transicao_ou_-1], ...]}
+
+    O passo 0 traz as fichas iniciais (delta a partir de zero); os demais trazem
+    apenas os lugares cujo número de fichas mudou.
+    """
+    index = {n.id: i for i, n in enumerate(nodes)}
+    out_nodes: List[List[Any]] = []
+    for n in nodes:
+        style = n.style or {}
+        shape = _node_shape(n)
+        out_nodes.append([
+            n.id, float(n.pos[0]), float(n.pos[1]),
+            int(style.get("width", 28)), int(style.get("height", 28)),
+            shape, "" if shape == "circle" else _node_label(n),
+        ])
+    out_edges = [[index[e.source], index[e.target]] for e in edges if e.source in index and e.target in index]
+
+    steps: List[List[Any]] = []
+    prev: Mapping[str, int] = {}
+    for tokens, fired in zip(tokens_per_step, fired_per_step):
+        diff = [
+            [index[nid], tokens.get(nid, 0) - prev.get(nid, 0)]
+            for nid in set(tokens) | set(prev)
+            if nid in index and tokens.get(nid, 0) != prev.get(nid, 0)
+        ]
+        diff.sort()
+        steps.append([diff, index.get(fired, -1) if fired is not None else -1])
+        prev = tokens
+    return {"nodes": out_nodes, "edges": out_edges, "steps": steps}
+
+
+def trace_playback(tf: TraceFrames) -> Dict[str, Any]:
+    """Payload do fluxo do traço: um token percorre tf.place_seq; destaca a transição do quadro."""
+    tokens = [{tf.place_seq[f.step]: 1} for f in tf.frames]
+    fired = [
+        next((nid for nid in f.node_styles if nid.startswith("t_")), None) if f.step > 0 else None
+        for f in tf.frames
+    ]
+    return export_playback(tf.nodes, tf.edges, tokens, fired)
+
+
+def marking_playback(
+    nodes: Sequence[StreamlitFlowNode],
+    edges: Sequence[StreamlitFlowEdge],
+    markings: Sequence[Marking],
+    fired: Sequence[Optional[str]],
+    id_prefix: str = "",
+) -> Dict[str, Any]:
+    """Payload de uma rede de Petri com marcações (ids dos nós = prefixo + nome do lugar/transição)."""
+    tokens = [{f"{id_prefix}{getattr(p, 'name', str(p))}": int(k) for p, k in m.items()} for m in markings]
+    fired_ids = [f"{id_prefix}{t}" if t is not None else None for t in fired]
+    return export_playback(nodes, edges, tokens, fired_ids)
+
+
+# ----------------------------------------------------------------------
+# Visualizador HTML autocontido
+# ----------------------------------------------------------------------
+
+_PLAYER_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<style>
+  body { margin: 0; font-family: sans-serif; color: #111827; }
+  .bar { display: flex; gap: 6px; align-items: center; padding: 4px 0; flex-wrap: wrap; }
+  .bar button { padding: 2px 10px; border: 1px solid #d1d5db; border-radius: 4px; background: #fff; cursor: pointer; }
+  .bar input[type=range] { flex: 1; min-width: 120px; }
+  svg { width: 100%; border: 1px solid #e5e7eb; border-radius: 6px; }
+  .tok { font-size: 12px; fill: #111827; }
+  .lbl { font-size: 12px; font-weight: 700; fill: #111827; }
+</style></head>
+<body>
+<div class="bar">
+  <button id="prev">&#9198; Prev</button>
+  <button id="play">&#9654; Play</button>
+  <button id="next">&#9197; Next</button>
+  <button id="reset">&#10226; Reset</button>
+  <input id="slider" type="range" min="0" value="0">
+  <span id="info"></span>
+  <label>ms/passo <input id="speed" type="number" min="10" step="50" style="width:70px"></label>
+</div>
+<svg id="view" xmlns="http://www.w3.org/2000/svg" style="height:__SVG_HEIGHT__px">
+  <defs><marker id="arr" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" markerHeight="6" orient="auto-start-reverse">
+    <path d="M 0 0 L 10 5 L 0 10 z" fill="#9ca3af"/></marker></defs>
+  <g id="edges"></g><g id="nodes"></g>
+</svg>
+<script>
+const P = __PAYLOAD__;
+const N = P.nodes, E = P.edges, S = P.steps, MAX = S.length - 1;
+const NS = "http://www.w3.org/2000/svg";
+const tok = new Int32Array(N.length);
+const shapes = [], texts = [];
+let cur = -1, timer = null;
+
+function el(tag, attrs, parent) {
+  const x = document.createElementNS(NS, tag);
+  for (const k in attrs) x.setAttribute(k, attrs[k]);
+  parent.appendChild(x); return x;
+}
+function center(i) { const n = N[i]; return [n[1] + n[3] / 2, n[2] + n[4] / 2]; }
+
+(function layout() {
+  let x0 = Infinity, y0 = Infinity, x1 = -Infinity, y1 = -Infinity;
+  for (const n of N) { x0 = Math.min(x0, n[1]); y0 = Math.min(y0, n[2]); x1 = Math.max(x1, n[1] + n[3]); y1 = Math.max(y1, n[2] + n[4]); }
+  if (!N.length) { x0 = y0 = 0; x1 = y1 = 1; }
+  document.getElementById("view").setAttribute("viewBox", [x0 - 20, y0 - 40, x1 - x0 + 40, y1 - y0 + 80].join(" "));
+  const ge = document.getElementById("edges"), gn = document.getElementById("nodes");
+  for (const [s, t] of E) {
+    const [sx, sy] = center(s), [tx, ty] = center(t);
+    const a = [sx + N[s][3] / 2, sy], b = [tx - N[t][3] / 2, ty];
+    let d;
+    if (sx >= tx) {  // aresta de retorno: curva por baixo
+      const low = Math.max(sy, ty) + 50;
+      d = `M ${sx} ${sy + N[s][4] / 2} C ${sx} ${low}, ${tx} ${low}, ${tx} ${ty + N[t][4] / 2}`;
+    } else {
+      d = `M ${a[0]} ${a[1]} C ${(a[0] + b[0]) / 2} ${a[1]}, ${(a[0] + b[0]) / 2} ${b[1]}, ${b[0]} ${b[1]}`;
+    }
+    el("path", {d: d, fill: "none", stroke: "#9ca3af", "stroke-width": 1.5, "marker-end": "url(#arr)"}, ge);
+  }
+  N.forEach((n, i) => {
+    const [cx, cy] = center(i);
+    const shp = n[5] === "circle"
+      ? el("circle", {cx: cx, cy: cy, r: n[3] / 2}, gn)
+      : el("rect", {x: n[1], y: n[2], width: n[3], height: n[4], rx: 4}, gn);
+    const t = el("text", {x: cx, y: cy + 4, "text-anchor": "middle", class: n[5] === "circle" ? "tok" : "lbl"}, gn);
+    t.textContent = n[5] === "circle" ? "" : n[6];
+    shapes.push(shp); texts.push(t);
+  });
+})();
+
+function tokText(k) {
+  if (k <= 0) return "";
+  if (k <= 3) return Array(k).fill("\\u2022").join(" ");
+  return "\\u2022\\u00d7" + k;
+}
+function apply(k, sign) { for (const [i, d] of S[k][0]) tok[i] += sign * d; }
+function paint() {
+  const diff = new Map(cur > 0 ? S[cur][0] : []);
+  const fired = cur > 0 ? S[cur][1] : -1;
+  N.forEach((n, i) => {
+    let stroke = n[5] === "circle" ? "#6b7280" : "#111827", fill = "#ffffff";
+    const d = diff.get(i) || 0;
+    if (d < 0) { stroke = "#ef4444"; fill = "#fee2e2"; }
+    if (d > 0) { stroke = "#10b981"; fill = "#ecfdf5"; }
+    if (i === fired) { stroke = "#ef4444"; fill = "#fee2e2"; }
+    shapes[i].setAttribute("stroke", stroke); shapes[i].setAttribute("fill", fill);
+    shapes[i].setAttribute("stroke-width", 2);
+    if (n[5] === "circle") texts[i].textContent = tokText(tok[i]);
+  });
+  document.getElementById("slider").value = cur;
+  document.getElementById("info").textContent = `passo ${cur}/${MAX}`;
+}
+function seek(k) {
+  k = Math.max(0, Math.min(MAX, k));
+  while (cur < k) apply(++cur, 1);
+  while (cur > k) apply(cur--, -1);
+  paint();
+}
+function stop() { if (timer) { clearInterval(timer); timer = null; } document.getElementById("play").innerHTML = "&#9654; Play"; }
+function play() {
+  if (timer) { stop(); return; }
+  if (cur >= MAX) seek(0);
+  document.getElementById("play").innerHTML = "&#9208; Pause";
+  timer = setInterval(() => { if (cur >= MAX) stop(); else seek(cur + 1); }, Math.max(10, +document.getElementById("speed").value));
+}
+const slider = document.getElementById("slider");
+slider.max = MAX;
+document.getElementById("speed").value = __SPEED_MS__;
+document.getElementById("speed").onchange = () => { if (timer) { stop(); play(); } };
+slider.oninput = () => { stop(); seek(+slider.value); };
+document.getElementById("prev").onclick = () => { stop(); seek(cur - 1); };
+document.getElementById("next").onclick = () => { stop(); seek(cur + 1); };
+document.getElementById("reset").onclick = () => { stop(); seek(0); };
+document.getElementById("play").onclick = play;
+if (MAX >= 0) seek(0);
+</script></body></html>
+"""
+
+
+def playback_html(payload: Dict[str, Any], height: int = 360, speed_ms: int = 600) -> str:
+    """HTML autocontido (SVG + JS) que reproduz o payload de export_playback no navegador."""
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    return (
+        _PLAYER_TEMPLATE
+        .replace("__PAYLOAD__", data)
+        .replace("__SVG_HEIGHT__", str(max(120, int(height) - 50)))
+        .replace("__SPEED_MS__", str(int(speed_ms)))
+    )
@@ -1,4 +1,5 @@
 from typing import Dict, Tuple, Union, Optional, IO
+import hashlib
 from pm4py.objects.log.obj import EventLog, Trace, Event
 from pm4py.objects.petri_net.obj import PetriNet, Marking
 from pm4py.objects.petri_net.utils import petri_utils
@@ -85,3 +86,69 @@ def build_net_N3() -> Tuple[
     im = Marking({p_start: 1})
     fm = Marking({p_end: 1})
     return net, im, fm, places, trans
+
+def net_structure_hash(net: PetriNet) -> str:
+    """
+    Hash do conteúdo estrutural da rede (lugares, transições com rótulo, arcos com
+    peso), independente da identidade dos objetos e da ordem dos conjuntos.
+    """
+    parts = sorted(f"p|{p.name}" for p in net.places)
+    parts += sorted(f"t|{t.name}|{t.label if t.label is not None else ''}" for t in net.transitions)
+    parts += sorted(
+        f"a|{a.source.name}|{a.target.name}|{getattr(a, 'weight', 1)}" for a in net.arcs
+    )
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+def build_net_from_flow_json(data: Dict) -> Tuple[
+    PetriNet, Marking, Marking, Dict[str, PetriNet.Place], Dict[str, PetriNet.Transition]
+]:
+    """
+    Rede a partir do JSON exportado pelo Gerador de Modelo Normativo (página 0):
+    cada nó vira uma transição (rótulo = id), cada aresta src→dst um lugar
+    `p_{src}_{dst}`; nós sem entrada recebem `p_start` e nós sem saída levam a `p_end`.
+    """
+    raw_nodes = data.get("nodes") or []
+    raw_edges = data.get("edges") or []
+    if not raw_nodes:
+        raise ValueError("Modelo sem nós.")
+
+    net = PetriNet(str(data.get("name", "modelo_normativo")))
+    trans: Dict[str, PetriNet.Transition] = {}
+    for n in raw_nodes:
+        tid = str(n["id"])
+        if tid in trans:
+            raise ValueError(f"Nó duplicado: {tid!r}.")
+        trans[tid] = PetriNet.Transition(tid, tid)
+    net.transitions.update(trans.values())
+
+    places: Dict[str, PetriNet.Place] = {}
+
+    def _place(name: str) -> PetriNet.Place:
+        if name not in places:
+            places[name] = PetriNet.Place(name)
+            net.places.add(places[name])
+        return places[name]
+
+    has_in, has_out = set(), set()
+    for e in raw_edges:
+        src, dst = str(e.get("source")), str(e.get("target"))
+        if src not in trans or dst not in trans:
+            raise ValueError(f"Aresta {e.get('id')!r} referencia nó inexistente ({src} → {dst}).")
+        name = f"p_{src}_{dst}"
+        if name not in places:  # arestas repetidas entre o mesmo par viram um único lugar
+            p = _place(name)
+            petri_utils.add_arc_from_to(trans[src], p, net)
+            petri_utils.add_arc_from_to(p, trans[dst], net)
+        has_out.add(src)
+        has_in.add(dst)
+
+    p_start, p_end = _place("p_start"), _place("p_end")
+    for tid, t in trans.items():
+        if tid not in has_in:
+            petri_utils.add_arc_from_to(p_start, t, net)
+        if tid not in has_out:
+            petri_utils.add_arc_from_to(t, p_end, net)
+
+    im = Marking({p_start: 1})
+    fm = Marking({p_end: 1})
+    return net, im, fm, places, trans
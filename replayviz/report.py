@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas do relatório de conformidade (página 5), sem dependência do Streamlit.
+
+Usado pela página 5 e pelo processamento em lote (replayviz.batch): a mesma
+tabela por variante e os mesmos totais do log, calculados uma única vez.
+"""
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from pm4py.objects.log.obj import EventLog
+
+from .aggregation import (
+    LogCodes, VariantIndex, aggregate_variants, encode_log, missing_extra_metrics, variant_index,
+)
+
+
+def conformance_report(
+    log: EventLog,
+    replay_result: Sequence[Mapping[str, Any]],
+    model_activities: Iterable[str],
+    text_fields: Optional[Mapping[str, Tuple[str, Callable[[Any], str]]]] = None,
+    lc: Optional[LogCodes] = None,
+    vi: Optional[VariantIndex] = None,
+) -> pd.DataFrame:
+    """Tabela por variante: agregados do token replay + atividades ausentes/extras."""
+    lc = lc if lc is not None else encode_log(log)
+    vi = vi if vi is not None else variant_index(lc)
+    df = aggregate_variants(log, replay_result, text_fields=text_fields, lc=lc, vi=vi)
+    return df.join(missing_extra_metrics(lc, vi, sorted(set(model_activities))), on="variant_id")
+
+
+def report_totals(df_variants: pd.DataFrame, n_model_activities: int) -> Dict[str, float]:
+    """Totais do log inteiro, ponderados pela frequência de cada variante."""
+    freq = df_variants["frequency"]
+    total_traces = int(freq.sum())
+    total_missing = int((df_variants["missing_abs"] * freq).sum())
+    total_extra = int((df_variants["extra_abs"] * freq).sum())
+    total_events = int((df_variants["length"] * freq).sum())
+    return {
+        "total_traces": total_traces,
+        "total_variants": int(len(df_variants)),
+        "total_events": total_events,
+        "total_missing": total_missing,
+        "total_extra": total_extra,
+        "global_missing_percent": (
+            total_missing / (n_model_activities * total_traces)
+            if total_traces and n_model_activities else 0.0
+        ),
+        "global_extra_percent": total_extra / total_events if total_events else 0.0,
+        "global_trace_fitness": (
+            float((df_variants["trace_fitness_mean"] * freq).sum()) / total_traces
+            if total_traces else 0.0
+        ),
+        "fit_traces": int((df_variants["fit_rate"] * freq).round().sum()),
+    }
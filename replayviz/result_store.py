@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento persistente (SQLite) de resultados de conformidade por variante.
+
+Chave: (hash estrutural do modelo, hash da sequência de atividades da variante,
+algoritmo, parâmetros). Replay e alignments dependem só da sequência de
+atividades, então uma variante calculada uma vez — em qualquer log, sessão ou
+execução em lote — não é recalculada.
+
+- WAL: leitores simultâneos (threads e processos) não bloqueiam a escrita;
+- escritas em lote: `put` acumula em memória e `flush` grava tudo numa transação
+  (automático a cada `batch_size` resultados);
+- limite de tamanho: depois de cada `flush`, se a base passar de `max_bytes`, os
+  resultados menos usados recentemente são removidos até ~90% do limite.
+
+Os resultados são gravados com pickle; lugares e transições da rede viram
+referências por nome (persistent_id) e são religados aos objetos da rede atual
+na leitura — o mesmo hash estrutural garante os mesmos nomes.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import hashlib
+import io
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import PetriNet
+
+from .aggregation import LogCodes, VariantIndex, case_codes, encode_log, variant_index
+from .pm4py_model import net_structure_hash
+
+SCHEMA_VERSION = 1
+DEFAULT_PATH = os.environ.get(
+    "REPLAYVIZ_RESULTS_DB", os.path.join(os.path.expanduser("~"), ".cache", "replayviz", "results.sqlite")
+)
+DEFAULT_MAX_MB = int(os.environ.get("REPLAYVIZ_RESULTS_MB", "1024"))
+BATCH_SIZE = 500
+PRUNE_TARGET = 0.9
+_SEP = "\x1f"  # separador das atividades no hash (não aparece em nomes de atividade)
+
+TOKEN_REPLAY = "token_replay"
+ALIGNMENTS = "alignments"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    model   TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    algo    TEXT NOT NULL,
+    params  TEXT NOT NULL,
+    value   BLOB NOT NULL,
+    size    INTEGER NOT NULL,
+    used    REAL NOT NULL,
+    PRIMARY KEY (model, variant, algo, params)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+# ----------------------------------------------------------------------
+# Chaves
+# ----------------------------------------------------------------------
+
+def variant_hash(activities: Iterable[str]) -> str:
+    return hashlib.blake2b(_SEP.join(activities).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def variant_hashes(lc: LogCodes, vi: VariantIndex) -> List[str]:
+    """Hash de cada variante (na ordem de `vi.first_case`)."""
+    acts = lc.activities
+    return [variant_hash(acts[c] for c in case_codes(lc, int(i)).tolist()) for i in vi.first_case]
+
+
+def params_key(params: Optional[Mapping[str, Any]]) -> str:
+    return json.dumps(dict(params or {}), sort_keys=True, separators=(",", ":"), default=str)
+
+
+# ----------------------------------------------------------------------
+# Serialização (lugares/transições por nome)
+# ----------------------------------------------------------------------
+
+class _Pickler(pickle.Pickler):
+    def persistent_id(self, obj: Any) -> Optional[Tuple[str, str]]:
+        if isinstance(obj, PetriNet.Transition):
+            return ("t", obj.name)
+        if isinstance(obj, PetriNet.Place):
+            return ("p", obj.name)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, raw: bytes, net_index: Mapping[Tuple[str, str], Any]) -> None:
+        super().__init__(io.BytesIO(raw))
+        self._index = net_index
+
+    def persistent_load(self, pid: Tuple[str, str]) -> Any:
+        try:
+            return self._index[pid]
+        except KeyError:
+            raise pickle.UnpicklingError(f"elemento {pid!r} não existe na rede") from None
+
+
+def _dumps(value: Any) -> bytes:
+    buf = io.BytesIO()
+    _Pickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+    return buf.getvalue()
+
+
+def net_index(net: PetriNet) -> Dict[Tuple[str, str], Any]:
+    idx: Dict[Tuple[str, str], Any] = {("t", t.name): t for t in net.transitions}
+    idx.update({("p", p.name): p for p in net.places})
+    return idx
+
+
+# ----------------------------------------------------------------------
+# Store
+# ----------------------------------------------------------------------
+
+class ResultStore:
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_MB * 2**20,
+                 batch_size: int = BATCH_SIZE) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str, str, str], Tuple[bytes, float]] = {}
+        self._touched: Dict[Tuple[str, str, str, str], float] = {}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        con = self._con()
+        if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with con:
+                con.execute("DROP TABLE IF EXISTS results")
+                con.executescript(_SCHEMA)
+                con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _con(self) -> sqlite3.Connection:
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    # --- leitura ---
+    def get_many(
+        self, model: str, algo: str, params: Optional[Mapping[str, Any]], variants: Sequence[str],
+        net: Optional[PetriNet] = None,
+    ) -> Dict[str, Any]:
+        """variante -> resultado, para as variantes já guardadas (pendentes incluídas)."""
+        pk = params_key(params)
+        idx = net_index(net) if net is not None else {}
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for v in variants:
+                hit = self._pending.get((model, v, algo, pk))
+                if hit is not None:
+                    found[v] = hit[0]
+        missing = [v for v in dict.fromkeys(variants) if v not in found]
+        con = self._con()
+        for i in range(0, len(missing), 500):  # limite de parâmetros do SQLite
+            part = missing[i:i + 500]
+            rows = con.execute(
+                f"SELECT variant, value FROM results WHERE model=? AND algo=? AND params=? "
+                f"AND variant IN ({','.join('?' * len(part))})",
+                (model, algo, pk, *part),
+            ).fetchall()
+            found.update(rows)
+        out: Dict[str, Any] = {}
+        for v, raw in found.items():
+            try:
+                out[v] = _Unpickler(raw, idx).load()
+            except (pickle.UnpicklingError, AttributeError, EOFError):
+                continue  # gravado por outra versão da rede/biblioteca: recalcula
+        now = time.time()
+        with self._lock:
+            for v in out:
+                self._touched[(model, v, algo, pk)] = now
+            full = len(self._touched) >= self.batch_size
+        if full:
+            self.flush()
+        return out
+
+    # --- escrita em lote ---
+    def put(self, model: str, algo: str, params: Optional[Mapping[str, Any]], variant: str, value: Any) -> None:
+        self.put_many(model, algo, params, {variant: value})
+
+    def put_many(self, model: str, algo: str, params: Optional[Mapping[str, Any]], values: Mapping[str, Any]) -> None:
+        pk = params_key(params)
+        now = time.time()
+        blobs = {v: _dumps(val) for v, val in values.items()}
+        with self._lock:
+            for v, raw in blobs.items():
+                self._pending[(model, v, algo, pk)] = (raw, now)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Grava os pendentes (e os horários de uso) numa transação; poda se passar do limite."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        if not pending and not touched:
+            return
+        con = self._con()
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            con.executemany(
+                "INSERT OR REPLACE INTO results (model, variant, algo, params, value, size, used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*k, raw, len(raw), used) for k, (raw, used) in pending.items()],
+            )
+            con.executemany(
+                "UPDATE results SET used=? WHERE model=? AND variant=? AND algo=? AND params=?",
+                [(used, *k) for k, used in touched.items() if k not in pending],
+            )
+        if pending:
+            self.prune()
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """Remove os menos usados até ~90% de `max_bytes`; devolve quantos removeu."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        con = self._con()
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= limit:
+            return 0
+        target = total - int(limit * PRUNE_TARGET)
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            cut, cutoff = 0, None
+            for used, size in con.execute("SELECT used, size FROM results ORDER BY used"):
+                cut += size
+                cutoff = used
+                if cut >= target:
+                    break
+            removed = con.execute("DELETE FROM results WHERE used <= ?", (cutoff,)).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        con = self._con()
+        n, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        with self._lock:
+            pending = len(self._pending)
+        return {"results": n, "bytes": size, "max_bytes": self.max_bytes, "pending": pending, "path": self.path}
+
+    def close(self) -> None:
+        self.flush()
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# ----------------------------------------------------------------------
+# Replay/alignments por variante, lendo do store antes de calcular
+# ----------------------------------------------------------------------
+
+class VariantResults:
+    """
+    Resultados de um (modelo, algoritmo, parâmetros) para um log: busca no store
+    as variantes conhecidas e calcula só as que faltam, com um traço
+    representante por variante.
+    """
+
+    def __init__(self, store: Optional[ResultStore], net: PetriNet, algo: str,
+                 params: Optional[Mapping[str, Any]] = None, model_hash: Optional[str] = None) -> None:
+        self.store = store
+        self.net = net
+        self.algo = algo
+        self.params = dict(params or {})
+        self.model = model_hash or net_structure_hash(net)
+        self.known: Dict[str, Any] = {}
+        self.computed = 0
+
+    def prefetch(self, variants: Sequence[str]) -> int:
+        """Carrega do store as variantes ainda não conhecidas; devolve quantas vieram."""
+        if self.store is None:
+            return 0
+        want = [v for v in dict.fromkeys(variants) if v not in self.known]
+        got = self.store.get_many(self.model, self.algo, self.params, want, net=self.net)
+        self.known.update(got)
+        return len(got)
+
+    def resolve(self, log: EventLog, compute: Callable[[EventLog], List[Any]],
+                lc: Optional[LogCodes] = None, vi: Optional[VariantIndex] = None) -> List[Any]:
+        """Resultado por traço de `log`, calculando (em uma chamada) só as variantes que faltam."""
+        if lc is None:
+            lc = encode_log(log)
+        if vi is None:
+            vi = variant_index(lc)
+        hashes = variant_hashes(lc, vi)
+        self.prefetch(hashes)
+        missing = [i for i, h in enumerate(hashes) if h not in self.known]
+        if missing:
+            res = compute(EventLog([log[int(vi.first_case[i])] for i in missing]))
+            new = {hashes[i]: r for i, r in zip(missing, res)}
+            self.known.update(new)
+            self.computed += len(new)
+            if self.store is not None:
+                self.store.put_many(self.model, self.algo, self.params, new)
+        per_variant = [self.known[h] for h in hashes]
+        # cópia rasa por traço: quem alterar um resultado não afeta os demais da variante
+        return [
+            dict(per_variant[v]) if isinstance(per_variant[v], dict) else per_variant[v]
+            for v in vi.case_variant.tolist()
+        ]
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """Store compartilhado pelo processo; None se desativado (REPLAYVIZ_RESULTS_DB vazio) ou inacessível."""
+    global _store
+    with _store_lock:
+        if _store is None and DEFAULT_PATH:
+            try:
+                _store = ResultStore(DEFAULT_PATH)
+            except (OSError, sqlite3.Error):
+                return None
+        return _store
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Conformidade aproximada por amostragem estratificada, com intervalos de confiança.
+
+Os casos são divididos em estratos — por variante (as mais frequentes, uma por
+estrato, e as demais juntas em um estrato "raras") ou por tempo (faixas de
+início do caso com a mesma quantidade de casos). A amostra cresce em lotes com
+alocação de Neyman (mais casos onde a variância é maior) até o intervalo do
+fitness ficar abaixo do erro pedido. Só a amostra é reproduzida (e, se pedido,
+alinhada) — e cada sequência de atividades distinta, uma única vez.
+
+Estimativas: média estratificada Σ W_h·ȳ_h com variância
+Σ W_h²·(1 − n_h/N_h)·s_h²/n_h; a taxa de atividades extras (por evento, como a
+página 5) usa o estimador de razão com linearização.
+"""
+from statistics import NormalDist
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import time
+
+import numpy as np
+
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+from .aggregation import LogCodes, VariantIndex, case_codes, encode_log, variant_index
+
+BY_VARIANT = "variant"
+BY_TIME = "time"
+RARE_STRATUM_MIN = 2  # casos mínimos por estrato no primeiro lote
+
+
+class Estimate(NamedTuple):
+    value: float
+    half_width: float
+
+    @property
+    def low(self) -> float:
+        return self.value - self.half_width
+
+    @property
+    def high(self) -> float:
+        return self.value + self.half_width
+
+
+class SampleReport(NamedTuple):
+    n_sampled: int
+    n_total: int
+    n_replayed: int          # sequências distintas efetivamente reproduzidas
+    estimates: Dict[str, Estimate]
+    converged: bool
+    seconds: float
+
+
+def stratify(
+    log: EventLog,
+    lc: LogCodes,
+    vi: VariantIndex,
+    by: str = BY_VARIANT,
+    n_strata: int = 50,
+    timestamp_key: str = "time:timestamp",
+) -> np.ndarray:
+    """Estrato de cada caso (int64, 0..H-1)."""
+    n_cases = len(vi.case_variant)
+    if by == BY_VARIANT:
+        top = np.argsort(-vi.frequency, kind="stable")[: max(1, n_strata - 1)]
+        remap = np.full(len(vi.frequency), len(top), dtype=np.int64)  # demais -> estrato "raras"
+        remap[top] = np.arange(len(top), dtype=np.int64)
+        strata = remap[vi.case_variant]
+    elif by == BY_TIME:
+        start = np.full(n_cases, np.nan)
+        for i, trace in enumerate(log):
+            ts = trace[0].get(timestamp_key) if len(trace) else None
+            if ts is not None:
+                start[i] = ts.timestamp() if hasattr(ts, "timestamp") else float(ts)
+        if np.isnan(start).all():
+            raise ValueError(f"Log sem '{timestamp_key}': estratificação por tempo indisponível.")
+        order = np.argsort(np.nan_to_num(start, nan=np.nanmin(start)), kind="stable")
+        strata = np.empty(n_cases, dtype=np.int64)
+        strata[order] = (np.arange(n_cases) * max(1, n_strata) // max(1, n_cases)).astype(np.int64)
+    else:
+        raise ValueError(f"Estratificação desconhecida: {by!r}")
+    # compacta ids (estratos vazios somem)
+    _, compact = np.unique(strata, return_inverse=True)
+    return compact.astype(np.int64)
+
+
+class _Moments:
+    """Somas por estrato de uma métrica por caso (n, Σy, Σy²)."""
+
+    def __init__(self, n_strata: int) -> None:
+        self.n = np.zeros(n_strata)
+        self.s = np.zeros(n_strata)
+        self.ss = np.zeros(n_strata)
+
+    def add(self, strata: np.ndarray, y: np.ndarray) -> None:
+        np.add.at(self.n, strata, 1.0)
+        np.add.at(self.s, strata, y)
+        np.add.at(self.ss, strata, y * y)
+
+    def means(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 0, self.s / np.maximum(self.n, 1), 0.0)
+
+    def variances(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m = self.means()
+            v = (self.ss - self.n * m * m) / np.maximum(self.n - 1, 1)
+        return np.where(self.n > 1, np.maximum(v, 0.0), 0.0)
+
+
+class ConformanceSampler:
+    """
+    Amostrador incremental: `step(n)` acrescenta n casos e devolve as estimativas;
+    `run(erro)` repete até o meio-intervalo do fitness ficar ≤ erro.
+    """
+
+    def __init__(
+        self,
+        log: EventLog,
+        net: PetriNet,
+        im: Marking,
+        fm: Marking,
+        model_activities: Sequence[str],
+        by: str = BY_VARIANT,
+        n_strata: int = 50,
+        confidence: float = 0.95,
+        alignments: bool = False,
+        seed: int = 0,
+        lc: Optional[LogCodes] = None,
+        vi: Optional[VariantIndex] = None,
+    ) -> None:
+        self.log, self.net, self.im, self.fm = log, net, im, fm
+        self.lc = lc if lc is not None else encode_log(log)
+        self.vi = vi if vi is not None else variant_index(self.lc)
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+        self.alignments = alignments
+        model = set(model_activities)
+        self.n_model = len(model)
+        self._model_codes = np.array(
+            [c for c, a in enumerate(self.lc.activities) if a in model], dtype=np.int64
+        )
+
+        self.strata = stratify(log, self.lc, self.vi, by=by, n_strata=n_strata)
+        self.n_strata = int(self.strata.max()) + 1 if len(self.strata) else 0
+        self.N = np.bincount(self.strata, minlength=self.n_strata).astype(float)
+
+        # permutação aleatória dentro de cada estrato: amostrar = avançar o ponteiro
+        rng = np.random.default_rng(seed)
+        self._order = np.lexsort((rng.random(len(self.strata)), self.strata))
+        self._bounds = np.concatenate([[0], np.cumsum(self.N).astype(np.int64)])
+        self._taken = np.zeros(self.n_strata, dtype=np.int64)
+
+        metrics = ["fitness", "fit", "missing", "extra", "length"] + (["alignment_fitness"] if alignments else [])
+        self._m = {k: _Moments(self.n_strata) for k in metrics}
+        self._cross = np.zeros(self.n_strata)  # Σ extra·length (razão)
+        self._by_variant: Dict[int, Dict[str, float]] = {}  # variante -> métricas (uma replay por sequência)
+        self.error: Optional[float] = None
+        self._start = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    @property
+    def n_sampled(self) -> int:
+        return int(self._taken.sum())
+
+    def _allocate(self, n: int) -> np.ndarray:
+        room = (self.N - self._taken).astype(np.int64)
+        alloc = np.zeros(self.n_strata, dtype=np.int64)
+        # primeiro lote: cobre todos os estratos
+        need = np.minimum(np.maximum(RARE_STRATUM_MIN - self._taken, 0), room)
+        alloc += need
+        n -= int(need.sum())
+        room -= need
+        while n > 0 and room.sum() > 0:
+            sd = np.sqrt(self._m["fitness"].variances())
+            # estratos ainda com pouca informação recebem um desvio mínimo
+            sd = np.where(self._m["fitness"].n + alloc < 2, 0.5, sd) + 1e-9
+            w = np.where(room > 0, self.N * sd, 0.0)
+            if w.sum() <= 0:
+                break
+            share = np.minimum(np.floor(n * w / w.sum()).astype(np.int64), room)
+            if share.sum() == 0:
+                share[int(np.argmax(w))] = 1
+            alloc += share
+            room -= share
+            n -= int(share.sum())
+        return alloc
+
+    def _replay_variants(self, variants: List[int]) -> None:
+        from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
+
+        traces = EventLog([self.log[int(self.vi.first_case[v])] for v in variants])
+        replay = token_based_replay.apply(traces, self.net, self.im, self.fm)
+        align = None
+        if self.alignments:
+            from pm4py.algo.conformance.alignments.petri_net import algorithm as alignments
+            align = alignments.apply_log(traces, self.net, self.im, self.fm)
+        for k, v in enumerate(variants):
+            codes = case_codes(self.lc, int(self.vi.first_case[v]))
+            present = np.unique(codes)
+            n_extra = int(np.setdiff1d(present, self._model_codes, assume_unique=True).size)
+            n_missing = int(np.setdiff1d(self._model_codes, present, assume_unique=True).size)
+            r = replay[k]
+            vals = {
+                "fitness": float(r.get("trace_fitness") or 0.0),
+                "fit": float(bool(r.get("trace_is_fit"))),
+                "missing": n_missing / self.n_model if self.n_model else 0.0,
+                "extra": float(n_extra),
+                "length": float(len(codes)),
+            }
+            if align is not None:
+                a = align[k] or {}
+                vals["alignment_fitness"] = float(a.get("fitness", 0.0))
+            self._by_variant[v] = vals
+
+    def step(self, n: int) -> SampleReport:
+        """Acrescenta até n casos à amostra e devolve as estimativas atualizadas."""
+        alloc = self._allocate(n)
+        picked: List[np.ndarray] = []
+        for h in np.nonzero(alloc)[0]:
+            a = self._bounds[h] + self._taken[h]
+            picked.append(self._order[a: a + alloc[h]])
+            self._taken[h] += alloc[h]
+        if picked:
+            cases = np.concatenate(picked)
+            variants = self.vi.case_variant[cases]
+            new = [int(v) for v in np.unique(variants) if int(v) not in self._by_variant]
+            if new:
+                self._replay_variants(new)
+            strata = self.strata[cases]
+            for key, mom in self._m.items():
+                mom.add(strata, np.array([self._by_variant[int(v)][key] for v in variants]))
+            np.add.at(
+                self._cross, strata,
+                np.array([self._by_variant[int(v)]["extra"] * self._by_variant[int(v)]["length"] for v in variants]),
+            )
+        return self.report()
+
+    def run(
+        self,
+        error: float = 0.01,
+        batch: int = 500,
+        max_samples: Optional[int] = None,
+        time_budget: Optional[float] = None,
+    ) -> Iterator[SampleReport]:
+        """Lotes até meio-intervalo do fitness ≤ erro, log esgotado, limite de casos ou de tempo."""
+        t0 = time.perf_counter()
+        self.error = error
+        while True:
+            size = batch if max_samples is None else min(batch, max_samples - self.n_sampled)
+            rep = self.step(max(size, 0)) if size > 0 else self.report()
+            yield rep
+            if rep.converged or size <= 0:
+                return
+            if time_budget is not None and time.perf_counter() - t0 >= time_budget:
+                return
+
+    # ------------------------------------------------------------------
+    def _fpc_weights(self) -> Tuple[np.ndarray, np.ndarray]:
+        W = self.N / self.N.sum()
+        n = self._m["fitness"].n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fpc = np.where(n > 0, (1.0 - n / np.maximum(self.N, 1)) / np.maximum(n, 1), 0.0)
+        return W, fpc
+
+    def _mean(self, key: str) -> Estimate:
+        mom = self._m[key]
+        W, fpc = self._fpc_weights()
+        means, var = mom.means(), mom.variances()
+        sampled = mom.n > 0
+        if not sampled.any():
+            return Estimate(float("nan"), float("inf"))
+        # estratos ainda sem amostra: média geral da amostra e variância conservadora (0,25)
+        overall = mom.s.sum() / mom.n.sum()
+        est = float(np.sum(W * np.where(sampled, means, overall)))
+        v = float(np.sum(W * W * var * fpc)) + float(np.sum(W[~sampled] ** 2) * 0.25)
+        return Estimate(est, self.z * v ** 0.5)
+
+    def _ratio(self, num: str, den: str) -> Estimate:
+        a, b = self._m[num], self._m[den]
+        W, fpc = self._fpc_weights()
+        if not (a.n > 0).any():
+            return Estimate(float("nan"), float("inf"))
+        ya, yb = float(np.sum(W * a.means())), float(np.sum(W * b.means()))
+        if yb <= 0:
+            return Estimate(0.0, 0.0)
+        R = ya / yb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = a.n
+            cov = (self._cross - n * a.means() * b.means()) / np.maximum(n - 1, 1)
+        cov = np.where(n > 1, cov, 0.0)
+        var_z = np.maximum(a.variances() + R * R * b.variances() - 2.0 * R * cov, 0.0)
+        v = float(np.sum(W * W * var_z * fpc)) / (yb * yb)
+        return Estimate(R, self.z * v ** 0.5)
+
+    def report(self) -> SampleReport:
+        est = {
+            "fitness": self._mean("fitness"),
+            "fit_rate": self._mean("fit"),
+            "missing_rate": self._mean("missing"),
+            "extra_rate": self._ratio("extra", "length"),
+        }
+        if self.alignments:
+            est["alignment_fitness"] = self._mean("alignment_fitness")
+        n = self.n_sampled
+        return SampleReport(
+            n, int(self.N.sum()), len(self._by_variant), est,
+            n >= int(self.N.sum())
+            or (self.error is not None and est["fitness"].half_width <= self.error),
+            time.perf_counter() - self._start,
+        )
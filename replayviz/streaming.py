@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+Conformidade online: token replay evento a evento, sem esperar o log completo.
+
+A rede é compilada uma vez em índices inteiros (lugares 0..P-1; por rótulo, a
+lista de (lugar, peso) de entrada e de saída). Cada caso aberto guarda apenas a
+marcação (array de inteiros) e os contadores de fichas; cada evento custa uma
+consulta ao rótulo e a atualização dos lugares da transição — O(1) no tamanho do
+log e no número de casos.
+
+Semântica de `markings.is_enabled`/`markings.fire`, com a contabilidade do
+token replay do PM4Py: se a transição não está habilitada, as fichas que
+faltam são contadas como `missing` e a transição dispara mesmo assim (a
+deviação vira um alerta imediato). Transições invisíveis não são expandidas.
+
+Casos são fechados ao atingir a marcação final (opcional), explicitamente, ou
+despejados por inatividade (TTL, no relógio dos eventos) / capacidade (LRU).
+"""
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple,
+    Optional, Tuple,
+)
+import asyncio
+import json
+import os
+import time
+
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import PetriNet, Marking
+
+# tipos de alerta
+UNKNOWN_ACTIVITY = "unknown_activity"
+MISSING_TOKENS = "missing_tokens"
+REMAINING_TOKENS = "remaining_tokens"
+EVICTED = "evicted"
+
+
+class StreamEvent(NamedTuple):
+    case_id: Hashable
+    activity: str
+    timestamp: Optional[float] = None  # segundos (epoch); None = relógio local
+
+
+class Alert(NamedTuple):
+    case_id: Hashable
+    kind: str
+    activity: Optional[str]
+    timestamp: Optional[float]
+    detail: Dict[str, Any]
+
+
+class CaseResult(NamedTuple):
+    case_id: Hashable
+    status: str               # "completed" | "closed" | "evicted"
+    n_events: int
+    consumed: int
+    produced: int
+    missing: int
+    remaining: int
+    trace_is_fit: bool
+    trace_fitness: float
+
+
+class CompiledNet(NamedTuple):
+    places: List[str]
+    initial: array                                     # fichas por lugar (im)
+    final: array                                       # fichas por lugar (fm)
+    by_label: Dict[str, List[Tuple[Tuple[Tuple[int, int], ...], Tuple[Tuple[int, int], ...]]]]
+
+
+def compile_net(net: PetriNet, im: Marking, fm: Marking) -> CompiledNet:
+    """Rede -> índices inteiros: por rótulo, [(entradas, saídas)] com (lugar, peso)."""
+    places = sorted(p.name for p in net.places)
+    idx = {name: i for i, name in enumerate(places)}
+    initial = array("i", [0] * len(places))
+    final = array("i", [0] * len(places))
+    for p, k in im.items():
+        initial[idx[p.name]] = int(k)
+    for p, k in fm.items():
+        final[idx[p.name]] = int(k)
+
+    pre: Dict[str, List[Tuple[int, int]]] = {t.name: [] for t in net.transitions}
+    post: Dict[str, List[Tuple[int, int]]] = {t.name: [] for t in net.transitions}
+    for a in net.arcs:
+        w = int(getattr(a, "weight", 1))
+        if isinstance(a.target, PetriNet.Transition):
+            pre[a.target.name].append((idx[a.source.name], w))
+        else:
+            post[a.source.name].append((idx[a.target.name], w))
+
+    by_label: Dict[str, List[Tuple[Tuple[Tuple[int, int], ...], Tuple[Tuple[int, int], ...]]]] = {}
+    for t in sorted(net.transitions, key=lambda t: t.name):
+        if t.label is None:
+            continue
+        by_label.setdefault(t.label, []).append((tuple(sorted(pre[t.name])), tuple(sorted(post[t.name]))))
+    return CompiledNet(places, initial, final, by_label)
+
+
+class _Case:
+    __slots__ = ("marking", "consumed", "produced", "missing", "unknown", "n_events", "last_seen")
+
+    def __init__(self, initial: array, now: float) -> None:
+        self.marking = array("i", initial)
+        self.consumed = 0
+        self.produced = sum(initial)
+        self.missing = 0
+        self.unknown = 0
+        self.n_events = 0
+        self.last_seen = now
+
+
+def _fitness(missing: int, consumed: int, remaining: int, produced: int) -> float:
+    """Fitness do token replay (PM4Py): média de 1-m/c e 1-r/p."""
+    fm_ = 1.0 - missing / consumed if consumed > 0 else 1.0
+    fr_ = 1.0 - remaining / produced if produced > 0 else 1.0
+    return 0.5 * fm_ + 0.5 * fr_
+
+
+class StreamingChecker:
+    """
+    Verificador online. `process(evento)` devolve os alertas do evento (e os
+    repassa a `on_alert`); casos fechados/despejados vão para `on_close`.
+    """
+
+    def __init__(
+        self,
+        net: PetriNet,
+        im: Marking,
+        fm: Marking,
+        max_cases: int = 100_000,
+        ttl: Optional[float] = None,
+        close_on_final: bool = True,
+        on_alert: Optional[Callable[[Alert], None]] = None,
+        on_close: Optional[Callable[[CaseResult], None]] = None,
+    ) -> None:
+        self.net = compile_net(net, im, fm)
+        self.max_cases = max_cases
+        self.ttl = ttl
+        self.close_on_final = close_on_final
+        self.on_alert = on_alert
+        self.on_close = on_close
+        self._cases: "OrderedDict[Hashable, _Case]" = OrderedDict()
+        self.events = 0
+        self.alerts = 0
+        self.closed = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._cases)
+
+    # ------------------------------------------------------------------
+    def process(self, event: StreamEvent) -> List[Alert]:
+        case_id, activity, ts = event
+        now = ts if ts is not None else time.time()
+        self.events += 1
+        alerts: List[Alert] = []
+
+        case = self._cases.get(case_id)
+        if case is None:
+            case = _Case(self.net.initial, now)
+            self._cases[case_id] = case
+        else:
+            self._cases.move_to_end(case_id)
+        case.last_seen = now
+        case.n_events += 1
+
+        candidates = self.net.by_label.get(activity)
+        if not candidates:
+            case.unknown += 1
+            alerts.append(Alert(case_id, UNKNOWN_ACTIVITY, activity, ts, {}))
+        else:
+            m = case.marking
+            chosen = candidates[0]
+            if len(candidates) > 1:
+                # rótulo duplicado: prefere uma transição habilitada
+                for cand in candidates:
+                    if all(m[p] >= w for p, w in cand[0]):
+                        chosen = cand
+                        break
+            pre, post = chosen
+            missing = 0
+            for p, w in pre:
+                have = m[p]
+                if have < w:
+                    missing += w - have
+                    m[p] = 0
+                else:
+                    m[p] = have - w
+                case.consumed += w
+            for p, w in post:
+                m[p] += w
+                case.produced += w
+            if missing:
+                case.missing += missing
+                alerts.append(Alert(
+                    case_id, MISSING_TOKENS, activity, ts,
+                    {"missing": missing, "places": [self.net.places[p] for p, w in pre]},
+                ))
+            if self.close_on_final and m == self.net.final:
+                self._emit(alerts)
+                self.close_case(case_id, status="completed")
+                self._evict(now)
+                return alerts
+
+        self._emit(alerts)
+        self._evict(now)
+        return alerts
+
+    def run(self, events: Iterable[StreamEvent]) -> Iterator[Alert]:
+        """Processa uma fonte síncrona, produzindo os alertas à medida que surgem."""
+        for ev in events:
+            yield from self.process(ev)
+
+    async def run_async(self, events: AsyncIterator[StreamEvent]) -> int:
+        """Processa uma fonte assíncrona (ex.: queue_events); devolve o número de eventos lidos."""
+        n = 0
+        async for ev in events:
+            self.process(ev)
+            n += 1
+        return n
+
+    # ------------------------------------------------------------------
+    def close_case(self, case_id: Hashable, status: str = "closed") -> Optional[CaseResult]:
+        """Fecha o caso: consome a marcação final, conta fichas restantes e calcula o fitness."""
+        case = self._cases.pop(case_id, None)
+        if case is None:
+            return None
+        m, final = case.marking, self.net.final
+        missing, consumed = case.missing, case.consumed
+        remaining = 0
+        for p in range(len(m)):
+            need = final[p]
+            consumed += need
+            if m[p] < need:
+                missing += need - m[p]
+            else:
+                remaining += m[p] - need
+        result = CaseResult(
+            case_id, status, case.n_events, consumed, case.produced, missing, remaining,
+            missing == 0 and remaining == 0 and case.unknown == 0,
+            _fitness(missing, consumed, remaining, case.produced),
+        )
+        if status == "evicted":
+            self.evicted += 1
+        else:
+            self.closed += 1
+        if remaining and status != "evicted":
+            self._emit([Alert(case_id, REMAINING_TOKENS, None, None, {"remaining": remaining})])
+        if self.on_close is not None:
+            self.on_close(result)
+        return result
+
+    def close_all(self, status: str = "closed") -> List[CaseResult]:
+        return [r for r in (self.close_case(cid, status) for cid in list(self._cases)) if r is not None]
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Despeja casos inativos há mais de `ttl` (relógio dos eventos)."""
+        return self._evict(now if now is not None else time.time(), capacity=False)
+
+    def _evict(self, now: float, capacity: bool = True) -> int:
+        n = 0
+        if self.ttl is not None:
+            # OrderedDict em ordem de último acesso: os mais antigos estão no início
+            while self._cases:
+                cid, case = next(iter(self._cases.items()))
+                if now - case.last_seen <= self.ttl:
+                    break
+                self._evict_one(cid)
+                n += 1
+        if capacity:
+            while len(self._cases) > self.max_cases:
+                self._evict_one(next(iter(self._cases)))
+                n += 1
+        return n
+
+    def _evict_one(self, case_id: Hashable) -> None:
+        self._emit([Alert(case_id, EVICTED, None, None, {})])
+        self.close_case(case_id, status="evicted")
+
+    def _emit(self, alerts: List[Alert]) -> None:
+        self.alerts += len(alerts)
+        if self.on_alert is not None:
+            for a in alerts:
+                self.on_alert(a)
+
+
+# ----------------------------------------------------------------------
+# Fontes de eventos
+# ----------------------------------------------------------------------
+
+def _ts(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+def log_event_stream(
+    log: EventLog,
+    activity_key: str = "concept:name",
+    timestamp_key: str = "time:timestamp",
+) -> Iterator[StreamEvent]:
+    """Eventos de um EventLog intercalados em ordem de timestamp (empates: ordem do log); caso = índice do traço."""
+    events = [
+        (_ts(ev.get(timestamp_key)), i, j, ev[activity_key])
+        for i, trace in enumerate(log)
+        for j, ev in enumerate(trace)
+    ]
+    events.sort(key=lambda e: (e[0] if e[0] is not None else float("-inf"), e[1], e[2]))
+    for ts, i, _, act in events:
+        yield StreamEvent(i, act, ts)
+
+
+def _parse_line(line: str, case_key: str, activity_key: str, timestamp_key: str) -> StreamEvent:
+    d = json.loads(line)
+    return StreamEvent(d[case_key], d[activity_key], _ts(d.get(timestamp_key)))
+
+
+def tail_events(
+    path: str,
+    poll: float = 0.5,
+    from_start: bool = True,
+    follow: bool = True,
+    case_key: str = "case",
+    activity_key: str = "activity",
+    timestamp_key: str = "timestamp",
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Iterator[StreamEvent]:
+    """
+    Eventos de um arquivo JSON Lines ({"case": ..., "activity": ..., "timestamp": ...}),
+    acompanhando o que é acrescentado ao arquivo (como `tail -f`) enquanto `follow`.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        buf = ""
+        while True:
+            chunk = f.readline()
+            if chunk:
+                buf += chunk
+                if buf.endswith("\n"):
+                    if buf.strip():
+                        yield _parse_line(buf, case_key, activity_key, timestamp_key)
+                    buf = ""
+                continue
+            if not follow or (should_stop is not None and should_stop()):
+                if buf.strip():
+                    yield _parse_line(buf, case_key, activity_key, timestamp_key)
+                return
+            time.sleep(poll)
+
+
+async def queue_events(queue: "asyncio.Queue[Optional[StreamEvent]]") -> AsyncIterator[StreamEvent]:
+    """Eventos de uma asyncio.Queue até receber None."""
+    while True:
+        ev = await queue.get()
+        if ev is None:
+            return
+        yield ev
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Replay local de um XES em ordem de timestamp (ex.: Lfull.xes) contra N3."""
+    import argparse
+
+    from .pm4py_model import build_net_N3
+    from .utils_xes import read_xes_any
+
+    ap = argparse.ArgumentParser(prog="python -m replayviz.streaming")
+    ap.add_argument("log", help="XES reproduzido como fluxo de eventos")
+    ap.add_argument("--ttl", type=float, default=None, help="segundos de inatividade até despejar um caso")
+    ap.add_argument("--max-cases", type=int, default=100_000)
+    ap.add_argument("--quiet", "-q", action="store_true", help="não imprime cada alerta")
+    args = ap.parse_args(argv)
+
+    net, im, fm, _, _ = build_net_N3()
+    results: List[CaseResult] = []
+    checker = StreamingChecker(
+        net, im, fm, max_cases=args.max_cases, ttl=args.ttl,
+        on_alert=None if args.quiet else (lambda a: print(f"[{a.kind}] caso={a.case_id} atividade={a.activity} {a.detail}")),
+        on_close=results.append,
+    )
+    t0 = time.perf_counter()
+    for _ in checker.run(log_event_stream(read_xes_any(args.log))):
+        pass
+    checker.close_all()  # resultados chegam via on_close
+    dt = time.perf_counter() - t0
+    fit = sum(r.trace_is_fit for r in results)
+    mean = sum(r.trace_fitness for r in results) / len(results) if results else 0.0
+    print(
+        f"{checker.events} eventos em {dt:.3f}s — {len(results)} casos, {fit} aderentes, "
+        f"fitness médio {mean:.3f}, {checker.alerts} alertas, {checker.evicted} despejados"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
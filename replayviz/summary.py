@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+Resumo de conformidade mesclável (incrementos diários, shards).
+
+Um ConformanceSummary guarda, por variante, apenas somas: frequência, casos
+aderentes, fichas (missing/remaining/consumed/produced), soma do fitness e a
+contagem de cada texto dos campos de moda. Inteiros somam exatamente; a soma do
+fitness é uma fração exata (`Fraction` do float de cada caso), então
+`resumo(A) + resumo(B) == resumo(A ∪ B)` independentemente da ordem — um lote
+novo é reproduzido sozinho e mesclado ao resumo guardado.
+
+Serialização compacta: vocabulário de atividades + uma linha por variante
+(códigos das atividades e somas), em JSON, opcionalmente gzip.
+"""
+from collections import Counter
+from fractions import Fraction
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+from pm4py.objects.log.obj import EventLog
+
+from .aggregation import (
+    EMPTY, VARIANT_SEP, LogCodes, VariantIndex, _raw_key, case_codes, encode_log, variant_index,
+)
+
+FORMAT_VERSION = 1
+TOKEN_KEYS = ("missing_tokens", "remaining_tokens", "consumed_tokens", "produced_tokens")
+
+Variant = Tuple[str, ...]
+
+
+class VariantStats:
+    __slots__ = ("frequency", "fit", "n_fitness", "fitness_sum", "tokens", "texts")
+
+    def __init__(self) -> None:
+        self.frequency = 0
+        self.fit = 0
+        self.n_fitness = 0                  # casos com fitness definido
+        self.fitness_sum = Fraction(0)
+        self.tokens = [0] * len(TOKEN_KEYS)
+        self.texts: Dict[str, Counter] = {}
+
+    def merge(self, other: "VariantStats") -> None:
+        self.frequency += other.frequency
+        self.fit += other.fit
+        self.n_fitness += other.n_fitness
+        self.fitness_sum += other.fitness_sum
+        self.tokens = [a + b for a, b in zip(self.tokens, other.tokens)]
+        for col, cnt in other.texts.items():
+            self.texts.setdefault(col, Counter()).update(cnt)
+
+    def copy(self) -> "VariantStats":
+        out = VariantStats()
+        out.merge(self)
+        return out
+
+    def mode(self, col: str) -> str:
+        """Texto mais frequente (empate: menor texto), ignorando vazios — como _text_mode."""
+        cnt = self.texts.get(col)
+        best = None
+        for text, n in (cnt or {}).items():
+            if text == EMPTY or n <= 0:
+                continue
+            if best is None or n > best[0] or (n == best[0] and text < best[1]):
+                best = (n, text)
+        return best[1] if best else EMPTY
+
+    def _key(self) -> Tuple[Any, ...]:
+        return (
+            self.frequency, self.fit, self.n_fitness, self.fitness_sum, tuple(self.tokens),
+            {c: {t: n for t, n in cnt.items() if n} for c, cnt in self.texts.items()},
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, VariantStats) and self._key() == other._key()
+
+
+class ConformanceSummary:
+    def __init__(
+        self,
+        model_hash: str,
+        model_activities: Iterable[str],
+        text_fields: Sequence[str] = (),
+        variants: Optional[Dict[Variant, VariantStats]] = None,
+    ) -> None:
+        self.model_hash = model_hash
+        self.model_activities = tuple(sorted(set(model_activities)))
+        self.text_fields = tuple(text_fields)
+        self.variants: Dict[Variant, VariantStats] = variants if variants is not None else {}
+
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_replay(
+        cls,
+        log: EventLog,
+        replay_result: Sequence[Mapping[str, Any]],
+        model_hash: str,
+        model_activities: Iterable[str],
+        text_fields: Optional[Mapping[str, Tuple[str, Callable[[Any], str]]]] = None,
+        lc: Optional[LogCodes] = None,
+        vi: Optional[VariantIndex] = None,
+    ) -> "ConformanceSummary":
+        """Resumo de um log já reproduzido (agregação vetorizada sobre os ids de variante)."""
+        lc = lc if lc is not None else encode_log(log)
+        vi = vi if vi is not None else variant_index(lc)
+        text_fields = dict(text_fields or {})
+        out = cls(model_hash, model_activities, tuple(text_fields))
+        n_var = len(vi.first_case)
+        cv = vi.case_variant
+
+        def ints(key: str) -> np.ndarray:
+            vals = np.fromiter(
+                (int(r.get(key) or 0) for r in replay_result), dtype=np.int64, count=len(replay_result)
+            )
+            return np.bincount(cv, weights=vals, minlength=n_var).round().astype(np.int64)
+
+        fit = ints("trace_is_fit")
+        tokens = [ints(k) for k in TOKEN_KEYS]
+        stats: List[VariantStats] = []
+        for v in range(n_var):
+            s = VariantStats()
+            s.frequency = int(vi.frequency[v])
+            s.fit = int(fit[v])
+            s.tokens = [int(t[v]) for t in tokens]
+            stats.append(s)
+
+        # fitness: um par (variante, valor) por valor distinto -> soma exata em Fraction
+        fitness = np.fromiter(
+            (np.nan if (x := r.get("trace_fitness")) is None else float(x) for r in replay_result),
+            dtype=np.float64, count=len(replay_result),
+        )
+        ok = ~np.isnan(fitness)
+        if ok.any():
+            pairs = pd.DataFrame({"v": cv[ok], "f": fitness[ok]}).value_counts()
+            for (v, f), n in pairs.items():
+                s = stats[int(v)]
+                s.n_fitness += int(n)
+                s.fitness_sum += Fraction(float(f)) * int(n)
+
+        for col, (key, formatter) in text_fields.items():
+            cache: Dict[Any, str] = {}
+            texts = []
+            for r in replay_result:
+                val = r.get(key)
+                try:
+                    k = _raw_key(val)
+                    txt = cache.get(k)
+                    if txt is None:
+                        txt = cache[k] = formatter(val) if val is not None else EMPTY
+                except TypeError:
+                    txt = formatter(val)
+                texts.append(txt)
+            counts = pd.DataFrame({"v": cv, "t": texts}).value_counts()
+            for (v, t), n in counts.items():
+                stats[int(v)].texts.setdefault(col, Counter())[t] += int(n)
+
+        for v, s in enumerate(stats):
+            key = tuple(lc.activities[c] for c in case_codes(lc, int(vi.first_case[v])))
+            out.variants[key] = s
+        return out
+
+    # ------------------------------------------------------------------
+    def _check_compatible(self, other: "ConformanceSummary") -> None:
+        if self.model_hash != other.model_hash:
+            raise ValueError("Resumos de modelos diferentes não podem ser mesclados.")
+        if self.model_activities != other.model_activities or self.text_fields != other.text_fields:
+            raise ValueError("Resumos com atividades do modelo ou campos de texto diferentes.")
+
+    def merge(self, other: "ConformanceSummary") -> "ConformanceSummary":
+        """Novo resumo = self ∪ other (nenhum dos dois é alterado)."""
+        self._check_compatible(other)
+        out = ConformanceSummary(self.model_hash, self.model_activities, self.text_fields)
+        for src in (self, other):
+            for key, s in src.variants.items():
+                cur = out.variants.get(key)
+                if cur is None:
+                    out.variants[key] = s.copy()
+                else:
+                    cur.merge(s)
+        return out
+
+    __add__ = merge
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, ConformanceSummary)
+            and self.model_hash == other.model_hash
+            and self.model_activities == other.model_activities
+            and self.text_fields == other.text_fields
+            and self.variants == other.variants
+        )
+
+    @property
+    def total_traces(self) -> int:
+        return sum(s.frequency for s in self.variants.values())
+
+    # ------------------------------------------------------------------
+    def to_frame(self) -> pd.DataFrame:
+        """Tabela por variante nas colunas do relatório (conformance_report)."""
+        model = set(self.model_activities)
+        n_model = len(model)
+        rows: List[Dict[str, Any]] = []
+        for vid, (key, s) in enumerate(sorted(self.variants.items())):
+            acts = set(key)
+            missing = len(model - acts)
+            extra = len(acts - model)
+            row: Dict[str, Any] = {
+                "variant_id": vid,
+                "variant": VARIANT_SEP.join(key),
+                "frequency": s.frequency,
+                "fit_rate": s.fit / s.frequency if s.frequency else np.nan,
+                "trace_fitness_mean": float(s.fitness_sum / s.n_fitness) if s.n_fitness else np.nan,
+            }
+            for col in self.text_fields:
+                row[col] = s.mode(col)
+            for k, total in zip(TOKEN_KEYS, s.tokens):
+                row[f"{k}_mean"] = total / s.frequency if s.frequency else np.nan
+            row.update({
+                "missing_abs": missing,
+                "extra_abs": extra,
+                "missing_percent": missing / n_model if n_model else 0.0,
+                "extra_percent": extra / len(acts) if acts else 0.0,
+                "length": len(key),
+            })
+            rows.append(row)
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return df
+        return df.sort_values(
+            ["frequency", "trace_fitness_mean", "variant"], ascending=[False, False, True], kind="mergesort"
+        ).reset_index(drop=True)
+
+    def totals(self) -> Dict[str, Any]:
+        """Totais do log (como report_totals), calculados das somas exatas."""
+        model = set(self.model_activities)
+        traces = events = missing = extra = fit = n_fit = 0
+        fitness_sum = Fraction(0)
+        tokens = [0] * len(TOKEN_KEYS)
+        for key, s in self.variants.items():
+            acts = set(key)
+            traces += s.frequency
+            events += len(key) * s.frequency
+            missing += len(model - acts) * s.frequency
+            extra += len(acts - model) * s.frequency
+            fit += s.fit
+            n_fit += s.n_fitness
+            fitness_sum += s.fitness_sum
+            tokens = [a + b for a, b in zip(tokens, s.tokens)]
+        out: Dict[str, Any] = {
+            "total_traces": traces,
+            "total_variants": len(self.variants),
+            "total_events": events,
+            "total_missing": missing,
+            "total_extra": extra,
+            "global_missing_percent": missing / (len(model) * traces) if traces and model else 0.0,
+            "global_extra_percent": extra / events if events else 0.0,
+            "global_trace_fitness": float(fitness_sum / n_fit) if n_fit else 0.0,
+            "fit_traces": fit,
+        }
+        out.update({f"total_{k}": v for k, v in zip(TOKEN_KEYS, tokens)})
+        return out
+
+    # ------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        vocab = sorted({a for key in self.variants for a in key})
+        code = {a: i for i, a in enumerate(vocab)}
+        rows = []
+        for key, s in sorted(self.variants.items()):
+            rows.append([
+                [code[a] for a in key], s.frequency, s.fit, s.n_fitness,
+                f"{s.fitness_sum.numerator}/{s.fitness_sum.denominator}", s.tokens,
+                [dict(s.texts.get(col, {})) for col in self.text_fields],
+            ])
+        return {
+            "version": FORMAT_VERSION,
+            "model_hash": self.model_hash,
+            "model_activities": list(self.model_activities),
+            "text_fields": list(self.text_fields),
+            "activities": vocab,
+            "variants": rows,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "ConformanceSummary":
+        if d.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Versão de resumo não suportada: {d.get('version')!r}")
+        vocab = d["activities"]
+        text_fields = tuple(d.get("text_fields", ()))
+        out = cls(d["model_hash"], d["model_activities"], text_fields)
+        for codes, freq, fit, n_fit, fsum, tokens, texts in d["variants"]:
+            s = VariantStats()
+            s.frequency, s.fit, s.n_fitness = int(freq), int(fit), int(n_fit)
+            s.fitness_sum = Fraction(fsum)
+            s.tokens = [int(t) for t in tokens]
+            s.texts = {col: Counter(t) for col, t in zip(text_fields, texts) if t}
+            out.variants[tuple(vocab[c] for c in codes)] = s
+        return out
+
+    def dumps(self, compress: bool = True) -> bytes:
+        raw = json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return gzip.compress(raw, mtime=0) if compress else raw
+
+    @classmethod
+    def loads(cls, data: bytes) -> "ConformanceSummary":
+        """Bytes (JSON ou gzip) -> resumo; qualquer arquivo corrompido/incompleto vira ValueError."""
+        try:
+            if data[:2] == b"\x1f\x8b":
+                data = gzip.decompress(data)
+            d = json.loads(data.decode("utf-8"))
+        except (OSError, EOFError) as ex:  # BadGzipFile é OSError; truncado => EOFError
+            raise ValueError(f"Arquivo gzip inválido: {ex}") from None
+        if not isinstance(d, dict):
+            raise ValueError("O resumo deve ser um objeto JSON.")
+        try:
+            return cls.from_dict(d)
+        except (KeyError, TypeError, IndexError) as ex:
+            raise ValueError(f"Resumo incompleto ou malformado: {type(ex).__name__}: {ex}") from None
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.dumps(compress=str(path).endswith(".gz")))
+
+    @classmethod
+    def load(cls, path: str) -> "ConformanceSummary":
+        with open(path, "rb") as f:
+            return cls.loads(f.read())
+
+
+def merge_summaries(summaries: Iterable[ConformanceSummary]) -> ConformanceSummary:
+    """Mescla vários resumos (ex.: shards); exige ao menos um."""
+    it = iter(summaries)
+    try:
+        out = next(it)
+    except StopIteration:
+        raise ValueError("Nenhum resumo para mesclar.") from None
+    for s in it:
+        out = out.merge(s)
+    return out
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Mescla resumos guardados (ex.: acumulado + lote do dia) e imprime os totais."""
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(prog="python -m replayviz.summary")
+    ap.add_argument("inputs", nargs="+", help="resumos (.json ou .json.gz)")
+    ap.add_argument("--out", "-o", default=None, help="grava o resumo mesclado (.json.gz comprime)")
+    args = ap.parse_args(argv)
+    try:
+        merged = merge_summaries(ConformanceSummary.load(p) for p in args.inputs)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
+    if args.out:
+        merged.save(args.out)
+    print(json.dumps(merged.totals(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Tabelas de resultados paginadas no servidor.
+
+`ResultTable` guarda o resultado em forma colunar (DataFrame com os valores
+brutos: números, booleanos e os objetos do pm4py) e serve páginas ordenadas e
+filtradas: ordenação (argsort) e filtro rodam sobre as colunas inteiras, mas a
+formatação em texto e o envio ao navegador só acontecem para as linhas da página.
+Totais saem de agregados das colunas; a tabela inteira é exportada em blocos
+(CSV ou Parquet) para um arquivo temporário, sem montar a versão formatada toda
+em memória.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZE = 50
+EXPORT_CHUNK = 50_000       # linhas formatadas por bloco na exportação
+ORDER_CACHE = 8             # índices (filtro, ordenação) guardados por tabela
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "replayviz-exports")
+EXPORT_MAX_AGE = 24 * 3600.0  # segundos; arquivos exportados mais antigos são apagados
+
+AGGREGATES: Dict[str, Callable[[np.ndarray], float]] = {
+    "sum": np.nansum, "mean": np.nanmean, "min": np.nanmin, "max": np.nanmax,
+}
+_AGG_LABELS = {"sum": "total", "mean": "média", "min": "mín.", "max": "máx."}
+
+
+def _default_format(value: Any) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "—"
+    return str(value)
+
+
+class ResultTable:
+    """
+    Resultado colunar; `formatters` (coluna -> função) só rodam nas linhas
+    exibidas/exportadas. `key` identifica o conteúdo (ex.: chave do log e do
+    modelo) e nomeia os arquivos exportados; sem ela, o conteúdo é hasheado.
+    """
+
+    def __init__(
+        self, frame: pd.DataFrame, formatters: Optional[Mapping[str, Callable[[Any], str]]] = None,
+        key: Optional[Hashable] = None,
+    ) -> None:
+        self.frame = frame.reset_index(drop=True)
+        self.key = key
+        fmt = dict(formatters or {})
+        # colunas de objetos que não são texto (transições, marcações, alignments): str() por linha exibida
+        for c in self.frame.columns:
+            col = self.frame[c]
+            if c not in fmt and col.dtype == object:
+                first = col.dropna().head(1).tolist()
+                if first and not isinstance(first[0], str):
+                    fmt[c] = _default_format
+        self.formatters = fmt
+        self._digest: Optional[str] = None
+        self._orders: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._sorted: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.frame.columns)
+
+    @property
+    def digest(self) -> str:
+        """Identidade do conteúdo (nome dos arquivos exportados); calculada uma vez."""
+        if self._digest is None:
+            h = hashlib.blake2b(repr((len(self.frame), self.columns)).encode(), digest_size=16)
+            if self.key is not None:
+                h.update(repr(self.key).encode())
+            elif len(self.frame):
+                # sem chave: todas as colunas, as de objetos pelo texto formatado
+                h.update(pd.util.hash_pandas_object(self.formatted(np.arange(len(self.frame))), index=False)
+                         .to_numpy().tobytes())
+            self._digest = h.hexdigest()
+        return self._digest
+
+    # --- colunas -----------------------------------------------------------
+    def is_numeric(self, column: str) -> bool:
+        return pd.api.types.is_numeric_dtype(self.frame[column]) and not pd.api.types.is_bool_dtype(self.frame[column])
+
+    def sortable(self) -> List[str]:
+        """Colunas com valores comparáveis (as formatadas por linha ficam de fora)."""
+        return [c for c in self.columns if c not in self.formatters]
+
+    # --- filtro/ordenação ------------------------------------------------------
+    def _ascending(self, column: str) -> np.ndarray:
+        with self._lock:
+            order = self._sorted.get(column)
+        if order is None:
+            col = self.frame[column]
+            values = col.astype(str).to_numpy() if col.dtype == object else col.to_numpy()
+            order = np.argsort(values, kind="stable").astype(np.int64)
+            with self._lock:
+                self._sorted[column] = order
+        return order
+
+    def mask(self, column: Optional[str] = None, contains: str = "", lo: Optional[float] = None,
+             hi: Optional[float] = None) -> Optional[np.ndarray]:
+        """Máscara do filtro (None = sem filtro): texto contido ou faixa [lo, hi] numérica."""
+        if not column:
+            return None
+        col = self.frame[column]
+        if self.is_numeric(column):
+            if lo is None and hi is None:
+                return None
+            values = col.to_numpy(dtype=float)
+            m = np.ones(len(values), dtype=bool)
+            if lo is not None:
+                m &= values >= lo
+            if hi is not None:
+                m &= values <= hi
+            return m
+        if pd.api.types.is_bool_dtype(col):
+            return None if contains == "" else col.to_numpy() == (contains == "True")
+        if not contains:
+            return None
+        return col.astype(str).str.contains(contains, case=False, regex=False).to_numpy()
+
+    def rows(self, sort_by: Optional[str] = None, descending: bool = False, filter_key: Tuple = ()) -> np.ndarray:
+        """Índices das linhas (filtradas e ordenadas); memoizado por (ordenação, filtro)."""
+        key = (sort_by, descending, filter_key)
+        with self._lock:
+            hit = self._orders.get(key)
+            if hit is not None:
+                self._orders.move_to_end(key)
+                return hit
+        if sort_by:
+            order = self._ascending(sort_by)
+            if descending:
+                col = self.frame[sort_by]
+                if self.is_numeric(sort_by):
+                    # NaN continua no fim
+                    n_nan = int(col.isna().sum())
+                    order = np.concatenate([order[: len(order) - n_nan][::-1], order[len(order) - n_nan:]])
+                else:
+                    order = order[::-1]
+        else:
+            order = np.arange(len(self.frame), dtype=np.int64)
+        m = self.mask(*filter_key) if filter_key else None
+        if m is not None:
+            order = order[m[order]]
+        with self._lock:
+            self._orders[key] = order
+            while len(self._orders) > ORDER_CACHE:
+                self._orders.popitem(last=False)
+        return order
+
+    # --- saída --------------------------------------------------------------
+    def formatted(self, rows: np.ndarray, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Linhas `rows` (só `columns`, se dado) com as colunas de objetos já formatadas."""
+        part = self.frame.iloc[rows]
+        part = part[list(columns)] if columns is not None else part.copy()
+        for c, f in self.formatters.items():
+            if c in part.columns:
+                part[c] = [f(v) for v in part[c].tolist()]
+        return part
+
+    def page(self, rows: np.ndarray, page: int, size: int = PAGE_SIZE,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.formatted(rows[(page - 1) * size:page * size], columns)
+
+    def aggregate(self, rows: np.ndarray, aggregates: Mapping[str, str]) -> Dict[str, float]:
+        """Agregados (sum/mean/min/max) das colunas sobre as linhas selecionadas."""
+        out: Dict[str, float] = {}
+        for col, how in aggregates.items():
+            values = self.frame[col].to_numpy(dtype=float)[rows]
+            out[col] = float(AGGREGATES[how](values)) if len(values) else float("nan")
+        return out
+
+    def export(
+        self, path: str, fmt: str = "csv", rows: Optional[np.ndarray] = None,
+        columns: Optional[Sequence[str]] = None, chunk: int = EXPORT_CHUNK,
+    ) -> str:
+        """Grava a tabela (ou `rows`/`columns`) em `path`, bloco a bloco; Parquet usa pyarrow (row groups)."""
+        rows = np.arange(len(self.frame), dtype=np.int64) if rows is None else rows
+        tmp = f"{path}.tmp{os.getpid()}"
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            writer = None
+            try:
+                for i in range(0, max(1, len(rows)), chunk):
+                    tbl = pa.Table.from_pandas(self.formatted(rows[i:i + chunk], columns), preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, tbl.schema)
+                    writer.write_table(tbl)
+            finally:
+                if writer is not None:
+                    writer.close()
+        elif fmt == "csv":
+            with open(tmp, "w", encoding="utf-8", newline="") as fh:
+                for i in range(0, max(1, len(rows)), chunk):
+                    self.formatted(rows[i:i + chunk], columns).to_csv(fh, index=False, header=i == 0)
+        else:
+            raise ValueError(f"Formato de exportação desconhecido: {fmt!r}")
+        os.replace(tmp, path)
+        return path
+
+
+def _prune_exports(max_age: float = EXPORT_MAX_AGE) -> None:
+    """Cria a pasta de exportações e apaga arquivos antigos."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    now = time.time()
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _has_parquet() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# Widget
+# ----------------------------------------------------------------------
+
+def result_table(
+    table: ResultTable,
+    key: str,
+    file_name: str = "resultados",
+    aggregates: Optional[Mapping[str, str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> None:
+    """
+    Tabela paginada: ordenação, filtro por coluna, página atual, agregados das
+    linhas filtradas e exportação da tabela filtrada. `columns` restringe as
+    colunas exibidas e exportadas.
+    """
+    cols = list(columns) if columns is not None else table.columns
+    sortable = [c for c in table.sortable() if c in cols]
+    c1, c2, c3, c4 = st.columns([2, 1, 2, 2])
+    sort_by = c1.selectbox("Ordenar por", ["—"] + sortable, key=f"{key}_sort")
+    descending = c2.toggle("Decrescente", value=False, key=f"{key}_desc", disabled=sort_by == "—")
+    filter_col = c3.selectbox("Filtrar coluna", ["—"] + sortable, key=f"{key}_fcol")
+    filter_key: Tuple = ()
+    if filter_col != "—":
+        if table.is_numeric(filter_col):
+            lo_col, hi_col = c4.columns(2)
+            lo = lo_col.number_input("mín.", value=None, key=f"{key}_lo")
+            hi = hi_col.number_input("máx.", value=None, key=f"{key}_hi")
+            filter_key = (filter_col, "", lo, hi)
+        elif pd.api.types.is_bool_dtype(table.frame[filter_col]):
+            choice = c4.selectbox("valor", ["", "True", "False"], key=f"{key}_bool")
+            filter_key = (filter_col, choice)
+        else:
+            filter_key = (filter_col, c4.text_input("contém", "", key=f"{key}_text"))
+    rows = table.rows(None if sort_by == "—" else sort_by, descending, filter_key)
+
+    n_pages = max(1, -(-len(rows) // PAGE_SIZE))
+    p1, p2 = st.columns([1, 3])
+    page = int(p1.number_input(f"Página (de {n_pages})", 1, n_pages, 1, key=f"{key}_page")) if n_pages > 1 else 1
+    shown = f"{len(rows)} de {len(table)} linhas" if len(rows) != len(table) else f"{len(table)} linhas"
+    if aggregates:
+        agg = table.aggregate(rows, aggregates)
+        shown += " · " + " · ".join(
+            f"{_AGG_LABELS[how]} {col}: {agg[col]:.4g}" for col, how in aggregates.items()
+        )
+    p2.caption(shown)
+    st.dataframe(table.page(rows, page, columns=cols), use_container_width=True, hide_index=True)
+
+    # exportação: arquivo gerado sob demanda, em blocos; o botão de download serve o arquivo pronto
+    formats = ["csv", "parquet"] if _has_parquet() else ["csv"]
+    e1, e2 = st.columns([1, 3])
+    fmt = e1.selectbox("Formato", formats, key=f"{key}_fmt", label_visibility="collapsed")
+    request = repr((table.digest, cols, filter_key, sort_by, descending)).encode()
+    path = os.path.join(EXPORT_DIR, f"{file_name}-{hashlib.blake2b(request, digest_size=8).hexdigest()}.{fmt}")
+    if not os.path.exists(path):
+        if not e2.button(f"Preparar {fmt.upper()} ({len(rows)} linhas)", key=f"{key}_export"):
+            return
+        _prune_exports()
+        with st.spinner("Gerando arquivo…"):
+            table.export(path, fmt, rows, cols)
+    with open(path, "rb") as fh:
+        e2.download_button(
+            f"Baixar {fmt.upper()}", data=fh, file_name=f"{file_name}.{fmt}",
+            mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet", key=f"{key}_download",
+        )
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Seletor de traço para logs grandes (página 2).
+
+Nada proporcional ao número de casos vai para o navegador: busca por case id,
+filtros (variante, faixa de fitness, só não aderentes) e ordenação rodam no
+servidor sobre arrays NumPy — fitness por caso sai do resultado por variante via
+`trie.case_variant` —, e só a página atual (PAGE_SIZE linhas) é materializada.
+"""
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from pm4py.objects.log.obj import EventLog
+
+from .compute_cache import compute_cached
+from .variants import VariantTrie
+
+PAGE_SIZE = 50
+MAX_VARIANT_OPTIONS = 200
+
+LOG_ORDER, WORST_FIRST, BEST_FIRST = "ordem do log", "pior fitness primeiro", "melhor fitness primeiro"
+
+
+class TraceTable(NamedTuple):
+    case_ids: np.ndarray        # str, concept:name do traço (ou o nº do caso)
+    id_pos: Dict[str, int]      # case id -> índice no log
+    fitness: np.ndarray         # float64 por caso (NaN sem resultado)
+    is_fit: np.ndarray          # bool por caso
+    length: np.ndarray          # eventos por caso
+    trie: VariantTrie
+
+
+@compute_cached("index")
+def case_ids(log_key: Hashable, _log: EventLog) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Case id de cada traço (atributo concept:name; uma consulta por caso, não por evento)."""
+    ids = [
+        str(getattr(tr, "attributes", {}).get("concept:name", i + 1)) for i, tr in enumerate(_log)
+    ]
+    pos: Dict[str, int] = {}
+    for i, cid in enumerate(ids):
+        pos.setdefault(cid, i)
+    return np.asarray(ids, dtype=str), pos
+
+
+def variant_fitness(trie: VariantTrie, replay_result: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(fitness, aderente) por variante, lidos do caso representante de cada uma."""
+    n_var = len(trie)
+    fit = np.full(n_var, np.nan)
+    ok = np.zeros(n_var, dtype=bool)
+    for v, case in enumerate(trie.first_case.tolist()):
+        if case < len(replay_result):
+            r = replay_result[case]
+            fit[v] = float(r.get("trace_fitness", np.nan))
+            ok[v] = bool(r.get("trace_is_fit", False))
+    return fit, ok
+
+
+@compute_cached("replay")
+def trace_table(
+    run_key: Hashable, log_key: Hashable, _log: EventLog, _trie: VariantTrie, _replay_result: Sequence[Dict[str, Any]]
+) -> TraceTable:
+    ids, pos = case_ids(log_key, _log)
+    fit, ok = variant_fitness(_trie, _replay_result)
+    cv = _trie.case_variant
+    return TraceTable(ids, pos, fit[cv], ok[cv], np.diff(_trie.lc.offsets), _trie)
+
+
+def select_traces(
+    table: TraceTable,
+    query: str = "",
+    variants: Sequence[int] = (),
+    only_unfit: bool = False,
+    fit_range: Tuple[float, float] = (0.0, 1.0),
+    order: str = LOG_ORDER,
+) -> np.ndarray:
+    """Índices dos casos que passam nos filtros, na ordem pedida."""
+    n = len(table.case_ids)
+    q = query.strip()
+    if q:
+        exact = table.id_pos.get(q)
+        if exact is not None:
+            cases = np.asarray([exact], dtype=np.int64)
+        else:
+            cases = np.flatnonzero(np.char.find(table.case_ids, q) >= 0).astype(np.int64)
+    else:
+        cases = np.arange(n, dtype=np.int64)
+    if variants:
+        cases = cases[np.isin(table.trie.case_variant[cases], np.asarray(list(variants), dtype=np.int64))]
+    if only_unfit:
+        cases = cases[~table.is_fit[cases]]
+    lo, hi = fit_range
+    if lo > 0.0 or hi < 1.0:
+        f = table.fitness[cases]
+        cases = cases[(f >= lo) & (f <= hi)]
+    if order != LOG_ORDER and len(cases):
+        f = np.nan_to_num(table.fitness[cases], nan=np.inf if order == WORST_FIRST else -np.inf)
+        cases = cases[np.argsort(f if order == WORST_FIRST else -f, kind="stable")]
+    return cases
+
+
+def worst_trace(table: TraceTable) -> Optional[int]:
+    """Primeiro caso com a menor fitness (None se não há resultado de replay)."""
+    f = table.fitness
+    if not len(f) or np.isnan(f).all():
+        return None
+    return int(np.nanargmin(f))
+
+
+def page_frame(table: TraceTable, cases: np.ndarray, page: int, size: int = PAGE_SIZE) -> pd.DataFrame:
+    """Só as linhas da página `page` (1-based)."""
+    part = cases[(page - 1) * size:page * size]
+    cv = table.trie.case_variant[part]
+    return pd.DataFrame(
+        {
+            "nº": part + 1,
+            "case id": table.case_ids[part],
+            "variante": cv,
+            "eventos": table.length[part],
+            "fitness": np.round(table.fitness[part], 3),
+            "aderente": table.is_fit[part],
+        }
+    )
+
+
+# ----------------------------------------------------------------------
+# Widget
+# ----------------------------------------------------------------------
+
+def trace_picker(
+    log: EventLog, log_key: Hashable, run_key: Hashable, trie: VariantTrie,
+    replay_result: Sequence[Dict[str, Any]], key: str = "trace_pick",
+) -> int:
+    """Controles de busca/filtro/paginação; devolve o índice (0-based) do traço escolhido."""
+    table = trace_table(run_key, log_key, log, trie, replay_result)
+    n = len(table.case_ids)
+    sel_key = f"{key}_idx"
+    if st.session_state.get(f"{key}_log") != log_key or not 0 <= st.session_state.get(sel_key, 0) < n:
+        st.session_state[sel_key] = 0
+        st.session_state[f"{key}_log"] = log_key
+
+    def _choose(i: int) -> None:
+        st.session_state[sel_key] = int(i)
+
+    def _choose_row() -> None:
+        row = st.session_state.get(f"{key}_row")
+        if row is not None:
+            _choose(row)
+
+    with st.expander(f"Escolher traço ({n} no log)", expanded=False):
+        c1, c2, c3 = st.columns([2, 2, 1])
+        query = c1.text_input("Buscar case id", "", key=f"{key}_q", help="Igual ao id ou trecho dele.")
+        options = {
+            int(v): f"#{int(v)} ({int(trie.frequency[v])}) {trie.label(int(v))}" for v in trie.top_k(MAX_VARIANT_OPTIONS)
+        }
+        variants = c2.multiselect("Variantes", list(options), format_func=options.get, key=f"{key}_var")
+        only_unfit = c3.toggle("Só não aderentes", value=False, key=f"{key}_unfit")
+        c4, c5 = st.columns([3, 2])
+        fit_range = c4.slider("Fitness", 0.0, 1.0, (0.0, 1.0), 0.01, key=f"{key}_fit")
+        order = c5.selectbox("Ordenar", [LOG_ORDER, WORST_FIRST, BEST_FIRST], key=f"{key}_order")
+
+        cases = select_traces(table, query, variants, only_unfit, fit_range, order)
+        n_pages = max(1, -(-len(cases) // PAGE_SIZE))
+        p1, p2 = st.columns([1, 3])
+        page = int(p1.number_input(f"Página (de {n_pages})", 1, n_pages, 1, key=f"{key}_page")) if n_pages > 1 else 1
+        p2.caption(f"{len(cases)} traços atendem aos filtros.")
+        df = page_frame(table, cases, page)
+        if not df.empty:
+            st.dataframe(df, hide_index=True, use_container_width=True)
+            rows: List[int] = (df["nº"] - 1).tolist()
+            b1, b2 = st.columns([3, 1])
+            b1.selectbox(
+                "Abrir traço desta página", rows, index=None, placeholder="escolha uma linha…",
+                format_func=lambda i: f"nº {i + 1} — {table.case_ids[i]}", key=f"{key}_row",
+                on_change=_choose_row,
+            )
+            worst = worst_trace(table)
+            b2.button(
+                "Pior traço", key=f"{key}_worst", disabled=worst is None,
+                on_click=_choose, args=(worst or 0,), help="Menor fitness do log inteiro.",
+            )
+        else:
+            st.info("Nenhum traço atende aos filtros.")
+
+    idx = int(st.session_state[sel_key])
+    st.caption(
+        f"Traço nº {idx + 1} de {n} — case id `{table.case_ids[idx]}`, variante #{trie.variant_of(idx)}"
+        + ("" if np.isnan(table.fitness[idx]) else f", fitness {table.fitness[idx]:.3f}")
+    )
+    return idx
@@ -3,10 +3,13 @@ from __future__ import annotations
 import io
 import os
 import gzip
+import hashlib
 import tempfile
-from typing import Union, Optional
+from typing import Dict, Hashable, Union, Optional
 from pm4py.objects.log.importer.xes import importer as xes_importer
 
+from .compute_cache import compute_cached
+
 def _looks_gzip(data: bytes, name: Optional[str]) -> bool:
     # sinaliza .gz por nome OU pelo cabeçalho (1f 8b)
     if name and name.lower().endswith(".gz"):
@@ -58,4 +61,48 @@ def read_xes_any(src: Union[str, bytes, bytearray, io.BytesIO, "UploadedFile"]):
             os.unlink(tmp.name)
         except Exception:
             pass
-    return log
\ No newline at end of file
+    return log
+
+# file_id do upload -> hash do conteúdo (o mesmo upload não é re-hasheado a cada rerun)
+_UPLOAD_DIGESTS: Dict[Hashable, str] = {}
+_UPLOAD_DIGESTS_MAX = 64
+
+
+def _upload_digest(uploaded) -> str:
+    fid = (getattr(uploaded, "file_id", uploaded.name), uploaded.size)
+    digest = _UPLOAD_DIGESTS.get(fid)
+    if digest is None:
+        digest = hashlib.blake2b(uploaded.getvalue(), digest_size=16).hexdigest()
+        if len(_UPLOAD_DIGESTS) >= _UPLOAD_DIGESTS_MAX:
+            _UPLOAD_DIGESTS.pop(next(iter(_UPLOAD_DIGESTS)))
+        _UPLOAD_DIGESTS[fid] = digest
+    return digest
+
+
+def log_source_key(uploaded, path: str) -> Hashable:
+    """
+    Identificador leve da fonte do log: upload (hash do conteúdo), caminho (+mtime)
+    ou ("demo",) sem fonte. O hash faz o mesmo arquivo enviado por sessões
+    diferentes cair na mesma entrada do cache de cálculos.
+    """
+    if uploaded is not None:
+        return ("upload", _upload_digest(uploaded), uploaded.size)
+    if path:
+        try:
+            return ("path", path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return ("path", path, None)
+    return ("demo",)
+
+
+@compute_cached("log")
+def load_event_log(log_key: Hashable, _src: Optional[Union[str, bytes]]):
+    """
+    Log da fonte `_src` (None = log de demonstração), no cache de cálculos do
+    processo pela chave `log_key`: sessões que abrem o mesmo arquivo ao mesmo
+    tempo esperam um único parse e compartilham o objeto.
+    """
+    if _src is None:
+        from .pm4py_model import build_tiny_log
+        return build_tiny_log()
+    return read_xes_any(_src)
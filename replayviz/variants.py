@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Trie de variantes sobre os códigos internados de `encode_log`.
+
+Cada variante é um caminho da raiz (sequência de códigos de atividade); o nó
+final guarda o id da variante. Por variante: frequência e a lista de casos
+(CSR); por caso: o id da variante (consulta O(1)). Cada nó guarda ainda quantos
+casos passam por ele, o que responde consultas por prefixo sem percorrer a
+subárvore.
+
+Os ids de variante são os de `variant_index` (ordem da primeira ocorrência), e
+`trie.index` devolve o próprio VariantIndex: agregação, relatório e store de
+resultados usam a mesma estrutura, sem montar as strings das variantes — elas só
+são formatadas (`label`) para exibição.
+"""
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from pm4py.objects.log.obj import EventLog
+
+from .aggregation import VARIANT_SEP, LogCodes, VariantIndex, case_codes, encode_log, variant_index
+from .compute_cache import compute_cached
+
+
+class VariantTrie:
+    def __init__(self, lc: LogCodes, vi: Optional[VariantIndex] = None) -> None:
+        vi = vi if vi is not None else variant_index(lc)
+        self.lc = lc
+        self.activities = lc.activities
+        self._codes = {a: c for c, a in enumerate(lc.activities)}
+        n_codes = max(1, len(lc.activities))
+        self._stride = n_codes
+
+        # nós: 0 = raiz; aresta (pai, código) -> filho num único dict de inteiros
+        parent: List[int] = [-1]
+        code: List[int] = [-1]
+        children: Dict[int, int] = {}
+        variant_node = np.empty(len(vi.first_case), dtype=np.int64)
+        for v, case in enumerate(vi.first_case.tolist()):
+            node = 0
+            for c in case_codes(lc, case).tolist():
+                k = node * n_codes + c
+                child = children.get(k)
+                if child is None:
+                    child = children[k] = len(parent)
+                    parent.append(node)
+                    code.append(c)
+                node = child
+            variant_node[v] = node
+        self._children = children
+        self.parent = np.asarray(parent, dtype=np.int64)
+        self.code = np.asarray(code, dtype=np.int32)
+        self.variant_node = variant_node
+        node_variant = np.full(len(parent), -1, dtype=np.int64)
+        node_variant[variant_node] = np.arange(len(variant_node), dtype=np.int64)
+        self.node_variant = node_variant
+
+        # casos que passam por cada nó (soma da subárvore): filhos têm id maior que o pai
+        count = np.zeros(len(parent), dtype=np.int64)
+        count[variant_node] = vi.frequency
+        for node in range(len(parent) - 1, 0, -1):
+            count[parent[node]] += count[node]
+        self.node_count = count
+
+        self.case_variant = vi.case_variant
+        self.first_case = vi.first_case
+        self.frequency = vi.frequency
+        self.variant_cases = np.argsort(vi.case_variant, kind="stable").astype(np.int64)
+        self.variant_offsets = np.zeros(len(vi.frequency) + 1, dtype=np.int64)
+        np.cumsum(vi.frequency, out=self.variant_offsets[1:])
+
+        # filhos em CSR (subárvore por prefixo)
+        order = np.argsort(self.parent[1:], kind="stable").astype(np.int64) + 1
+        self._child_nodes = order
+        self._child_offsets = np.searchsorted(self.parent[order], np.arange(len(parent) + 1))
+
+    # --- tamanho ---------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.variant_node)
+
+    @property
+    def n_cases(self) -> int:
+        return len(self.case_variant)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.parent)
+
+    @property
+    def index(self) -> VariantIndex:
+        return VariantIndex(self.case_variant, self.first_case, self.frequency)
+
+    # --- por caso / por variante -------------------------------------------
+    def variant_of(self, case: int) -> int:
+        return int(self.case_variant[case])
+
+    def cases(self, variant: int) -> np.ndarray:
+        """Casos da variante (ordem do log)."""
+        return self.variant_cases[self.variant_offsets[variant]:self.variant_offsets[variant + 1]]
+
+    def sequence(self, variant: int) -> List[str]:
+        """Atividades da variante (subindo da folha até a raiz)."""
+        out: List[int] = []
+        node = int(self.variant_node[variant])
+        while node > 0:
+            out.append(int(self.code[node]))
+            node = int(self.parent[node])
+        acts = self.activities
+        return [acts[c] for c in reversed(out)]
+
+    def label(self, variant: int, sep: str = VARIANT_SEP) -> str:
+        return sep.join(self.sequence(variant))
+
+    # --- consultas por sequência/prefixo -----------------------------------
+    def _walk(self, activities: Sequence[str]) -> Optional[int]:
+        node = 0
+        for a in activities:
+            c = self._codes.get(a)
+            if c is None:
+                return None
+            node = self._children.get(node * self._stride + c)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, activities: Sequence[str]) -> Optional[int]:
+        """Id da variante com exatamente essa sequência (None se não ocorre)."""
+        node = self._walk(activities)
+        if node is None:
+            return None
+        v = int(self.node_variant[node])
+        return v if v >= 0 else None
+
+    def prefix_count(self, activities: Sequence[str]) -> int:
+        """Casos cuja sequência começa por `activities` (O(len(prefixo)))."""
+        node = self._walk(activities)
+        return int(self.node_count[node]) if node is not None else 0
+
+    def with_prefix(self, activities: Sequence[str]) -> np.ndarray:
+        """Ids das variantes que começam por `activities`."""
+        node = self._walk(activities)
+        if node is None:
+            return np.zeros(0, dtype=np.int64)
+        out: List[int] = []
+        stack = [node]
+        nv, offs, kids = self.node_variant, self._child_offsets, self._child_nodes
+        while stack:
+            n = stack.pop()
+            if nv[n] >= 0:
+                out.append(int(nv[n]))
+            stack.extend(kids[offs[n]:offs[n + 1]].tolist())
+        return np.sort(np.asarray(out, dtype=np.int64))
+
+    def top_k(self, k: int, prefix: Sequence[str] = ()) -> np.ndarray:
+        """Até `k` variantes mais frequentes (opcionalmente só as de um prefixo), da maior para a menor."""
+        ids = self.with_prefix(prefix) if prefix else np.arange(len(self), dtype=np.int64)
+        if not len(ids) or k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        freq = self.frequency[ids]
+        if k < len(ids):
+            part = np.argpartition(-freq, k - 1)[:k]
+            ids, freq = ids[part], freq[part]
+        return ids[np.lexsort((ids, -freq))]
+
+
+def build_variant_trie(log: EventLog, lc: Optional[LogCodes] = None, vi: Optional[VariantIndex] = None) -> VariantTrie:
+    return VariantTrie(lc if lc is not None else encode_log(log), vi)
+
+
+@compute_cached("index")
+def log_variants(log_key: Hashable, _log: EventLog, _trie: Optional[VariantTrie] = None) -> VariantTrie:
+    """Trie do log no cache de cálculos; `_trie` registra uma trie já montada (p.ex. pelo índice do log)."""
+    return _trie if _trie is not None else build_variant_trie(_log)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from replayviz.pm4py_model import build_net_N3
+from replayviz.utils_xes import read_xes_any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def lfull():
+    return read_xes_any(os.path.join(ROOT, "Lfull.xes"))
+
+
+@pytest.fixture
+def n3():
+    net, im, fm, _, _ = build_net_N3()
+    return net, im, fm
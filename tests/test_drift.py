@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from replayviz.drift import CASE_TTL_WINDOWS, WindowedConformance
+from replayviz.streaming import StreamEvent
+
+HOUR = 3600.0
+
+
+def _events(*cases):
+    evs = [StreamEvent(cid, act, ts) for cid, trace in cases for act, ts in trace]
+    return sorted(evs, key=lambda e: e.timestamp)
+
+
+def test_case_gap_longer_than_window_is_not_split(n3):
+    net, im, fm = n3
+    gapped = [("a", 0.0), ("c", 600.0), ("d", 1200.0), ("e", 1200.0 + 2 * HOUR), ("h", 1300.0 + 2 * HOUR)]
+    quick = [("a", 100.0), ("c", 200.0), ("d", 300.0), ("e", 400.0), ("h", 500.0)]
+    monitor = WindowedConformance(net, im, fm, size=HOUR)
+    windows = list(monitor.feed(_events((1, gapped), (2, quick))))
+    assert sum(w.cases for w in windows) == 2
+    assert all(w.fit == w.cases and w.fitness_mean == 1.0 for w in windows)
+
+
+def test_evicted_cases_count_as_unfinished(n3):
+    net, im, fm = n3
+    stalled = [("a", 0.0)]
+    later = [("a", 10 * HOUR), ("c", 10 * HOUR + 1), ("d", 10 * HOUR + 2), ("e", 10 * HOUR + 3), ("h", 10 * HOUR + 4)]
+    monitor = WindowedConformance(net, im, fm, size=HOUR, case_ttl=5 * HOUR)
+    windows = list(monitor.feed(_events((1, stalled), (2, later))))
+    assert monitor.evicted == 1
+    assert sum(w.cases for w in windows) == 2
+    assert sum(w.fit for w in windows) == 1
+    assert windows[0].start == 0.0 and windows[0].fit == 0
+
+
+def test_never_completed_cases_are_counted_and_windows_advance(n3):
+    net, im, fm = n3
+    day = 24 * HOUR
+    evs = _events(*((i, [("a", i * HOUR)]) for i in range(200)))
+    for ttl in (None, CASE_TTL_WINDOWS * day):
+        monitor = WindowedConformance(net, im, fm, size=day, case_ttl=ttl, max_cases=50)
+        early = [w for ev in evs for w in monitor.process(ev)]
+        windows = early + monitor.flush()
+        # a marca d'água avança antes do flush; despejados contam como não aderentes
+        assert len(early) >= 5
+        assert sum(w.cases for w in windows) == 200
+        assert sum(w.fit for w in windows) == 0
+        assert monitor.evicted == 150
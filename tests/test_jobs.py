@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from replayviz.jobs import CANCELLED, DONE, ERROR, JobManager
+
+
+def _wait(job, timeout=5.0):
+    t0 = time.time()
+    while not job.finished:
+        assert time.time() - t0 < timeout, "job não terminou"
+        time.sleep(0.01)
+
+
+def _blocking(job, started, release):
+    started.set()
+    while not release.wait(0.01):
+        job.check_cancelled()
+    return "ok"
+
+
+def test_cancel_is_kept_until_restart():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    job = manager.submit("k", _blocking, started, release)
+    assert started.wait(5.0)
+    job.cancel()
+    _wait(job)
+    assert job.status == CANCELLED
+    # rerun da página: mesma chave devolve o job cancelado, sem recomeçar
+    assert manager.submit("k", _blocking, started, release) is job
+
+    release.set()
+    again = manager.submit("k", _blocking, started, release, restart=True)
+    assert again is not job
+    _wait(again)
+    assert again.status == DONE and again.result == "ok"
+    assert manager.submit("k", _blocking, started, release) is again
+
+
+def test_failed_job_is_not_resubmitted():
+    manager = JobManager(max_workers=1)
+    calls = []
+
+    def boom(job):
+        calls.append(1)
+        raise RuntimeError("falhou")
+
+    job = manager.submit("e", boom)
+    _wait(job)
+    assert job.status == ERROR and "falhou" in job.error
+    assert manager.submit("e", boom) is job
+    assert len(calls) == 1
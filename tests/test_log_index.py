@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from replayviz.aggregation import case_codes, encode_log, variant_index
+from replayviz.log_index import OVERLAP, START, WITHIN, CaseSet, apply_filter, build_log_index
+
+
+@pytest.mark.parametrize("n", [1, 7, 8, 9, 100, 1001])
+def test_caseset_matches_python_sets(n):
+    rng = np.random.default_rng(n)
+    a_ids = set(rng.choice(n, size=n // 2, replace=False).tolist())
+    b_ids = set(rng.choice(n, size=n // 3, replace=False).tolist())
+    a, b = CaseSet.from_cases(sorted(a_ids), n), CaseSet.from_cases(sorted(b_ids), n)
+    universe = set(range(n))
+    for got, want in [
+        (a & b, a_ids & b_ids), (a | b, a_ids | b_ids), (a - b, a_ids - b_ids),
+        (~a, universe - a_ids), (~~a, a_ids), (CaseSet.full(n), universe),
+    ]:
+        assert got.cases().tolist() == sorted(want)
+        assert len(got) == len(want)
+    # complemento não acende os bits de preenchimento do último byte
+    assert len(~CaseSet.from_cases([], n)) == n
+
+
+@pytest.fixture(scope="module")
+def index(lfull):
+    return build_log_index(lfull)
+
+
+def test_activity_bitmaps(lfull, index):
+    for act in index.lc.activities:
+        want = [i for i, tr in enumerate(lfull) if any(ev["concept:name"] == act for ev in tr)]
+        assert index.with_activity(act).cases().tolist() == want
+    assert len(index.with_activity("não existe")) == 0
+
+
+def test_time_ranges_match_brute_force(index):
+    start, end = index.start, index.end
+    lo, hi = index.time_bounds()
+    t0, t1 = lo + (hi - lo) / 3, lo + 2 * (hi - lo) / 3
+    has = ~np.isnan(start)
+    expected = {
+        START: has & (start >= t0) & (start <= t1),
+        WITHIN: has & (start >= t0) & (end <= t1),
+        OVERLAP: has & (start <= t1) & (end >= t0),
+    }
+    for mode, mask in expected.items():
+        assert index.in_range(t0, t1, mode).cases().tolist() == np.flatnonzero(mask).tolist(), mode
+
+
+def test_subset_codes_equal_reencoding(lfull, index):
+    acts = index.lc.activities
+    sel = apply_filter(index, with_all=[acts[0]], without=[acts[-1]])
+    assert len(sel)
+    lc, vi = index.subset_codes(sel)
+    sub = index.subset(lfull, sel)
+    ref_lc = encode_log(sub)
+    ref_vi = variant_index(ref_lc)
+    assert len(lc.offsets) - 1 == len(sub)
+    for i in range(len(sub)):
+        got = [lc.activities[c] for c in case_codes(lc, i)]
+        assert got == [ref_lc.activities[c] for c in case_codes(ref_lc, i)]
+    # mesma partição em variantes, numeradas pela primeira ocorrência
+    assert vi.case_variant.tolist() == ref_vi.case_variant.tolist()
+    assert vi.first_case.tolist() == ref_vi.first_case.tolist()
+    assert vi.frequency.tolist() == ref_vi.frequency.tolist()
+    assert int(vi.frequency.sum()) == len(sel)
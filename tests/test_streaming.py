@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pytest
+from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
+
+from replayviz.streaming import StreamEvent, StreamingChecker, log_event_stream
+
+
+def test_streaming_verdict_matches_token_replay(lfull, n3):
+    net, im, fm = n3
+    closed = {}
+    checker = StreamingChecker(net, im, fm, close_on_final=False, on_close=lambda r: closed.__setitem__(r.case_id, r))
+    for _ in checker.run(log_event_stream(lfull)):
+        pass
+    checker.close_all()
+
+    expected = token_based_replay.apply(lfull, net, im, fm)
+    assert len(closed) == len(expected) == len(lfull)
+    for i, ref in enumerate(expected):
+        got = closed[i]
+        assert got.trace_is_fit == ref["trace_is_fit"], i
+        if ref["trace_is_fit"]:
+            assert got.trace_fitness == pytest.approx(1.0)
+        else:
+            assert got.trace_fitness < 1.0
+
+
+def test_bounded_case_store_evicts_lru(n3):
+    net, im, fm = n3
+
+    closed = []
+    checker = StreamingChecker(net, im, fm, max_cases=2, on_close=closed.append)
+    for case in range(3):
+        checker.process(StreamEvent(case, "a", float(case)))
+    assert len(checker) == 2
+    assert [(r.case_id, r.status) for r in closed] == [(0, "evicted")]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import gzip
+
+import pytest
+from pm4py.algo.conformance.tokenreplay import algorithm as token_based_replay
+from pm4py.objects.log.obj import EventLog
+
+from replayviz.pm4py_model import build_net_N3, net_structure_hash
+from replayviz.summary import ConformanceSummary, merge_summaries
+
+
+def _summary(log, results, net):
+    activities = {t.label for t in net.transitions if t.label}
+    return ConformanceSummary.from_replay(log, results, net_structure_hash(net), activities)
+
+
+@pytest.fixture(scope="module")
+def replayed(lfull):
+    net, im, fm, _, _ = build_net_N3()
+    return net, token_based_replay.apply(lfull, net, im, fm)
+
+
+def test_merged_shards_equal_full_summary(lfull, replayed):
+    net, results = replayed
+    full = _summary(lfull, results, net)
+    bounds = [0, 100, 101, 500, len(lfull)]
+    shards = [
+        _summary(EventLog(lfull[a:b]), results[a:b], net) for a, b in zip(bounds, bounds[1:])
+    ]
+    assert merge_summaries(shards) == full
+    assert shards[0] + shards[1] + shards[2] + shards[3] == full
+    assert full.total_traces == len(lfull)
+    assert merge_summaries(shards).totals() == full.totals()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_dumps_loads_roundtrip(lfull, replayed, compress):
+    net, results = replayed
+    s = _summary(lfull, results, net)
+    assert ConformanceSummary.loads(s.dumps(compress=compress)) == s
+
+
+def test_corrupt_input_raises_value_error(lfull, replayed):
+    net, results = replayed
+    raw = _summary(lfull, results, net).dumps()
+    for bad in (raw[: len(raw) // 2], gzip.compress(b'{"version": 1}'), b"[]", b"\x1f\x8bnope"):
+        with pytest.raises(ValueError):
+            ConformanceSummary.loads(bad)
+
+
+def test_merge_rejects_other_model(lfull, replayed):
+    net, results = replayed
+    a = _summary(lfull, results, net)
+    b = ConformanceSummary("outro", a.model_activities)
+    with pytest.raises(ValueError):
+        a.merge(b)